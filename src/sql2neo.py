@@ -1,9 +1,27 @@
 #!/opt/local/bin/python
-import MySQLdb
-from py2neo import cypher
-from py2neo import neo4j
 import datetime
 import calendar
+import json
+import time
+import sys
+import collections
+import threading
+import csv
+import gzip
+import os
+import math
+import random
+import hashlib
+import Queue
+import importlib
+import bisect
+import sqlite3
+import re
+import tempfile
+import heapq
+import cPickle
+import itertools
+import decimal
 
 class sql2NeoRelationship(object):
 	"""sql2NeoRelationship a SQL relationship that will be migrated to Neo4j. 
@@ -18,6 +36,14 @@ class sql2NeoRelationship(object):
 	:type query: string
 	:param lookupMapping: The first dictionary contains the mapping for *leftEntity* and the second for *rightEntitiy*. Every dictionary is expected to be in the form <propertyName>:<index of SQL result>. The dictionaries will be used to map the query's return values to the corresponding properties in Neo4j when looking up the nodes that will be connected
 	:type lookupMapping: array of dictionaires
+	:param key: *optional* name of a numeric column of *query*'s result, preferably the indexed primary key, used to select row ranges. It does not have to be unique, checkpointed pages always contain all rows sharing a key. Sampled verification only reads key ranges of unique keys
+	:type key: str
+	:param changeColumn: *optional* name of a column of *query*'s result holding the time (or version) of the last change of a row, used by `sql2NeoImporter.syncAll`
+	:type changeColumn: str
+	:param foreignKeys: *optional* replacement of *lookupMapping* for entities declaring a *sqlKey*. The first entry is the index (or list of indexes) of the columns of *query*'s result holding the SQL key of *leftEntity*, the second one the same for *rightEntitiy*. Nodes are then looked up by their surrogate key property, see `sql2NeoImporter.surrogateProperty`
+	:type foreignKeys: list
+	:param exclusive: *optional* if true every left node has at most one relationship of this type, e.g. for a foreign key column of the left entity's table. Syncs then replace the relationship of a changed row's left node instead of adding another one
+	:type exclusive: bool
 	"""
 	name=""
 	""" defines the relationship name in Neo4j and does not have to be unique. Upper case Strings without special characters except for '_' are enforced."""
@@ -27,15 +53,31 @@ class sql2NeoRelationship(object):
 	"""Right hand side entity of all Relationships"""
 	query=""
 	"""SQL Query to recieve all relationships that have to be migrated. Joins can be used to replace ids with an identifier that is available in Neo4j"""
+	key=None
+	"""Name of a numeric column of *query*'s result used to select row ranges, e.g. for sampled verification"""
+	changeColumn=None
+	"""Name of a column of *query*'s result holding the time of the last change of a row, used for incremental syncs"""
+	foreignKeys=None
+	"""Column indexes of the SQL keys of the left and right entity, replacing *lookupMapping* once the relationship is added to an importer"""
+	exclusive=False
+	"""If true every left node has at most one relationship of this type, syncs replace it"""
+	compositePlan=[]
+	"""(side, column indexes, property name) of the lookups combining several columns, see `sql2NeoImporter.compositeKey`"""
 	lookupMapping=[{},{}]
 	"""An array of two dictionaries defining which properties are used to lookup the nodes that will be connected. The first dictionary declares the lookup for the left entity, the second one for the right one. the value for each entry has to be the index of the value in query that is to be used for the lookup. E.g. name and age should be used and will be returned in this order by *query* the mapping would be [{'name':0},{'age':1}]"""
 	cursor=None
 	"""Current mysql cursor"""
+	description=None
+	"""Column description of the last executed query, kept after the cursor is closed"""
+	plan=None
+	"""Compiled mapping plan of the last executed query, see `sql2NeoImporter.compileMappingPlan`"""
+	planDescription=None
+	"""Description the mapping plan was compiled for"""
 	results=-1
 	"""Result count of the last query executed"""
 	importer=None
 	"""The importer handling this relationship, will be set as the relationship is added to a sql2NeoImporter"""
-	def __init__(self, name, leftEntity, rightEntitiy, query,lookupMapping):
+	def __init__(self, name, leftEntity, rightEntitiy, query,lookupMapping=None,key=None,changeColumn=None,foreignKeys=None,exclusive=False):
 		"""sql2NeoRelationship a SQL relationship that will be migrated to Neo4j. 
 
 		:param name: `str` of the relationship name in Neo4j and does not have to be unique. Upper case Strings without special characters except for '_' are enforced.
@@ -48,40 +90,87 @@ class sql2NeoRelationship(object):
 		:type query: string
 		:param lookupMapping: The first dictionary contains the mapping for *leftEntity* and the second for *rightEntitiy*. Every dictionary is expected to be in the form <propertyName>:<index of SQL result>. The dictionaries will be used to map the query's return values to the corresponding properties in Neo4j when looking up the nodes that will be connected
 		:type lookupMapping: array of dictionaires
+		:param key: *optional* name of a numeric column of *query*'s result, preferably the indexed primary key, used to select row ranges. It does not have to be unique, checkpointed pages always contain all rows sharing a key. Sampled verification only reads key ranges of unique keys
+		:type key: str
+		:param changeColumn: *optional* name of a column of *query*'s result holding the time (or version) of the last change of a row, used by `sql2NeoImporter.syncAll`
+		:type changeColumn: str
+		:param foreignKeys: *optional* replacement of *lookupMapping* for entities declaring a *sqlKey*. The first entry is the index (or list of indexes) of the columns of *query*'s result holding the SQL key of *leftEntity*, the second one the same for *rightEntitiy*. Nodes are then looked up by their surrogate key property, see `sql2NeoImporter.surrogateProperty`
+		:type foreignKeys: list
+		:param exclusive: *optional* if true every left node has at most one relationship of this type, e.g. for a foreign key column of the left entity's table. Syncs then replace the relationship of a changed row's left node instead of adding another one
+		:type exclusive: bool
 		"""
 		self.name=name
 		self.leftEntity=leftEntity
 		self.rightEntitiy=rightEntitiy
 		self.query=query
  		self.lookupMapping=lookupMapping
+		self.key=key
+		self.changeColumn=changeColumn
+		self.foreignKeys=foreignKeys
+		self.exclusive=exclusive
 
-	def execute(self,sqlConnection):
-		"""executes	`query` and returns the results (or -1 if it fails)
+	def execute(self,sqlConnection,query=None,parameters=None,streaming=None):
+		"""executes	`query` and returns the results (or -1 if it fails). If the importer streams results the count comes from a COUNT(*) pre-query and is None if counting is disabled
 			
 			:param sqlConnection: An initialized SQL connection. Is normally handled via `sql2NeoImporter`
-			:type sqlConnection: MySQLdb.connection 
+			:type sqlConnection: DB-API 2.0 connection
+			:param query: *optional* query to execute instead of `query`, e.g. a page of it. Its results are not counted when streaming
+			:type query: str
+			:param parameters: parameters of *query*
+			:type parameters: tuple
+			:param streaming: *optional* overrides the importer's *streaming*
+			:type streaming: bool
 		"""
 		try:
-			self.cursor=sqlConnection.cursor()
-			self.results=self.cursor.execute(self.query)
+			self.close()
+			start=time.time()
+			self.cursor,self.results=self.importer.executeQuery(sqlConnection,query or self.query,parameters,query==None,streaming)
+			self.importer.metrics.observe(self.importer.metricsLabel(self),'sql_execute',time.time()-start)
+			self.description=self.cursor.description
 			return self.results
-		except MySQLdb.Error as e:
+		except self.importer.sqlErrors as e:
 				print "Can not execute query: '{0}' for relationship '{1}': \n--\n{2}\n--".format(self.query,self.name,str(e))
+				self.importer.metrics.count(self.importer.metricsLabel(self),'errors')
 				return -1
 
+	def rows(self):
+		"""Iterates over the rows of the last execute and closes the cursor afterwards"""
+		return self.importer.fetchRows(self)
+
+	def close(self):
+		"""Closes the cursor of the last execute"""
+		if self.cursor!=None:
+			self.cursor.close()
+			self.cursor=None
+
 	def getMappedLookup(self,row):
 		"""Returns a mapped instance of the result (MySQLdb row) row is expected to be a row from the last execute
 			
 			:param row: row from sql result
 			:type row: MySQLdb cursor result"""
-		ret=[]
-		for i in xrange(2):
-			# 0 => left; 1=> right
-			m={}
-			for l in self.lookupMapping[i]:
-				m[l]=self.importer.convertDataType(row[self.lookupMapping[i][l]])
-			ret.append(m)
-		return ret
+		if self.planDescription is not self.description or self.plan==None:
+			self.compileMappingPlan()
+		# 0 => left; 1=> right
+		mappedLookup=[{name:convert(row[i]) for i,name,convert in side} for side in self.plan]
+		for side,indexes,name in self.compositePlan:
+			mappedLookup[side][name]=self.importer.compositeKey(row,indexes)
+		return mappedLookup
+
+	def compileMappingPlan(self):
+		"""Selects the columns and converters used by `getMappedLookup` for the description of the last executed query. Lookups on a list of columns are combined by `sql2NeoImporter.compositeKey`"""
+		self.plan=[self.importer.compileMappingPlan(self.description,[(self.lookupMapping[i][l],l) for l in self.lookupMapping[i] if type(self.lookupMapping[i][l])!=list]) for i in xrange(2)]
+		self.compositePlan=[(i,self.lookupMapping[i][l],l) for i in xrange(2) for l in self.lookupMapping[i] if type(self.lookupMapping[i][l])==list]
+		self.planDescription=self.description
+
+	def lookupColumns(self,side):
+		"""Returns the indexes of the columns used to look up the left (*side* 0) or right (*side* 1) node, ordered by property name"""
+		columns=[]
+		for p in sorted(self.lookupMapping[side]):
+			if type(self.lookupMapping[side][p])==list:
+				columns.extend(self.lookupMapping[side][p])
+			else:
+				columns.append(self.lookupMapping[side][p])
+		return columns
 
 	def buildVerifyQuery(self,mappedLookup):
 		"""Builds a Cypher query to create a relationship from a mapped sql lookup. NOTE: The corresponding entites have to be imported first"""
@@ -91,8 +180,55 @@ class sql2NeoRelationship(object):
 		"""Builds a Cypher query to create a relationship from a mapped sql lookup. NOTE: The corresponding entites have to be imported first"""
 		return "MATCH (a:{0} {{{1}}}),(b:{2} {{{3}}}) CREATE (a)-[:{4}]->(b)".format(self.leftEntity.name,self.importer.mappedToCypher(mappedLookup[0]),self.rightEntitiy.name,self.importer.mappedToCypher(mappedLookup[1]),self.name)
 
+	def buildBatchCreateQuery(self):
+		"""Builds a parameterized Cypher query to create one relationship per entry of the parameter *pairs*. Every entry is expected to be in the form {'l':<left lookup>,'r':<right lookup>}, see `getMappedPair`. NOTE: The corresponding entites have to be imported first"""
+		left=",".join("{0}:p.l.{0}".format(k) for k in sorted(self.lookupMapping[0]))
+		right=",".join("{0}:p.r.{0}".format(k) for k in sorted(self.lookupMapping[1]))
+		return "UNWIND {{pairs}} AS p MATCH (a:{0} {{{1}}}) MATCH (b:{2} {{{3}}}) CREATE (a)-[:{4}]->(b)".format(self.leftEntity.name,left,self.rightEntitiy.name,right,self.name)
+
+	def buildMergeQuery(self,mappedLookup):
+		"""Builds a Cypher query to create a relationship from a mapped sql lookup unless it already exists. Relationships of an *exclusive* type to other nodes of the left node are deleted"""
+		return "MATCH (a:{0} {{{1}}}) MATCH (b:{2} {{{3}}}) {4}MERGE (a)-[:{5}]->(b)".format(self.leftEntity.name,self.importer.mappedToCypher(mappedLookup[0]),self.rightEntitiy.name,self.importer.mappedToCypher(mappedLookup[1]),self.buildReplaceClause(),self.name)
+
+	def buildBatchMergeQuery(self):
+		"""Builds a parameterized Cypher query to create one relationship per entry of the parameter *pairs* unless it already exists, see `buildBatchCreateQuery` and `buildMergeQuery`"""
+		return self.buildBatchCreateQuery().replace(" CREATE (a)"," {0}MERGE (a)".format(self.buildReplaceClause()))
+
+	def buildReplaceClause(self):
+		"""Builds the Cypher clauses of the merge queries deleting the relationships of left node *a* to nodes other than *b* if the relationship is *exclusive*, an empty string otherwise"""
+		if not self.exclusive:
+			return ""
+		return "OPTIONAL MATCH (a)-[old:{0}]->(c:{1}) WHERE c<>b DELETE old WITH DISTINCT a,b ".format(self.name,self.rightEntitiy.name)
+
+	def buildIdCreateQuery(self,leftId,rightId):
+		"""Builds a Cypher query to create a relationship between two nodes given by their Neo4j node ids"""
+		return "MATCH (a),(b) WHERE id(a)={0} AND id(b)={1} CREATE (a)-[:{2}]->(b)".format(leftId,rightId,self.name)
+
+	def buildBatchIdCreateQuery(self):
+		"""Builds a parameterized Cypher query to create one relationship per entry of the parameter *pairs*. Every entry is expected to be in the form {'l':<left node id>,'r':<right node id>}"""
+		return "UNWIND {{pairs}} AS p MATCH (a) WHERE id(a)=p.l MATCH (b) WHERE id(b)=p.r CREATE (a)-[:{0}]->(b)".format(self.name)
+
+	def buildBatchGroupedCreateQuery(self,side):
+		"""Builds a parameterized Cypher query to create the relationships of the parameter *groups*, every entry is expected to be in the form {'k':<lookup of the shared node>,'others':[<lookups of the other nodes>]}. The shared node is the left one if *side* is 0 and the right one if it is 1, it is matched only once per group. NOTE: The corresponding entites have to be imported first"""
+		left=",".join("{0}:{1}.{0}".format(k,'g.k' if side==0 else 'o') for k in sorted(self.lookupMapping[0]))
+		right=",".join("{0}:{1}.{0}".format(k,'o' if side==0 else 'g.k') for k in sorted(self.lookupMapping[1]))
+		if side==0:
+			return "UNWIND {{groups}} AS g MATCH (a:{0} {{{1}}}) UNWIND g.others AS o MATCH (b:{2} {{{3}}}) CREATE (a)-[:{4}]->(b)".format(self.leftEntity.name,left,self.rightEntitiy.name,right,self.name)
+		return "UNWIND {{groups}} AS g MATCH (b:{2} {{{3}}}) UNWIND g.others AS o MATCH (a:{0} {{{1}}}) CREATE (a)-[:{4}]->(b)".format(self.leftEntity.name,left,self.rightEntitiy.name,right,self.name)
+
+	def getMappedPair(self,row):
+		"""Returns the mapped lookup of *row* as a parameter entry for `buildBatchCreateQuery`"""
+		mappedLookup=self.getMappedLookup(row)
+		return {'l':mappedLookup[0],'r':mappedLookup[1]}
+
+	def buildBatchVerifyQuery(self):
+		"""Builds a parameterized Cypher query returning every entry of the parameter *pairs* (see `getMappedPair`) for which no relationship exists"""
+		left=",".join("{0}:p.l.{0}".format(k) for k in sorted(self.lookupMapping[0]))
+		right=",".join("{0}:p.r.{0}".format(k) for k in sorted(self.lookupMapping[1]))
+		return "UNWIND {{pairs}} AS p OPTIONAL MATCH (a:{0} {{{1}}})-[r:{4}]->(b:{2} {{{3}}}) WITH p, count(r) AS found WHERE found=0 RETURN p".format(self.leftEntity.name,left,self.rightEntitiy.name,right,self.name)
+
 	def buildCardinalityQuery(self):
-		return "MATCH (a:{0})-[r:{1}]->(b:{2}) return r".format(self.leftEntity.name,self.name,self.rightEntitiy.name)
+		return "MATCH (a:{0})-[r:{1}]->(b:{2}) return count(r)".format(self.leftEntity.name,self.name,self.rightEntitiy.name)
 		
 
 
@@ -109,7 +245,13 @@ class sql2NeoEntity(object):
 		:param idx: A list of fields that will be indexed in Neo4j. 
 		:type idx: list of str
 		:param unq: A list of fields that will be indexed and have an unique constraint in Neo4j. 
-		:type unq: list of str"""
+		:type unq: list of str
+		:param key: *optional* name of a numeric column of *query*'s result, preferably the indexed primary key, used to select row ranges. It does not have to be unique, checkpointed pages always contain all rows sharing a key. Sampled verification only reads key ranges of unique keys
+		:type key: str
+		:param changeColumn: *optional* name of a column of *query*'s result holding the time (or version) of the last change of a row, used by `sql2NeoImporter.syncAll`. Synced nodes are merged on *unq*
+		:type changeColumn: str
+		:param sqlKey: *optional* name (or list of names) of the columns of *query*'s result forming the SQL primary key. It is stored in the indexed surrogate property `sql2NeoImporter.surrogateProperty`, relationships declaring *foreignKeys* look up the nodes by it
+		:type sqlKey: str"""
 	name=""					
 	"""Will be used for the Neo4j label as well"""
 	query=""				
@@ -124,9 +266,25 @@ class sql2NeoEntity(object):
 	"""List of properties to be indexed"""
 	uniques=[]
 	"""List of properties to be unique"""
+	key=None
+	"""Name of a numeric column of *query*'s result used to select row ranges, e.g. for sampled verification"""
+	changeColumn=None
+	"""Name of a column of *query*'s result holding the time of the last change of a row, used for incremental syncs"""
+	sqlKey=None
+	"""Name or list of names of the columns of *query*'s result forming the SQL primary key, stored in the surrogate key property"""
+	cursor=None
+	"""Current mysql cursor"""
+	description=None
+	"""Column description of the last executed query, kept after the cursor is closed"""
+	plan=None
+	"""Compiled mapping plan of the last executed query, see `sql2NeoImporter.compileMappingPlan`"""
+	compositePlan=[]
+	"""(column indexes, property name) of a surrogate key combining several columns, see `sql2NeoImporter.compositeKey`"""
+	planDescription=None
+	"""Description the mapping plan was compiled for"""
 	importer=None
 	"""The importer handling this entity, will be set as the entity is added to a sql2NeoImporter"""
-	def __init__(self,name, query, pMapping={},idx=[],unq=[]):
+	def __init__(self,name, query, pMapping={},idx=[],unq=[],key=None,changeColumn=None,sqlKey=None):
 		"""sql2NeoEntity defines a SQL entity that will be migrated to Neo4j. 
 
 		:param name: `str` of the entity's name in Neo4j, does not have to be unique.
@@ -138,9 +296,18 @@ class sql2NeoEntity(object):
 		:param idx: A list of fields that will be indexed in Neo4j. 
 		:type idx: list of str
 		:param unq: A list of fields that will be indexed and have an unique constraint in Neo4j. 
-		:type unq: list of str"""
+		:type unq: list of str
+		:param key: *optional* name of a numeric column of *query*'s result, preferably the indexed primary key, used to select row ranges. It does not have to be unique, checkpointed pages always contain all rows sharing a key. Sampled verification only reads key ranges of unique keys
+		:type key: str
+		:param changeColumn: *optional* name of a column of *query*'s result holding the time (or version) of the last change of a row, used by `sql2NeoImporter.syncAll`. Synced nodes are merged on *unq*
+		:type changeColumn: str
+		:param sqlKey: *optional* name (or list of names) of the columns of *query*'s result forming the SQL primary key. It is stored in the indexed surrogate property `sql2NeoImporter.surrogateProperty`, relationships declaring *foreignKeys* look up the nodes by it
+		:type sqlKey: str"""
 		self.name=name
 		self.query=query
+		self.key=key
+		self.changeColumn=changeColumn
+		self.sqlKey=sqlKey
 		if pMapping == None or len(pMapping)==0:
 			print name + ": No property mapping was provided, using MySQL column names as property names instead"
 			self.autoMap=True
@@ -153,79 +320,1817 @@ class sql2NeoEntity(object):
 		"""Returns a mapped instance of the result (MySQLdb row)
 		row is expected to be a row from the last query of the last execute
 		"""
-		ret={}
-		description=self.cursor.description
-		for i in xrange(len(description)):
+		if self.planDescription is not self.description or self.plan==None:
+			self.compileMappingPlan()
+		mappedEntity={name:convert(row[i]) for i,name,convert in self.plan}
+		for indexes,name in self.compositePlan:
+			mappedEntity[name]=self.importer.compositeKey(row,indexes)
+		return mappedEntity
+
+	def compileMappingPlan(self):
+		"""Selects the columns, property names and converters used by `getMappedEntity` for the description of the last executed query. The columns of *sqlKey* are mapped to the surrogate key property"""
+		columns=[]
+		for i in xrange(len(self.description)):
 			if self.propertyMapping.has_key(i):
-				ret[self.propertyMapping[i]]=self.importer.convertDataType(row[i])
-			else:
-				if self.autoMap:
-					ret[description[i][0]]=self.importer.convertDataType(row[i])
-		return ret
+				columns.append((i,self.propertyMapping[i]))
+			elif self.autoMap:
+				columns.append((i,self.description[i][0]))
+		self.compositePlan=[]
+		keyColumns=self.sqlKeyColumns()
+		if len(keyColumns)==1:
+			columns.append((keyColumns[0],self.importer.surrogateProperty))
+		elif len(keyColumns)>1:
+			self.compositePlan=[(keyColumns,self.importer.surrogateProperty)]
+		self.plan=self.importer.compileMappingPlan(self.description,columns)
+		self.planDescription=self.description
+
+	def sqlKeyColumns(self):
+		"""Returns the indexes of the *sqlKey* columns in the description of the last executed query"""
+		if self.sqlKey==None:
+			return []
+		names=[d[0] for d in self.description]
+		return [names.index(c) for c in ([self.sqlKey] if isinstance(self.sqlKey,basestring) else self.sqlKey)]
 
 	
 	def buildCreateQuery(self,mappedEntity):
 		"""Builds a Cypher query to create a node from a mapped sql entity"""
 		return "CREATE (a:{0} {{{1}}})".format(self.name,self.importer.mappedToCypher(mappedEntity))
 
+	def buildBatchCreateQuery(self):
+		"""Builds a parameterized Cypher query to create one node per mapped entity in the parameter *rows*. The query text does not depend on the data so Neo4j can cache its plan"""
+		return "UNWIND {{rows}} AS row CREATE (a:{0}) SET a = row".format(self.name)
+
+	def buildMergeQuery(self,mappedEntity):
+		"""Builds a Cypher query to create or update a node from a mapped sql entity, the node is identified by the entity's *uniques*"""
+		identity=dict((u,mappedEntity[u]) for u in self.uniques)
+		return "MERGE (a:{0} {{{1}}}) SET a += {{{2}}}".format(self.name,self.importer.mappedToCypher(identity),self.importer.mappedToCypher(mappedEntity))
+
+	def buildBatchMergeQuery(self):
+		"""Builds a parameterized Cypher query to create or update one node per mapped entity in the parameter *rows*, nodes are identified by the entity's *uniques*"""
+		return "UNWIND {{rows}} AS row MERGE (a:{0} {{{1}}}) SET a += row".format(self.name,",".join("{0}:row.{0}".format(u) for u in self.uniques))
+
 	def buildVerifyQuery(self,mappedEntity):
 		"""Builds a Cypher query to create a node from a mapped sql entity"""
 		return "Match (a:{0} {{{1}}}) return a;".format(self.name,self.importer.mappedToCypher(mappedEntity))
 
+	def buildBatchVerifyQuery(self,properties):
+		"""Builds a parameterized Cypher query returning every mapped entity of the parameter *rows* for which no node with the same *properties* exists"""
+		return "UNWIND {{rows}} AS row OPTIONAL MATCH (a:{0} {{{1}}}) WITH row, count(a) AS found WHERE found=0 RETURN row".format(self.name,",".join("{0}:row.{0}".format(p) for p in sorted(properties)))
+
 	def buildCardinalityQuery(self):
-		return "MATCH (a:{0}) return a;".format(self.name)
+		return "MATCH (a:{0}) return count(a);".format(self.name)
 
-	def execute(self,sqlConnection):
-		"""executes *query* and returns the results (or -1 if it fails)
+	def execute(self,sqlConnection,query=None,parameters=None,streaming=None):
+		"""executes *query* and returns the results (or -1 if it fails). If the importer streams results the count comes from a COUNT(*) pre-query and is None if counting is disabled.
+		An *optional* query (e.g. a page of *query*) and its *parameters* can be executed instead, its results are not counted when streaming. *streaming* overrides the importer's *streaming* if given
 		"""
 		try:
-			self.cursor=sqlConnection.cursor()
-			self.results=self.cursor.execute(self.query)
+			self.close()
+			start=time.time()
+			self.cursor,self.results=self.importer.executeQuery(sqlConnection,query or self.query,parameters,query==None,streaming)
+			self.importer.metrics.observe(self.importer.metricsLabel(self),'sql_execute',time.time()-start)
+			self.description=self.cursor.description
 			return self.results
-		except MySQLdb.Error as e:
+		except self.importer.sqlErrors as e:
 				print "Can not execute query: '{0}' for entity '{1}': \n--\n{2}\n--".format(self.query,self.name,str(e))
+				self.importer.metrics.count(self.importer.metricsLabel(self),'errors')
 				return -1
+
+	def rows(self):
+		"""Iterates over the rows of the last execute and closes the cursor afterwards"""
+		return self.importer.fetchRows(self)
+
+	def close(self):
+		"""Closes the cursor of the last execute"""
+		if self.cursor!=None:
+			self.cursor.close()
+			self.cursor=None
 		
 
+class sql2NeoTransaction(object):
+	"""sql2NeoTransaction wraps a Neo4j transaction and commits it periodically to keep its size bounded. After every commit the next append opens a fresh transaction on the same session.
+	It can be used everywhere a transport transaction is accepted as *useTx*.
+
+	:param session: Neo4j session used to open the transactions
+	:type session: sql2NeoTransport
+	:param commitEvery: commit after this many rows. A literal statement counts as one row, a batch statement as one row per batch entry. None disables the limit
+	:type commitEvery: int
+	:param commitBytes: commit after this many bytes of statement and parameter payload. None disables the limit
+	:type commitBytes: int
+	:param metrics: *optional* `sql2NeoMetrics` recording the append and commit latencies and the bytes sent for *label*. Bytes are only measured exactly if *commitBytes* or a *batchSizer* needs them, otherwise they are estimated, see `payloadSize`
+	:type metrics: sql2NeoMetrics
+	:param retries: number of times a commit failing with a transient error (e.g. a deadlock) is retried. The statements of the current transaction are kept to replay them
+	:type retries: int
+	:param retryDelay: seconds to wait before the first retry, doubled for every further retry
+	:type retryDelay: float
+	:param batchSizer: *optional* callable returning the `sql2NeoBatchSizer` of a label. If given the rows per commit of every label are tuned by its sizer instead of *commitEvery*
+	:type batchSizer: function"""
+	session=None
+	"""Neo4j session the transactions are opened on"""
+	tx=None
+	"""Currently open transaction of *session*, None until the next append after a commit"""
+	commitEvery=None
+	"""Maximum number of rows per commit"""
+	commitBytes=None
+	"""Maximum payload bytes per commit"""
+	rows=0
+	"""Rows appended since the last commit"""
+	statements=0
+	"""Statements appended since the last commit"""
+	bytes=0
+	"""Payload bytes appended since the last commit"""
+	commitLatencies=[]
+	"""Duration in seconds of every commit done so far"""
+	metrics=None
+	"""`sql2NeoMetrics` recording the append and commit latencies, None disables them"""
+	label="transaction"
+	"""Label of the entity or relationship currently appending, metrics are recorded for it. A commit is recorded for the label appending when it happens"""
+	retries=0
+	"""Number of times a commit failing with a transient error is retried"""
+	retryDelay=0.1
+	"""Seconds to wait before the first retry, doubled for every further retry"""
+	transientMarkers=['Deadlock','TransientError']
+	"""A failed commit is retried if the name or message of its error contains one of these strings"""
+	pending=[]
+	"""(statement, parameters) appended since the last commit, only kept if *retries* is set"""
+	batchSizer=None
+	"""Callable returning the `sql2NeoBatchSizer` of a label, None commits by the fixed limits"""
+	sizer=None
+	"""`sql2NeoBatchSizer` of the label appended since the last commit"""
+	def __init__(self,session,commitEvery=None,commitBytes=None,metrics=None,retries=0,retryDelay=0.1,batchSizer=None):
+		self.session=session
+		self.commitEvery=commitEvery
+		self.commitBytes=commitBytes
+		self.commitLatencies=[]
+		self.metrics=metrics
+		self.retries=retries
+		self.retryDelay=retryDelay
+		self.pending=[]
+		self.batchSizer=batchSizer
+		self.sizer=None
+
+	def append(self,statement,parameters=None,rows=None):
+		"""Appends *statement* to the current transaction and commits if one of the limits is reached. Batch parameters (lists) count as one row per entry unless the statement's *rows* are given. With a *batchSizer* the rows of a new label start a new commit and the commit happens at the size tuned for the label or as soon as the client memory limit is exceeded"""
+		if self.batchSizer!=None:
+			sizer=self.batchSizer(self.label)
+			if sizer is not self.sizer:
+				self.commit()
+				self.sizer=sizer
+		start=time.time()
+		if self.tx==None:
+			self.tx=self.session.create_transaction()
+		self.tx.append(statement,parameters)
+		if self.retries>0:
+			self.pending.append((statement,parameters))
+		if self.metrics!=None:
+			self.metrics.observe(self.label,'neo4j_append',time.time()-start)
+		self.statements+=1
+		size=self.payloadSize(statement,parameters,self.commitBytes!=None or self.sizer!=None)
+		if rows==None:
+			rows=1
+			for p in (parameters or {}).itervalues():
+				if type(p)==list:
+					rows=len(p)
+					break
+		self.bytes+=size
+		self.rows+=rows
+		if self.metrics!=None:
+			self.metrics.count(self.label,'bytes',size)
+		if self.sizer!=None:
+			if self.rows>=self.sizer.size or self.sizer.memoryExceeded():
+				self.commit()
+		elif (self.commitEvery!=None and self.rows>=self.commitEvery) or (self.commitBytes!=None and self.bytes>=self.commitBytes):
+			self.commit()
+
+	def payloadSize(self,statement,parameters,exact):
+		"""Returns the bytes of *statement* and its JSON encoded *parameters*. Unless *exact* is set list parameters (batches) are estimated from the size of their first and last entry, so a batch is not serialized once more only to be measured"""
+		size=len(statement)
+		if not parameters:
+			return size
+		if not exact:
+			estimated={}
+			for name,value in parameters.iteritems():
+				if type(value)==list and len(value)>1:
+					size+=int(len(value)*(len(self.payloadJson([value[0],value[-1]]))-2)/2.0)+len(name)+4
+				else:
+					estimated[name]=value
+			if len(estimated)==0:
+				return size
+			parameters=estimated
+		return size+len(self.payloadJson(parameters))
+
+	def payloadJson(self,value):
+		"""Returns *value* encoded as JSON, or its repr if it can not be encoded"""
+		try:
+			return json.dumps(value)
+		except (TypeError,ValueError):
+			return repr(value)
+
+	def batchRows(self,batchSize):
+		"""Returns the number of rows of the next batch statement, *batchSize* limited to the rows per commit tuned for the current label"""
+		if self.batchSizer!=None:
+			return max(1,min(batchSize,self.batchSizer(self.label).size))
+		return batchSize
+
+	def commit(self):
+		"""Commits the current transaction and reports its latency. Does nothing if nothing was appended since the last commit. Transient errors are retried up to *retries* times in a new transaction replaying the appended statements"""
+		if self.tx==None:
+			return []
+		start=time.time()
+		attempt=0
+		while True:
+			tx=self.tx
+			self.tx=None
+			try:
+				result=tx.commit()
+				break
+			except self.session.errors as e:
+				if attempt>=self.retries or not self.isTransient(e):
+					self.pending=[]
+					raise
+				attempt+=1
+				try:
+					tx.rollback()
+				except Exception:
+					pass
+				print "Retrying commit ({0}/{1}) after: {2}".format(attempt,self.retries,str(e))
+				if self.metrics!=None:
+					self.metrics.count(self.label,'retries')
+				time.sleep(self.retryDelay*2**(attempt-1))
+				self.tx=self.session.create_transaction()
+				for statement,parameters in self.pending:
+					self.tx.append(statement,parameters)
+		self.pending=[]
+		latency=time.time()-start
+		self.commitLatencies.append(latency)
+		if self.metrics!=None:
+			self.metrics.observe(self.label,'neo4j_commit',latency)
+		print "Committed {0} rows in {1} statements ({2} bytes) in {3:.3f}s".format(self.rows,self.statements,self.bytes,latency)
+		if self.sizer!=None:
+			self.sizer.observe(self.rows,self.bytes,latency)
+		self.rows=0
+		self.statements=0
+		self.bytes=0
+		return result
+
+	def isTransient(self,error):
+		"""Returns True if *error* is a transient error like a deadlock, see *transientMarkers*"""
+		text=type(error).__name__+" "+str(error)
+		return any(marker in text for marker in self.transientMarkers)
+
+
+class sql2NeoBatchSizer(object):
+	"""sql2NeoBatchSizer tunes the number of rows per commit of a single job. After every commit *size* is scaled by the ratio of *targetLatency* to the observed latency (at most doubled or halved at once) and limited to the rows whose payload fits *targetBytes*. If the resident memory of the process exceeds *memoryLimit* the size is halved. It always stays between *minSize* and *maxSize*
+
+	:param size: initial rows per commit
+	:type size: int
+	:param targetLatency: seconds a commit should take
+	:type targetLatency: float
+	:param targetBytes: payload bytes a commit should not exceed, None disables the limit
+	:type targetBytes: int
+	:param memoryLimit: resident memory of the process in bytes, None disables the limit
+	:type memoryLimit: int
+	:param minSize: lower limit of *size*
+	:type minSize: int
+	:param maxSize: upper limit of *size*
+	:type maxSize: int"""
+	size=1000
+	"""Current rows per commit"""
+	targetLatency=1.0
+	"""Seconds a commit should take"""
+	targetBytes=None
+	"""Payload bytes a commit should not exceed"""
+	memoryLimit=None
+	"""Resident memory of the process in bytes at which *size* is halved"""
+	minSize=1
+	"""Lower limit of *size*"""
+	maxSize=None
+	"""Upper limit of *size*"""
+	rowBytes=None
+	"""Average payload bytes per row of the observed commits"""
+	sizes=[]
+	"""*size* after every observed commit"""
+	memoryCheckInterval=0.1
+	"""Seconds the last read resident memory is reused by `memoryExceeded`"""
+	def __init__(self,size,targetLatency=1.0,targetBytes=None,memoryLimit=None,minSize=1,maxSize=None):
+		self.targetLatency=targetLatency
+		self.targetBytes=targetBytes
+		self.memoryLimit=memoryLimit
+		self.minSize=minSize
+		self.maxSize=maxSize
+		self.size=self.limit(size)
+		self.sizes=[]
+		self.memoryChecked=0
+		self.memory=None
+		self.lock=threading.Lock()
+
+	def observe(self,rows,bytes,latency):
+		"""Tunes *size* after a commit of *rows* rows with *bytes* payload bytes that took *latency* seconds. Commits of fewer rows than *size* (ends of jobs or early commits) only shrink it if they took longer than *targetLatency* or their bytes per row exceed *targetBytes*. Partitions of a job may commit concurrently"""
+		if rows==0:
+			return
+		with self.lock:
+			self.tune(rows,bytes,latency)
+
+	def tune(self,rows,bytes,latency):
+		"""Updates *size* for `observe`, expects the lock to be held"""
+		if self.rowBytes==None:
+			self.rowBytes=float(bytes)/rows
+		else:
+			self.rowBytes=(self.rowBytes+float(bytes)/rows)/2
+		factor=min(2.0,max(0.5,self.targetLatency/max(latency,0.001)))
+		size=rows*factor
+		if rows<self.size:
+			# a short commit within the target latency says nothing about commits of *size* rows
+			size=self.size if latency<=self.targetLatency else min(self.size,size)
+		if self.targetBytes!=None and self.rowBytes>0:
+			size=min(size,self.targetBytes/self.rowBytes)
+		if self.memoryExceeded(True):
+			size=min(size,self.size/2)
+		self.size=self.limit(int(size))
+		self.sizes.append(self.size)
+
+	def limit(self,size):
+		"""Returns *size* limited to *minSize* and *maxSize*"""
+		size=max(self.minSize,size)
+		if self.maxSize!=None:
+			size=min(self.maxSize,size)
+		return size
+
+	def memoryExceeded(self,refresh=False):
+		"""Returns True if the resident memory of the process exceeds *memoryLimit*. The memory is read at most every *memoryCheckInterval* seconds unless *refresh* is set"""
+		if self.memoryLimit==None:
+			return False
+		now=time.time()
+		if refresh or now-self.memoryChecked>=self.memoryCheckInterval:
+			self.memory=self.residentMemory()
+			self.memoryChecked=now
+		return self.memory!=None and self.memory>self.memoryLimit
+
+	def residentMemory(self):
+		"""Returns the resident memory of the process in bytes, None if it can not be read (only Linux' /proc is supported)"""
+		try:
+			with open('/proc/self/statm') as f:
+				return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+		except (IOError,OSError,ValueError,IndexError):
+			return None
+
+	def __str__(self):
+		if len(self.sizes)==0:
+			return "{0} rows per commit (not tuned)".format(self.size)
+		return "{0} rows per commit after {1} commits (between {2} and {3}), {4:.0f} bytes per row".format(self.size,len(self.sizes),min(self.sizes),max(self.sizes),self.rowBytes)
+
+
+class sql2NeoScriptWriter(object):
+	"""sql2NeoScriptWriter writes Cypher statements to script files for cypher-shell instead of sending them to Neo4j. Every entity and relationship (see *label*) is written to its own files and a file is split into shards once it exceeds *shardBytes*. Statements are grouped in transactions (:begin ... :commit) of *commitEvery* statements and files are only split between two transactions, so every shard can be run on its own.
+	It can be used everywhere a transaction is accepted as *useTx* with the 'literal' engine. Output is collected in buffers of *bufferSize* bytes before it is written.
+
+	:param directory: existing directory the scripts are written to
+	:type directory: str
+	:param compress: gzip compress the scripts
+	:type compress: bool
+	:param commitEvery: statements per transaction
+	:type commitEvery: int
+	:param shardBytes: size in bytes after which a file is split at the next commit, None disables splitting
+	:type shardBytes: int
+	:param bufferSize: bytes collected before they are written to the file
+	:type bufferSize: int"""
+	directory=None
+	"""Directory the scripts are written to"""
+	compress=False
+	"""Gzip compress the scripts"""
+	commitEvery=1000
+	"""Statements per transaction"""
+	shardBytes=None
+	"""Size in bytes after which a file is split at the next commit"""
+	bufferSize=4*1024*1024
+	"""Bytes collected before they are written to the file"""
+	label="schema"
+	"""Label of the entity or relationship currently appending, statements of a new label start a new file"""
+	files=[]
+	"""Paths of all written scripts in the order they have to be run"""
+	def __init__(self,directory,compress=False,commitEvery=1000,shardBytes=1024*1024*1024,bufferSize=4*1024*1024):
+		self.directory=directory
+		self.compress=compress
+		self.commitEvery=commitEvery
+		self.shardBytes=shardBytes
+		self.bufferSize=bufferSize
+		self.files=[]
+		self.file=None
+		self.fileLabel=None
+		self.shard=0
+		self.buffer=[]
+		self.buffered=0
+		self.size=0
+		self.statements=0
+
+	def append(self,statement,parameters=None):
+		"""Appends *statement* to the current transaction of the current file, opens a new file if *label* changed and commits after *commitEvery* statements. Scripts can not contain *parameters*"""
+		if parameters:
+			raise ValueError("Scripts can only contain literal statements")
+		if self.file!=None and self.label!=self.fileLabel:
+			self.close()
+		if self.file==None:
+			self.open()
+		if self.statements==0:
+			self.write(":begin\n")
+		self.write(statement+";\n")
+		self.statements+=1
+		if self.commitEvery!=None and self.statements>=self.commitEvery:
+			self.commit()
+
+	def commit(self):
+		"""Ends the current transaction and closes the file if it exceeds *shardBytes*. Returns an empty result like a transaction"""
+		if self.statements>0:
+			self.write(":commit\n")
+			self.statements=0
+		if self.file!=None and self.shardBytes!=None and self.size>=self.shardBytes:
+			self.closeFile()
+		return []
+
+	def rollback(self):
+		"""Statements already written can not be taken back, the current transaction is ended instead"""
+		self.commit()
+
+	def open(self):
+		"""Opens the next file for *label*"""
+		if self.fileLabel!=self.label:
+			self.fileLabel=self.label
+			self.shard=0
+		name="{0:03d}-{1}-{2:03d}.cypher".format(len(self.files),self.label,self.shard)
+		path=os.path.join(self.directory,name+(".gz" if self.compress else ""))
+		if self.compress:
+			self.file=gzip.open(path,'wb')
+		else:
+			self.file=open(path,'wb')
+		self.files.append(path)
+		self.shard+=1
+		self.size=0
+
+	def write(self,data):
+		"""Adds *data* to the buffer and writes the buffer once it holds *bufferSize* bytes"""
+		self.buffer.append(data)
+		self.buffered+=len(data)
+		self.size+=len(data)
+		if self.buffered>=self.bufferSize:
+			self.flush()
+
+	def flush(self):
+		"""Writes the buffer to the current file"""
+		if len(self.buffer)>0:
+			self.file.write("".join(self.buffer))
+			self.buffer=[]
+			self.buffered=0
+
+	def closeFile(self):
+		"""Flushes and closes the current file"""
+		self.flush()
+		self.file.close()
+		self.file=None
+
+	def close(self):
+		"""Commits the current transaction and closes the current file"""
+		self.commit()
+		if self.file!=None:
+			self.closeFile()
+
+
+class sql2NeoNodeCache(object):
+	"""sql2NeoNodeCache maps lookup keys of an entity to Neo4j node ids so relationships can match their nodes by id instead of by properties.
+	The cache is filled once before the relationships are imported and no entries are added once the approximated memory usage would exceed *maxBytes*. Lookups of nodes that are not cached fall back to matching by properties, so the cache never changes while it is read.
+
+	:param entity: the entity whose nodes are cached
+	:type entity: sql2NeoEntity
+	:param properties: names of the properties that form the lookup key
+	:type properties: list of str
+	:param maxBytes: approximated memory limit of the cache in bytes
+	:type maxBytes: int"""
+	entity=None
+	"""Entity whose nodes are cached"""
+	properties=[]
+	"""Sorted property names forming the lookup key"""
+	maxBytes=0
+	"""Approximated memory limit in bytes"""
+	size=0
+	"""Approximated memory used by the entries in bytes"""
+	hits=0
+	"""Number of lookups that found a node id, approximated if the cache is read by parallel imports"""
+	misses=0
+	"""Number of lookups that did not find a node id, approximated if the cache is read by parallel imports"""
+	full=False
+	"""True once a node id was rejected to stay below *maxBytes*"""
+	entries=None
+	"""Dictionary of lookup key => node id"""
+	entryOverhead=100
+	"""Approximated bytes used by the dictionary bookkeeping of a single entry"""
+	def __init__(self,entity,properties,maxBytes):
+		self.entity=entity
+		self.properties=sorted(properties)
+		self.maxBytes=maxBytes
+		self.entries={}
+
+	def key(self,mapped):
+		"""Returns the cache key of a mapped lookup (dictionary of property name to value)"""
+		return tuple(self.normalize(mapped[p]) for p in self.properties)
+
+	def normalize(self,value):
+		"""Neo4j returns strings as unicode while MySQLdb returns byte strings, keys always use utf-8 byte strings"""
+		if type(value)==unicode:
+			return value.encode('utf-8')
+		return value
+
+	def entrySize(self,key,nodeId):
+		"""Approximated memory used by a single entry in bytes"""
+		return sys.getsizeof(key)+sum(sys.getsizeof(v) for v in key)+sys.getsizeof(nodeId)+self.entryOverhead
+
+	def maxEntries(self):
+		"""Upper limit of the number of entries fitting into *maxBytes*, every entry uses at least *entryOverhead* bytes"""
+		return self.maxBytes//self.entryOverhead
+
+	def get(self,key):
+		"""Returns the node id of *key* or None if it is not cached"""
+		nodeId=self.entries.get(key)
+		if nodeId==None:
+			self.misses+=1
+		else:
+			self.hits+=1
+		return nodeId
+
+	def put(self,key,nodeId):
+		"""Adds a node id to the cache while it is filled. Returns False and marks the cache as *full* if the entry does not fit into *maxBytes*"""
+		size=self.entrySize(key,nodeId)
+		if key in self.entries:
+			size-=self.entrySize(key,self.entries[key])
+		if self.size+size>self.maxBytes:
+			self.full=True
+			return False
+		self.entries[key]=nodeId
+		self.size+=size
+		return True
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __str__(self):
+		return "{0}({1}): {2} entries (~{3} bytes{4}), {5} hits, {6} misses".format(self.entity.name,",".join(self.properties),len(self.entries),self.size,", full" if self.full else "",self.hits,self.misses)
+
+
+class sql2NeoScheduler(object):
+	"""sql2NeoScheduler runs the entity and relationship imports of a `sql2NeoImporter` on a pool of worker threads.
+	Entities do not depend on each other and start immediately, a relationship starts as soon as its left and right entity are imported. Every worker uses its own SQL connection, Neo4j sessions are checked out of the importer's session pool per job.
+
+	:param importer: importer providing the jobs and connections
+	:type importer: sql2NeoImporter
+	:param workers: maximum number of jobs running at the same time
+	:type workers: int
+	:param jobs: entities and relationships to run, defaults to all jobs of *importer*
+	:type jobs: list
+	:param ordered: if false relationships do not wait for their entities
+	:type ordered: bool
+	:param action: what the jobs do, used in the messages of failed jobs (e.g. 'import' or 'verify')
+	:type action: str"""
+	importer=None
+	"""Importer providing the jobs and connections"""
+	workers=1
+	"""Maximum number of jobs running at the same time"""
+	jobs=[]
+	"""Entities and relationships to run"""
+	ordered=True
+	"""Relationships wait for their entities if true"""
+	action="import"
+	"""What the jobs do, used in the messages of failed jobs"""
+	done=set()
+	"""Ids of the jobs that finished successfully during the last run"""
+	failed=set()
+	"""Ids of the jobs that failed or were skipped during the last run"""
+	def __init__(self,importer,workers,jobs=None,ordered=True,action="import"):
+		self.importer=importer
+		self.workers=workers
+		if jobs==None:
+			jobs=list(importer.entities)+list(importer.relationships)
+		self.jobs=jobs
+		self.ordered=ordered
+		self.action=action
+
+	def dependencies(self,job):
+		"""Returns the jobs that have to be finished before *job* can start"""
+		if self.ordered and isinstance(job,sql2NeoRelationship):
+			return [e for e in (job.leftEntity,job.rightEntitiy) if e in self.jobs]
+		return []
+
+	def run(self,runJob):
+		"""Runs all jobs calling *runJob(job,sqlConnection,neo4jSession)* on the worker threads. A job fails if *runJob* returns False or raises, jobs depending on a failed job are skipped. Returns True if all jobs succeeded"""
+		jobs=self.jobs
+		pending=dict((id(j),set(id(d) for d in self.dependencies(j))) for j in jobs)
+		self.done=set()
+		self.failed=set()
+		self.ready=[j for j in jobs if len(pending[id(j)])==0]
+		self.waiting=[j for j in jobs if len(pending[id(j)])>0]
+		self.pending=pending
+		self.running=0
+		self.condition=threading.Condition()
+		threads=[threading.Thread(target=self.work,args=(runJob,)) for i in xrange(max(1,min(self.workers,len(jobs))))]
+		for t in threads:
+			t.daemon=True
+			t.start()
+		for t in threads:
+			t.join()
+		return len(self.failed)==0 and len(self.done)==len(jobs)
+
+	def next(self):
+		"""Blocks until a job is ready and returns it, returns None once no job is left"""
+		with self.condition:
+			while len(self.ready)==0:
+				if self.running==0:
+					return None
+				self.condition.wait()
+			self.running+=1
+			return self.ready.pop(0)
+
+	def finish(self,job,success):
+		"""Marks *job* as finished and releases or skips the jobs waiting for it"""
+		with self.condition:
+			self.running-=1
+			if success:
+				self.done.add(id(job))
+			else:
+				self.failed.add(id(job))
+			for j in list(self.waiting):
+				deps=self.pending[id(j)]
+				if id(job) not in deps:
+					continue
+				if not success:
+					print "Skipping {0} because {1} failed".format(j.name,job.name)
+					self.waiting.remove(j)
+					self.failed.add(id(j))
+					continue
+				deps.discard(id(job))
+				if len(deps)==0:
+					self.waiting.remove(j)
+					self.ready.append(j)
+			self.condition.notify_all()
+
+	def work(self,runJob):
+		"""Worker thread: opens the worker's SQL connection and runs jobs until none is left, every job checks out a Neo4j session of the importer's `sql2NeoSessionPool`"""
+		sqlConnection=None
+		pool=self.importer.getSessionPool()
+		try:
+			sqlConnection=self.importer.createSqlConnection()
+		except Exception as e:
+			print "Worker can not connect: {0}".format(str(e))
+		while True:
+			job=self.next()
+			if job==None:
+				break
+			success=False
+			if sqlConnection!=None:
+				session=None
+				try:
+					session=pool.acquire()
+					success=runJob(job,sqlConnection,session)
+				except Exception as e:
+					print "Can not {0} {1}: {2}".format(self.action,job.name,str(e))
+				if session!=None:
+					pool.release(session,not success)
+			self.finish(job,success)
+		if sqlConnection!=None:
+			sqlConnection.close()
+
+
+class sql2NeoCheckpoint(object):
+	"""sql2NeoCheckpoint records the progress of an import in a local JSON file so a failed import can be resumed. The file is replaced atomically after every update.
+
+	:param path: path of the checkpoint file, it is created if it does not exist
+	:type path: str"""
+	path=""
+	"""Path of the checkpoint file"""
+	jobs={}
+	"""job id => {'last':<last committed key>,'rows':<committed rows>,'done':<finished>,'watermark':<high water mark of the last sync>}"""
+	def __init__(self,path):
+		self.path=path
+		self.jobs={}
+		self.lock=threading.Lock()
+		if os.path.exists(path):
+			with open(path) as f:
+				self.jobs=json.load(f)
+
+	def get(self,jobId):
+		"""Returns the recorded state of *jobId*, an empty dictionary if nothing was recorded yet"""
+		with self.lock:
+			return dict(self.jobs.get(jobId,{}))
+
+	def update(self,jobId,last,rows):
+		"""Records *last* as the last committed key of *jobId*"""
+		with self.lock:
+			self.jobs[jobId]={'last':last,'rows':rows,'done':False}
+			self.save()
+
+	def finish(self,jobId):
+		"""Marks *jobId* as finished"""
+		with self.lock:
+			state=self.jobs.get(jobId,{})
+			state['done']=True
+			self.jobs[jobId]=state
+			self.save()
+
+	def setWatermark(self,jobId,watermark):
+		"""Records the high water mark of the change column of *jobId* for incremental syncs"""
+		with self.lock:
+			state=self.jobs.get(jobId,{})
+			state['watermark']=watermark
+			self.jobs[jobId]=state
+			self.save()
+
+	def save(self):
+		"""Writes the checkpoint file, replacing the previous one only after it was written completely"""
+		tmp=self.path+".tmp"
+		with open(tmp,'w') as f:
+			json.dump(self.jobs,f,indent=1,sort_keys=True,default=str)
+			f.flush()
+			os.fsync(f.fileno())
+		os.rename(tmp,self.path)
+
+
+class sql2NeoPipeline(object):
+	"""sql2NeoPipeline overlaps reading SQL rows, mapping them and loading them into Neo4j. Extraction and mapping run on their own threads and pass chunks of rows through bounded queues, so a slow stage blocks the stages in front of it instead of buffering rows without limit. Loading happens in the thread consuming `run`.
+
+	:param queueSize: maximum number of chunks waiting between two stages
+	:type queueSize: int
+	:param chunkSize: rows per chunk passed between the stages
+	:type chunkSize: int"""
+	queueSize=8
+	"""Maximum number of chunks waiting between two stages"""
+	chunkSize=1000
+	"""Rows per chunk passed between the stages"""
+	busy={}
+	"""Stage name ('extract', 'map', 'load') => seconds spent working instead of waiting on a queue"""
+	elapsed=0
+	"""Wall clock seconds of the last run"""
+	done=object()
+	"""Marks the end of the rows in a queue"""
+	def __init__(self,queueSize=8,chunkSize=1000):
+		self.queueSize=queueSize
+		self.chunkSize=chunkSize
+		self.busy={'extract':0.0,'map':0.0,'load':0.0}
+
+	def put(self,queue,item):
+		"""Puts *item* into *queue*, gives up if the pipeline was stopped. Returns the seconds spent waiting"""
+		start=time.time()
+		while not self.stopped.is_set():
+			try:
+				queue.put(item,timeout=0.1)
+				break
+			except Queue.Full:
+				pass
+		return time.time()-start
+
+	def extract(self,rows):
+		"""Extraction stage: reads *rows* and puts them into the first queue in chunks"""
+		start=time.time()
+		waited=0.0
+		try:
+			chunk=[]
+			for row in rows:
+				chunk.append(row)
+				if len(chunk)>=self.chunkSize:
+					waited+=self.put(self.extracted,chunk)
+					chunk=[]
+					if self.stopped.is_set():
+						return
+			if len(chunk)>0:
+				waited+=self.put(self.extracted,chunk)
+		except Exception as e:
+			waited+=self.put(self.extracted,e)
+		finally:
+			waited+=self.put(self.extracted,self.done)
+			self.busy['extract']=time.time()-start-waited
+
+	def map(self,mapRow):
+		"""Mapping stage: maps the chunks of the first queue with *mapRow* and puts them into the second queue"""
+		start=time.time()
+		waited=0.0
+		try:
+			while True:
+				getStart=time.time()
+				try:
+					chunk=self.extracted.get(timeout=0.1)
+				except Queue.Empty:
+					# the extraction stage gives up without a final chunk once the pipeline was stopped
+					if self.stopped.is_set():
+						return
+					continue
+				finally:
+					waited+=time.time()-getStart
+				if chunk is self.done or isinstance(chunk,Exception):
+					waited+=self.put(self.mapped,chunk)
+					return
+				waited+=self.put(self.mapped,[mapRow(row) for row in chunk])
+				if self.stopped.is_set():
+					return
+		except Exception as e:
+			waited+=self.put(self.mapped,e)
+			waited+=self.put(self.mapped,self.done)
+		finally:
+			self.busy['map']=time.time()-start-waited
+
+	def run(self,rows,mapRow):
+		"""Generator over the mapped *rows*. Extraction and mapping run in the background while the caller loads the yielded items, errors of the background stages are raised here"""
+		self.extracted=Queue.Queue(self.queueSize)
+		self.mapped=Queue.Queue(self.queueSize)
+		self.stopped=threading.Event()
+		threads=[threading.Thread(target=self.extract,args=(rows,)),threading.Thread(target=self.map,args=(mapRow,))]
+		start=time.time()
+		waited=0.0
+		for t in threads:
+			t.daemon=True
+			t.start()
+		try:
+			while True:
+				getStart=time.time()
+				chunk=self.mapped.get()
+				waited+=time.time()-getStart
+				if chunk is self.done:
+					break
+				if isinstance(chunk,Exception):
+					raise chunk
+				for item in chunk:
+					yield item
+		finally:
+			self.stopped.set()
+			for t in threads:
+				t.join()
+			self.elapsed=time.time()-start
+			self.busy['load']=self.elapsed-waited
+
+	def utilization(self):
+		"""Returns stage name => share of the last run's wall clock time the stage was working"""
+		return dict((stage,(seconds/self.elapsed if self.elapsed>0 else 0.0)) for stage,seconds in self.busy.iteritems())
+
+	def __str__(self):
+		u=self.utilization()
+		return "extract {0:.0%}, map {1:.0%}, load {2:.0%} busy in {3:.3f}s".format(u['extract'],u['map'],u['load'],self.elapsed)
+
+
+class sql2NeoPartitioner(object):
+	"""sql2NeoPartitioner splits rows into *partitions* by a hash of their key and loads every partition on its own thread. Rows with the same key always end up in the same partition. The rows are read on the calling thread and passed to the partitions in chunks through bounded queues.
+
+	:param partitions: number of partitions
+	:type partitions: int
+	:param queueSize: maximum number of chunks waiting per partition
+	:type queueSize: int
+	:param chunkSize: rows per chunk passed to a partition
+	:type chunkSize: int"""
+	partitions=4
+	"""Number of partitions"""
+	queueSize=8
+	"""Maximum number of chunks waiting per partition"""
+	chunkSize=1000
+	"""Rows per chunk passed to a partition"""
+	counts=[]
+	"""Number of rows per partition of the last run"""
+	done=object()
+	"""Marks the end of the rows in a queue"""
+	class Stopped(Exception):
+		"""Raised in partitions still running after another partition failed"""
+		pass
+
+	def __init__(self,partitions=4,queueSize=8,chunkSize=1000):
+		self.partitions=partitions
+		self.queueSize=queueSize
+		self.chunkSize=chunkSize
+		self.counts=[0]*partitions
+
+	def put(self,queue,item):
+		"""Puts *item* into *queue*, gives up if a partition failed"""
+		while not self.stopped.is_set():
+			try:
+				queue.put(item,timeout=0.1)
+				return
+			except Queue.Full:
+				pass
+
+	def rows(self,queue):
+		"""Generator over the rows of a partition's *queue*, raises `Stopped` if another partition failed"""
+		while True:
+			try:
+				chunk=queue.get(timeout=0.1)
+			except Queue.Empty:
+				if self.stopped.is_set():
+					raise self.Stopped()
+				continue
+			if chunk is self.done:
+				return
+			for row in chunk:
+				yield row
+
+	def work(self,partition,load):
+		"""Partition thread: calls *load(partition,rows)*, the first error stops all partitions"""
+		try:
+			load(partition,self.rows(self.queues[partition]))
+		except self.Stopped:
+			pass
+		except Exception as e:
+			self.errors.append(e)
+			self.stopped.set()
+
+	def run(self,rows,key,load):
+		"""Distributes *rows* by the hash of *key(row)* and calls *load(partition,rows)* once per partition on its own thread. Returns when all partitions are loaded, the first error of a partition or of reading *rows* is raised"""
+		self.queues=[Queue.Queue(self.queueSize) for i in xrange(self.partitions)]
+		self.stopped=threading.Event()
+		self.errors=[]
+		self.counts=[0]*self.partitions
+		threads=[threading.Thread(target=self.work,args=(i,load)) for i in xrange(self.partitions)]
+		for t in threads:
+			t.daemon=True
+			t.start()
+		try:
+			chunks=[[] for i in xrange(self.partitions)]
+			for row in rows:
+				partition=hash(key(row))%self.partitions
+				chunks[partition].append(row)
+				if len(chunks[partition])>=self.chunkSize:
+					self.counts[partition]+=len(chunks[partition])
+					self.put(self.queues[partition],chunks[partition])
+					chunks[partition]=[]
+					if self.stopped.is_set():
+						break
+			for partition,chunk in enumerate(chunks):
+				if len(chunk)>0:
+					self.counts[partition]+=len(chunk)
+					self.put(self.queues[partition],chunk)
+				self.put(self.queues[partition],self.done)
+		except Exception:
+			self.stopped.set()
+			raise
+		finally:
+			for t in threads:
+				t.join()
+		if len(self.errors)>0:
+			raise self.errors[0]
+
+
+class sql2NeoExternalSort(object):
+	"""sql2NeoExternalSort sorts items by a key without holding more than *maxItems* of them in memory. Sorted runs of *maxItems* items are spilled to temporary files and merged while the result is read.
+
+	:param maxItems: number of items sorted in memory before they are spilled to disk
+	:type maxItems: int
+	:param directory: *optional* directory of the temporary files, defaults to the system's temporary directory
+	:type directory: str"""
+	maxItems=1000000
+	"""Number of items sorted in memory before they are spilled to disk"""
+	directory=None
+	"""Directory of the temporary files, None uses the system's temporary directory"""
+	blockSize=1000
+	"""Number of items pickled at once when spilling"""
+	runs=0
+	"""Number of runs spilled to disk by the last sort"""
+	def __init__(self,maxItems=1000000,directory=None):
+		self.maxItems=maxItems
+		self.directory=directory
+		self.runs=0
+
+	def sort(self,items,key):
+		"""Generator over (key, item) of *items* in ascending order of *key(item)*, items with equal keys keep their order"""
+		files=[]
+		chunk=[]
+		try:
+			for seq,item in enumerate(items):
+				chunk.append((key(item),seq,item))
+				if len(chunk)>=self.maxItems:
+					chunk.sort()
+					files.append(self.spill(chunk))
+					chunk=[]
+			chunk.sort()
+			self.runs=len(files)
+			if len(files)==0:
+				merged=iter(chunk)
+			else:
+				files.append(self.spill(chunk))
+				chunk=[]
+				merged=heapq.merge(*[self.read(f) for f in files])
+			for k,seq,item in merged:
+				yield k,item
+		finally:
+			for f in files:
+				f.close()
+
+	def spill(self,chunk):
+		"""Writes the sorted *chunk* to a temporary file, which is deleted once it is closed"""
+		f=tempfile.TemporaryFile(dir=self.directory)
+		for i in xrange(0,len(chunk),self.blockSize):
+			cPickle.dump(chunk[i:i+self.blockSize],f,cPickle.HIGHEST_PROTOCOL)
+		f.seek(0)
+		return f
+
+	def read(self,f):
+		"""Generator over the items of a spilled run"""
+		while True:
+			try:
+				block=cPickle.load(f)
+			except EOFError:
+				return
+			for entry in block:
+				yield entry
+
+
+class sql2NeoHistogram(object):
+	"""sql2NeoHistogram counts observed values in buckets with fixed upper bounds, like a Prometheus histogram
+
+	:param bounds: ascending upper bounds of the buckets, values above the last bound are only counted in the total
+	:type bounds: list"""
+	bounds=[]
+	"""Ascending upper bounds of the buckets"""
+	counts=[]
+	"""Number of observed values per bucket (not cumulative)"""
+	count=0
+	"""Number of observed values"""
+	sum=0.0
+	"""Sum of the observed values"""
+	def __init__(self,bounds):
+		self.bounds=bounds
+		self.counts=[0]*len(bounds)
+		self.count=0
+		self.sum=0.0
+
+	def observe(self,value):
+		"""Adds *value* to the histogram"""
+		self.count+=1
+		self.sum+=value
+		i=bisect.bisect_left(self.bounds,value)
+		if i<len(self.counts):
+			self.counts[i]+=1
+
+	def cumulative(self):
+		"""Returns (upper bound, number of values less or equal to it) per bucket, the last bound is +Inf"""
+		total=0
+		buckets=[]
+		for bound,count in zip(self.bounds,self.counts):
+			total+=count
+			buckets.append((bound,total))
+		buckets.append((float('inf'),self.count))
+		return buckets
+
+	def toDict(self):
+		"""Returns the histogram as JSON serializable dictionary"""
+		return {'count':self.count,'sum':self.sum,'buckets':[['+Inf' if math.isinf(b) else b,c] for b,c in self.cumulative()]}
+
+
+class sql2NeoMetrics(object):
+	"""sql2NeoMetrics records timings (as `sql2NeoHistogram`) and counters per entity and relationship of an import. Timings are in seconds: 'sql_execute', 'sql_fetch', 'sql_export', 'mapping', 'neo4j_append', 'neo4j_commit' and 'index_population' (labeled with the index). Counters are 'rows' read from SQL, 'bytes' sent to Neo4j, 'errors' and commit 'retries'.
+	Listeners added with `addListener` are called with (job label, metric name, value) for every recorded value. The metrics can be written as JSON or in the Prometheus text format, once with `dump` or periodically with `startDumping`"""
+	bounds=[0.0001,0.0005,0.001,0.005,0.01,0.05,0.1,0.5,1,5,10,30,60]
+	"""Upper bounds in seconds of the timing histogram buckets"""
+	timings=['sql_execute','sql_fetch','sql_export','mapping','neo4j_append','neo4j_commit','index_population']
+	"""Names of the recorded timings"""
+	counters=['rows','bytes','errors','retries']
+	"""Names of the recorded counters"""
+	jobs={}
+	"""job label => {'timings':{name:sql2NeoHistogram},'counters':{name:value}}"""
+	listeners=[]
+	"""Callbacks called with (job label, metric name, value) for every recorded value"""
+	def __init__(self):
+		self.jobs={}
+		self.listeners=[]
+		self.lock=threading.Lock()
+		self.dumper=None
+
+	def job(self,label):
+		"""Returns the metrics of *label*, creates them on first use. Expects the lock to be held"""
+		metrics=self.jobs.get(label)
+		if metrics==None:
+			metrics={'timings':dict((name,sql2NeoHistogram(self.bounds)) for name in self.timings),'counters':dict((name,0) for name in self.counters)}
+			self.jobs[label]=metrics
+		return metrics
+
+	def observe(self,label,name,seconds):
+		"""Records the timing *name* of *label*"""
+		with self.lock:
+			self.job(label)['timings'][name].observe(seconds)
+		for listener in self.listeners:
+			listener(label,name,seconds)
+
+	def count(self,label,name,value=1):
+		"""Adds *value* to the counter *name* of *label*"""
+		with self.lock:
+			self.job(label)['counters'][name]+=value
+		for listener in self.listeners:
+			listener(label,name,value)
+
+	def addListener(self,listener):
+		"""Calls *listener(label,name,value)* for every recorded timing and counter"""
+		self.listeners.append(listener)
+
+	def removeListener(self,listener):
+		self.listeners.remove(listener)
+
+	def toDict(self):
+		"""Returns all metrics as JSON serializable dictionary"""
+		with self.lock:
+			return {'time':time.time(),'jobs':dict((label,{'timings':dict((name,h.toDict()) for name,h in m['timings'].iteritems()),'counters':dict(m['counters'])}) for label,m in self.jobs.iteritems())}
+
+	def toJson(self):
+		"""Returns all metrics as JSON"""
+		return json.dumps(self.toDict(),indent=1,sort_keys=True)
+
+	def toPrometheus(self):
+		"""Returns all metrics in the Prometheus text exposition format"""
+		lines=[]
+		with self.lock:
+			jobs=sorted(self.jobs.iteritems())
+			for name in self.timings:
+				metric="sql2neo_{0}_seconds".format(name)
+				lines.append("# TYPE {0} histogram".format(metric))
+				for label,m in jobs:
+					h=m['timings'][name]
+					job=self.escapeLabel(label)
+					for bound,count in h.cumulative():
+						lines.append('{0}_bucket{{job="{1}",le="{2}"}} {3}'.format(metric,job,'+Inf' if math.isinf(bound) else repr(bound),count))
+					lines.append('{0}_sum{{job="{1}"}} {2}'.format(metric,job,repr(h.sum)))
+					lines.append('{0}_count{{job="{1}"}} {2}'.format(metric,job,h.count))
+			for name in self.counters:
+				metric="sql2neo_{0}_total".format(name)
+				lines.append("# TYPE {0} counter".format(metric))
+				for label,m in jobs:
+					lines.append('{0}{{job="{1}"}} {2}'.format(metric,self.escapeLabel(label),m['counters'][name]))
+		return "\n".join(lines)+"\n"
+
+	def escapeLabel(self,label):
+		"""Escapes a Prometheus label value"""
+		return label.replace('\\','\\\\').replace('"','\\"').replace('\n','\\n')
+
+	def dump(self,path,format='json'):
+		"""Writes all metrics to *path* as 'json' or 'prometheus' text, replacing the file only after it was written completely"""
+		text=self.toPrometheus() if format=='prometheus' else self.toJson()
+		tmp=path+".tmp"
+		with open(tmp,'w') as f:
+			f.write(text)
+		os.rename(tmp,path)
+
+	def startDumping(self,path,interval,format='json'):
+		"""Writes the metrics to *path* every *interval* seconds on a background thread until `stopDumping` is called"""
+		self.stopDumping()
+		stopped=threading.Event()
+		def run():
+			while not stopped.wait(interval):
+				try:
+					self.dump(path,format)
+				except (IOError,OSError) as e:
+					print "Can not write metrics to {0}: {1}".format(path,str(e))
+		thread=threading.Thread(target=run)
+		thread.daemon=True
+		thread.start()
+		self.dumper=(thread,stopped)
+
+	def stopDumping(self):
+		"""Stops the periodic dumps started by `startDumping`"""
+		if self.dumper!=None:
+			thread,stopped=self.dumper
+			self.dumper=None
+			stopped.set()
+			thread.join()
+
+
+class sql2NeoTransport(object):
+	"""sql2NeoTransport is the interface between the importer and a Neo4j server. Transactions returned by *create_transaction* provide append(statement, parameters), execute(), commit() and rollback(). Results are lists of records, every record can be indexed by column.
+	Transports are selected with neo4jConfig['TRANSPORT'], see `sql2NeoImporter.transports`
+
+	:param config: Neo4j configuration of the importer
+	:type config: dict"""
+	errors=()
+	"""Exception types raised by the transport for failed statements, connections or transactions"""
+	def __init__(self,config):
+		self.config=config
+
+	def create_transaction(self):
+		"""Returns a new transaction"""
+		raise NotImplementedError()
+
+	def execute(self,statement,parameters=None):
+		"""Executes a single statement in its own transaction and returns its records"""
+		raise NotImplementedError()
+
+	def stream(self,statement,parameters=None):
+		"""Executes a single statement in its own transaction and returns an iterator over its records. Transports that can receive records while they are read override it, by default all records are received first"""
+		return iter(self.execute(statement,parameters))
+
+	def close(self):
+		"""Releases the transport's connections"""
+		pass
+
+
+class sql2NeoRestTransport(sql2NeoTransport):
+	"""sql2NeoRestTransport talks to Neo4j's transactional HTTP endpoint through a py2neo cypher session, py2neo is only imported when this transport is used. Uses config['URL'], e.g. http://localhost:7474/db/data/"""
+	def __init__(self,config):
+		sql2NeoTransport.__init__(self,config)
+		cypher=importlib.import_module('py2neo.cypher')
+		neo4j=importlib.import_module('py2neo.neo4j')
+		self.errors=(neo4j.ClientError, neo4j.ServerError,neo4j.CypherError,cypher.TransactionError)
+		self.session=cypher.Session(config['URL'])
+
+	def create_transaction(self):
+		return self.session.create_transaction()
+
+	def execute(self,statement,parameters=None):
+		return self.session.execute(statement,parameters)
+
+
+class sql2NeoBoltTransport(sql2NeoTransport):
+	"""sql2NeoBoltTransport talks to Neo4j using the binary Bolt protocol of the official neo4j-driver package, which is only imported when this transport is used. Uses config['BOLT_URL'] (e.g. bolt://localhost:7687) and the optional config['USER'] and config['PWD']"""
+	def __init__(self,config):
+		sql2NeoTransport.__init__(self,config)
+		driver=importlib.import_module('neo4j.v1')
+		self.errors=tuple(getattr(m,name) for m in (driver,importlib.import_module('neo4j.exceptions')) for name in ('CypherError','ClientError','TransientError','DatabaseError','ProtocolError','ServiceUnavailable','SessionExpired') if hasattr(m,name))
+		auth=None
+		if config.get('USER')!=None:
+			auth=driver.basic_auth(config['USER'],config.get('PWD',''))
+		self.driver=driver.GraphDatabase.driver(config['BOLT_URL'],auth=auth)
+		self.session=self.driver.session()
+
+	def create_transaction(self):
+		return sql2NeoBoltTransaction(self.session)
+
+	def execute(self,statement,parameters=None):
+		return [record.values() for record in self.session.run(statement,parameters or {})]
+
+	def stream(self,statement,parameters=None):
+		return (record.values() for record in self.session.run(statement,parameters or {}))
+
+	def close(self):
+		self.session.close()
+		self.driver.close()
+
+
+class sql2NeoBoltTransaction(object):
+	"""Transaction of a `sql2NeoBoltTransport`. Appended statements are sent right away, Bolt pipelines them until their results are needed"""
+	def __init__(self,session):
+		self.session=session
+		self.tx=None
+		self.results=[]
+
+	def append(self,statement,parameters=None):
+		if self.tx==None:
+			self.tx=self.session.begin_transaction()
+		self.results.append(self.tx.run(statement,parameters or {}))
+
+	def execute(self):
+		"""Waits for the appended statements and returns their records"""
+		results=[[record.values() for record in result] for result in self.results]
+		self.results=[]
+		return results
+
+	def commit(self):
+		results=self.execute()
+		if self.tx!=None:
+			self.tx.commit()
+			self.tx=None
+		return results
+
+	def rollback(self):
+		self.results=[]
+		if self.tx!=None:
+			self.tx.rollback()
+			self.tx=None
+
+
+class sql2NeoRecordingTransport(sql2NeoTransport):
+	"""sql2NeoRecordingTransport is a local fake of a Neo4j server for tests and benchmarks. It records every committed or executed (statement, parameters) pair in *statements* and answers with the records returned by *respond*, by default only "RETURN 1" returns a record"""
+	class StatementFailed(Exception):
+		"""Raised by *respond* to simulate a failing statement"""
+		pass
+
+	errors=(StatementFailed,)
+	def __init__(self,config=None):
+		sql2NeoTransport.__init__(self,config or {})
+		self.statements=[]
+		self.commits=0
+		self.respond=lambda statement,parameters: [[1]] if statement=="RETURN 1" else []
+
+	def create_transaction(self):
+		return sql2NeoRecordingTransaction(self)
+
+	def execute(self,statement,parameters=None):
+		self.statements.append((statement,parameters))
+		return self.respond(statement,parameters)
+
+
+class sql2NeoRecordingTransaction(object):
+	"""Transaction of a `sql2NeoRecordingTransport`, statements are recorded when they are executed or committed"""
+	def __init__(self,transport):
+		self.transport=transport
+		self.pending=[]
+
+	def append(self,statement,parameters=None):
+		self.pending.append((statement,parameters))
+
+	def execute(self):
+		results=[self.transport.execute(statement,parameters) for statement,parameters in self.pending]
+		self.pending=[]
+		return results
+
+	def commit(self):
+		results=self.execute()
+		self.transport.commits+=1
+		return results
+
+	def rollback(self):
+		self.pending=[]
+
+
+class sql2NeoSessionPool(object):
+	"""sql2NeoSessionPool hands out up to *size* Neo4j sessions of an importer to concurrent threads. Sessions are kept open between checkouts so their connections stay alive, a session that was idle for *checkInterval* seconds or that was released after a failure is checked with a trivial statement before it is handed out again and replaced if the check fails.
+
+	:param importer: importer opening the sessions
+	:type importer: sql2NeoImporter
+	:param size: maximum number of open sessions
+	:type size: int
+	:param checkInterval: seconds a session may be idle before it is checked
+	:type checkInterval: float"""
+	importer=None
+	"""Importer opening the sessions"""
+	size=4
+	"""Maximum number of open sessions"""
+	checkInterval=30
+	"""Seconds a session may be idle before it is checked"""
+	created=0
+	"""Number of currently open sessions"""
+	reconnects=0
+	"""Number of sessions replaced after a failed check"""
+	def __init__(self,importer,size=4,checkInterval=30):
+		self.importer=importer
+		self.size=size
+		self.checkInterval=checkInterval
+		self.idle=Queue.Queue()
+		self.lock=threading.Lock()
+		self.created=0
+		self.reconnects=0
+
+	def acquire(self,block=True):
+		"""Returns a healthy session, opens a new one if less than *size* are open and blocks otherwise until one is released. Returns None instead of blocking if *block* is false"""
+		while True:
+			try:
+				session,used=self.idle.get_nowait()
+			except Queue.Empty:
+				with self.lock:
+					create=self.created<self.size
+					if create:
+						self.created+=1
+				if create:
+					try:
+						return self.importer.createNeo4jSession()
+					except:
+						with self.lock:
+							self.created-=1
+						raise
+				if not block:
+					return None
+				session,used=self.idle.get()
+			if time.time()-used<self.checkInterval or self.check(session):
+				return session
+			self.discard(session)
+			self.reconnects+=1
+
+	def release(self,session,failed=False):
+		"""Returns *session* to the pool, it is checked before its next use if *failed* is true"""
+		self.idle.put((session,0 if failed else time.time()))
+
+	def check(self,session):
+		"""Returns True if *session* can still execute statements"""
+		try:
+			return session.execute("RETURN 1")[0][0]==1
+		except Exception as e:
+			print "Neo4j session failed its health check: {0}".format(str(e))
+			return False
+
+	def discard(self,session):
+		"""Closes a session that is not returned to the pool"""
+		with self.lock:
+			self.created-=1
+		try:
+			session.close()
+		except Exception:
+			pass
+
+	def close(self):
+		"""Closes all idle sessions"""
+		while True:
+			try:
+				session,used=self.idle.get_nowait()
+			except Queue.Empty:
+				break
+			self.discard(session)
+
+
+class sql2NeoSource(object):
+	"""sql2NeoSource is the interface between the importer and a SQL database using DB-API 2.0 connections and cursors. It opens connections, chooses the fastest cursor to read a result and the converters of its column types, and exports query results in bulk.
+	Sources are selected with sqlConfig['SOURCE'], see `sql2NeoImporter.sources`. Queries of the importer use '%s' placeholders and '%%' for a literal '%' if parameters are given
+
+	:param config: SQL configuration of the importer
+	:type config: dict"""
+	errors=()
+	"""Exception types raised by the database module for failed connections and queries"""
+	typeConverters={}
+	"""Column type code of the cursor description => name of the converter method of `sql2NeoImporter` used for the column. Columns of other types use *convertDataType*"""
+	csvTypes={}
+	"""Column type code of the cursor description => neo4j-admin import type of the column ('long' or 'double'), see `sql2NeoImporter.exportCsv`. Columns of other types are exported as strings"""
+	randomFunction="RAND()"
+	"""SQL expression returning a random number between 0 and 1, used to sample rows"""
+	def __init__(self,config):
+		self.config=config
+
+	def connect(self):
+		"""Returns a new connection"""
+		raise NotImplementedError()
+
+	def cursor(self,connection,streaming=False):
+		"""Returns a cursor of *connection*, an unbuffered server side cursor if *streaming* is true"""
+		return connection.cursor()
+
+	def execute(self,cursor,query,parameters=None):
+		"""Executes *query* on *cursor* and returns the number of results or None if it is not known before the rows are fetched"""
+		cursor.execute(query,parameters)
+		if cursor.rowcount<0:
+			return None
+		return cursor.rowcount
+
+	def copy(self,connection,query,out):
+		"""Writes the result of *query* as CSV with a header row to the file *out*, reading it with a streaming cursor"""
+		cursor=self.cursor(connection,True)
+		try:
+			self.execute(cursor,query)
+			writer=csv.writer(out)
+			writer.writerow([d[0] for d in cursor.description])
+			while True:
+				rows=cursor.fetchmany(10000)
+				if not rows:
+					break
+				writer.writerows(rows)
+		finally:
+			cursor.close()
+
+
+class sql2NeoMySQLSource(sql2NeoSource):
+	"""sql2NeoMySQLSource reads from MySQL with the MySQLdb package, which is only imported when this source is used. Uses config['HOST'], config['USER'], config['PWD'] and config['DB']. Streams results with unbuffered server side cursors (SSCursor)"""
+	typeNames={
+		'TINY':'convertNumber','SHORT':'convertNumber','LONG':'convertNumber','INT24':'convertNumber','LONGLONG':'convertNumber',
+		'FLOAT':'convertNumber','DOUBLE':'convertNumber','YEAR':'convertNumber','DECIMAL':'convertDecimal','NEWDECIMAL':'convertDecimal',
+		'VARCHAR':'convertString','VAR_STRING':'convertString','STRING':'convertString','ENUM':'convertString',
+		'TINY_BLOB':'convertString','MEDIUM_BLOB':'convertString','LONG_BLOB':'convertString','BLOB':'convertString',
+		'DATETIME':'convertTimestamp','TIMESTAMP':'convertTimestamp','DATE':'convertTimestamp','NEWDATE':'convertTimestamp',
+		'TIME':'convertTime'
+	}
+	"""MySQLdb FIELD_TYPE constant name => name of the converter method used for the column"""
+	csvTypeNames={
+		'TINY':'long','SHORT':'long','LONG':'long','INT24':'long','LONGLONG':'long','YEAR':'long',
+		'FLOAT':'double','DOUBLE':'double','DECIMAL':'double','NEWDECIMAL':'double',
+		'DATETIME':'long','TIMESTAMP':'long','DATE':'long','NEWDATE':'long'
+	}
+	"""MySQLdb FIELD_TYPE constant name => neo4j-admin import type of the column"""
+	def __init__(self,config):
+		sql2NeoSource.__init__(self,config)
+		self.MySQLdb=importlib.import_module('MySQLdb')
+		importlib.import_module('MySQLdb.cursors')
+		fieldTypes=importlib.import_module('MySQLdb.constants.FIELD_TYPE')
+		self.errors=(self.MySQLdb.Error,)
+		self.typeConverters=dict((getattr(fieldTypes,name),converter) for name,converter in self.typeNames.items())
+		self.csvTypes=dict((getattr(fieldTypes,name),csvType) for name,csvType in self.csvTypeNames.items())
+
+	def connect(self):
+		return self.MySQLdb.connect(
+			host=self.config['HOST'], 
+			user=self.config['USER'],	
+			passwd=self.config['PWD'], 
+			db=self.config['DB']
+			)
+
+	def cursor(self,connection,streaming=False):
+		if streaming:
+			return connection.cursor(self.MySQLdb.cursors.SSCursor)
+		return connection.cursor()
+
+	def execute(self,cursor,query,parameters=None):
+		return cursor.execute(query,parameters)
+
+
+class sql2NeoPostgresSource(sql2NeoSource):
+	"""sql2NeoPostgresSource reads from PostgreSQL with the psycopg2 package, which is only imported when this source is used. Uses config['HOST'], config['USER'], config['PWD'], config['DB'] and the optional config['PORT'].
+	Streams results with named server side cursors and exports them with COPY ... TO STDOUT"""
+	typeConverters={
+		20:'convertNumber',21:'convertNumber',23:'convertNumber',26:'convertNumber',700:'convertNumber',701:'convertNumber',1700:'convertDecimal',16:'convertBoolean',
+		18:'convertString',19:'convertString',25:'convertString',1042:'convertString',1043:'convertString',
+		1082:'convertTimestamp',1114:'convertTimestamp',1184:'convertTimestamp',
+		1186:'convertTime'
+	}
+	"""PostgreSQL type oid => name of the converter method used for the column"""
+	csvTypes={
+		20:'long',21:'long',23:'long',26:'long',700:'double',701:'double',1700:'double',16:'boolean',
+		1082:'long',1114:'long',1184:'long'
+	}
+	"""PostgreSQL type oid => neo4j-admin import type of the column"""
+	randomFunction="RANDOM()"
+	cursors=0
+	"""Number of named cursors opened so far, used to name the next one"""
+	def __init__(self,config):
+		sql2NeoSource.__init__(self,config)
+		self.psycopg2=importlib.import_module('psycopg2')
+		self.errors=(self.psycopg2.Error,)
+		self.cursors=0
+		self.lock=threading.Lock()
+
+	def connect(self):
+		return self.psycopg2.connect(
+			host=self.config['HOST'],
+			port=self.config.get('PORT',5432),
+			user=self.config['USER'],
+			password=self.config['PWD'],
+			dbname=self.config['DB']
+			)
+
+	def cursor(self,connection,streaming=False):
+		if not streaming:
+			return connection.cursor()
+		with self.lock:
+			self.cursors+=1
+			name="sql2neo_{0}".format(self.cursors)
+		return sql2NeoPrefetchCursor(connection.cursor(name))
+
+	def execute(self,cursor,query,parameters=None):
+		try:
+			return sql2NeoSource.execute(self,cursor,query,parameters)
+		except self.errors:
+			# a failed statement aborts the transaction and every following query of the connection
+			cursor.connection.rollback()
+			raise
+
+	def copy(self,connection,query,out):
+		cursor=connection.cursor()
+		try:
+			cursor.copy_expert("COPY ({0}) TO STDOUT WITH CSV HEADER".format(query.strip().rstrip(';')),out)
+		except self.errors:
+			connection.rollback()
+			raise
+		finally:
+			cursor.close()
+
+
+class sql2NeoPrefetchCursor(object):
+	"""Wraps a named psycopg2 cursor, its description is only known after the first fetch so the first rows are fetched right after execute"""
+	def __init__(self,cursor):
+		self.cursor=cursor
+		self.connection=cursor.connection
+		self.prefetched=[]
+
+	@property
+	def description(self):
+		return self.cursor.description
+
+	@property
+	def rowcount(self):
+		return -1
+
+	def execute(self,query,parameters=None):
+		self.cursor.execute(query,parameters)
+		self.prefetched=list(self.cursor.fetchmany(self.cursor.itersize))
+
+	def fetchmany(self,size=1):
+		if self.prefetched:
+			rows=self.prefetched[:size]
+			del self.prefetched[:size]
+			if len(rows)<size:
+				rows.extend(self.cursor.fetchmany(size-len(rows)))
+			return rows
+		return self.cursor.fetchmany(size)
+
+	def fetchone(self):
+		rows=self.fetchmany(1)
+		return rows[0] if rows else None
+
+	def fetchall(self):
+		rows=self.prefetched+list(self.cursor.fetchall())
+		self.prefetched=[]
+		return rows
+
+	def close(self):
+		self.prefetched=[]
+		self.cursor.close()
+
+
+class sql2NeoSQLiteSource(sql2NeoSource):
+	"""sql2NeoSQLiteSource reads from a SQLite database file given by config['DB'], e.g. to run imports locally. SQLite cursors step through results without buffering them, so every cursor streams.
+	Strings are returned as byte strings like MySQLdb does and '%s' placeholders are translated to '?'"""
+	errors=(sqlite3.Error,)
+	randomFunction="(RANDOM()/18446744073709551616.0+0.5)"
+	placeholder=re.compile(r"%(s|%)")
+	"""Pattern of the '%s' placeholders and escaped '%' of parameterized queries"""
+	def connect(self):
+		# pipelined imports fetch rows on a different thread than the one that opened the connection
+		connection=sqlite3.connect(self.config['DB'],check_same_thread=False)
+		connection.text_factory=str
+		return connection
+
+	def execute(self,cursor,query,parameters=None):
+		if parameters==None:
+			cursor.execute(query)
+		else:
+			cursor.execute(self.placeholder.sub(lambda m: '?' if m.group(1)=='s' else '%',query),parameters)
+		return None
+
+
 class sql2NeoImporter(object):
 	"""sql2NeoImporter allows the import of SQL databases to Neo4j currently Entities (Data tables) and Relationships (Tables and foreign keys) are supported. 
 	"""
 	sqlConnection=None
-	"""SQL Connection (MySQLdb)"""
+	"""SQL Connection (DB-API 2.0 connection of *source*)"""
+	source=None
+	"""`sql2NeoSource` of the SQL database"""
 	neo4jConnection=None
-	"""Neo4j Connection (py2neo)"""
+	"""Neo4j Connection (`sql2NeoTransport`)"""
 	entities=[]
 	"""List of entities to migrate"""
 	relationships=[]
 	"""List of relationships to migrate"""
+	streaming=False
+	"""If true queries are read with unbuffered server side cursors (SSCursor) instead of buffering the whole result in memory"""
+	fetchSize=1000
+	"""Number of rows fetched per round trip while iterating over results"""
+	countRows=True
+	"""If true and *streaming* is enabled the result count is determined with a COUNT(*) pre-query. Disable it to skip the additional query"""
+	nodeCaches={}
+	"""`sql2NeoNodeCache` per (label, lookup properties) used to resolve relationship endpoints by node id"""
+	nodeCacheBytes=256*1024*1024
+	"""Approximated memory limit of every node cache in bytes"""
+	transports={'rest':sql2NeoRestTransport,'bolt':sql2NeoBoltTransport,'recording':sql2NeoRecordingTransport}
+	"""Available Neo4j transports by the name used in neo4jConfig['TRANSPORT']"""
+	neo4jErrors=()
+	"""Exception types of the Neo4j transport in use"""
+	sources={'mysql':sql2NeoMySQLSource,'postgres':sql2NeoPostgresSource,'sqlite':sql2NeoSQLiteSource}
+	"""Available SQL sources by the name used in sqlConfig['SOURCE']"""
+	sqlErrors=()
+	"""Exception types of the SQL source in use"""
+	sqlConfig=None
+	"""SQL configuration, used to open additional connections for parallel imports"""
+	neo4jConfig=None
+	"""Neo4j configuration, used to open additional sessions for parallel imports"""
+	sessionPoolSize=4
+	"""Maximum number of Neo4j sessions used at the same time by parallel imports and verifications, see `sql2NeoSessionPool`"""
+	sessionCheckInterval=30
+	"""Seconds a pooled Neo4j session may be idle before it is checked"""
+	metrics=None
+	"""`sql2NeoMetrics` of the importer, recording timings and counters per entity and relationship"""
+	metricsFile=None
+	"""If set `importAll` writes the metrics to this file at the end of the run, and every *metricsInterval* seconds during it"""
+	metricsFormat='json'
+	"""Format of *metricsFile*, 'json' or 'prometheus'"""
+	metricsInterval=None
+	"""Seconds between two writes of *metricsFile* during `importAll`, None writes it only at the end"""
 	def initSqlConnection(self, config):
-		"""Connect to a MySQL Server. Currently used: config.HOST, config.USER, config.PWD, config.DB  
+		"""Connect to a SQL Server. config.SOURCE selects the database ('mysql' by default, see *sources*), MySQL and PostgreSQL use config.HOST, config.USER, config.PWD, config.DB, SQLite uses config.DB as path of the database file
 		"""
+		self.source=self.sources[config.get('SOURCE','mysql')](config)
+		self.sqlErrors=self.source.errors
 		try:
-			self.sqlConnection=MySQLdb.connect(
-				host=config['HOST'], 
-				user=config['USER'],	
-				passwd=config['PWD'], 
-				db=config['DB']
-				)
-		except MySQLdb.Error as e:
-			print "Can not connect to MySQL: %s" % str(e)
+			self.sqlConnection=self.source.connect()
+		except self.sqlErrors as e:
+			print "Can not connect to the SQL database: %s" % str(e)
 
 	def initNeo4jConnection(self, config):
 		"""Connect to a Neo4j Server config.URL is expected to be the URL to a connectable Server. For example: http://localhost:7474/db/data/
+		config.TRANSPORT selects the transport ('rest' by default, see *transports*)
 		"""
 		try:
-			self.neo4jConnection=cypher.Session(config['URL'])
-		except (neo4j.ClientError, neo4j.ServerError) as e:
+			self.neo4jConnection=self.createNeo4jSession(config)
+			self.neo4jErrors=self.neo4jConnection.errors
+		except ImportError:
+			raise
+		except Exception as e:
 			print "Can not connect to Neo4j: %s" % str(e)
 
+	def createSqlConnection(self):
+		"""Opens an additional SQL connection with the configuration the importer was created with"""
+		return self.source.connect()
+
+	def createNeo4jSession(self,config=None):
+		"""Opens an additional Neo4j session (`sql2NeoTransport`) with *config* or the configuration the importer was created with"""
+		if config==None:
+			config=self.neo4jConfig
+		return self.transports[config.get('TRANSPORT','rest')](config)
+
+	def getSessionPool(self):
+		"""Returns the `sql2NeoSessionPool` of the importer, it is created on first use"""
+		with self.sessionPoolLock:
+			if self.sessionPool==None:
+				self.sessionPool=sql2NeoSessionPool(self,self.sessionPoolSize,self.sessionCheckInterval)
+			return self.sessionPool
+
 	def __init__(self, sqlConfig, neo4jConfig):
+		self.sqlConfig=sqlConfig
+		self.neo4jConfig=neo4jConfig
+		self.nodeCaches={}
+		self.nodeCacheLock=threading.Lock()
+		self.sessionPool=None
+		self.sessionPoolLock=threading.Lock()
+		self.batchSizers={}
+		self.batchSizerLock=threading.Lock()
+		self.metrics=sql2NeoMetrics()
 		self.initSqlConnection(sqlConfig)
-		self.initNeo4jConnection(neo4jConfig)
+		if neo4jConfig!=None:
+			self.initNeo4jConnection(neo4jConfig)
+
+	engines=['literal','unwind','pipeline']
+	"""Available write engines for the import methods. 'literal' creates one Cypher statement per SQL row, 'unwind' sends batches of rows as a parameter of a single cached statement, 'pipeline' sends the same batches but reads and maps rows on background threads (see `sql2NeoPipeline`)"""
+	pipelineQueueSize=8
+	"""Maximum number of chunks of *fetchSize* rows waiting between two stages of the 'pipeline' engine"""
+	groupRelationships=None
+	"""None keeps the order of the relationship queries. 'left' or 'right' sorts the rows of every relationship by the lookup key of that node and reports its degree histogram, the batching engines then create all relationships of a node in one batch matching the node once, see `appendGroupedRelationships`"""
+	sortMemoryRows=1000000
+	"""Number of rows sorted in memory when grouping relationships, larger results are sorted on disk by `sql2NeoExternalSort`"""
+	sortDirectory=None
+	"""Directory of the temporary files of the relationship sort, None uses the system's temporary directory"""
+	degreeBounds=[1,2,5,10,100,1000,10000,100000,1000000]
+	"""Upper bounds of the buckets of the reported degree histograms"""
+	deferSchema=None
+	"""Schema plan of `importAll`. None creates all indexes and unique constraints before the nodes are imported, 'constraints' creates the unique constraints after the nodes and before the relationships so node inserts do not check them, 'all' creates indexes and constraints after the nodes so they are populated in bulk"""
+	awaitIndexes=True
+	"""If true `importAll` waits until all indexes are online before the relationships are imported, see `waitForIndexes`"""
+	indexTimeout=600
+	"""Seconds `waitForIndexes` waits for indexes to come online"""
+	indexPollInterval=1.0
+	"""Seconds between two polls of the index states"""
+	surrogateProperty='_sqlid'
+	"""Name of the indexed property storing the SQL key of entities declaring a *sqlKey*, see `removeSurrogateKeys`"""
+	lookupIndexes='create'
+	"""How `importAll` handles relationship lookups without an index (see `missingLookupIndexes`), every such lookup scans all nodes of its label. 'create' creates the missing indexes with the other schema changes, 'strict' refuses to import and 'ignore' only warns"""
+	relationshipPartitions=1
+	"""If greater than 1 every relationship is loaded in this many partitions in parallel, partitioned by its left node, see `importRelationshipPartitioned`. Limited by the free sessions of the session pool (*sessionPoolSize*)"""
+	deadlockRetries=5
+	"""Number of times the commit of a partition is retried after a deadlock or another transient error"""
+	retryDelay=0.1
+	"""Seconds to wait before the first retry of a commit, doubled for every further retry"""
+	adaptiveBatches=False
+	"""If true the rows per commit of every job are tuned by a `sql2NeoBatchSizer` toward *targetCommitLatency* and *targetCommitBytes* instead of being fixed by *commitEvery*, batch statements are limited to the tuned size. The sizes are reported at the end of `importAll`. Not used for single transactions and checkpointed pages"""
+	targetCommitLatency=1.0
+	"""Seconds a commit should take when *adaptiveBatches* is set"""
+	targetCommitBytes=16*1024*1024
+	"""Payload bytes a commit should not exceed when *adaptiveBatches* is set"""
+	clientMemoryLimit=None
+	"""Resident memory of the importer process in bytes at which adaptive batches commit early and shrink, None disables the limit"""
+	minBatchSize=10
+	"""Lower limit of the rows per commit of adaptive batches"""
+	maxBatchSize=1000000
+	"""Upper limit of the rows per commit of adaptive batches"""
+	initialBatchSize=1000
+	"""Rows per commit adaptive batches start with"""
+	def compileMappingPlan(self,description,columns):
+		"""Returns a mapping plan, a list of (index, property name, converter), for the (index, property name) pairs in *columns*. The converter of every column is chosen once from its type code in *description*, see `sql2NeoSource.typeConverters`"""
+		plan=[]
+		for i,name in columns:
+			converter=self.source.typeConverters.get(description[i][1])
+			plan.append((i,name,getattr(self,converter) if converter!=None else self.convertDataType))
+		return plan
+
+	def convertNumber(self,data):
+		"""Converter for numeric columns, falls back to *convertDataType* for NULL and unexpected types"""
+		t=type(data)
+		if t is int or t is long or t is float:
+			return data
+		return self.convertDataType(data)
+
+	def convertString(self,data):
+		"""Converter for character and blob columns, falls back to *convertDataType* for NULL and unexpected types"""
+		if type(data) is str:
+			return data
+		return self.convertDataType(data)
+
+	def convertTimestamp(self,data):
+		"""Converter for date and time stamp columns returning UTC unix timestamps, falls back to *convertDataType* for NULL and unexpected types"""
+		t=type(data)
+		if t is datetime.datetime:
+			return calendar.timegm(data.utctimetuple())
+		if t is datetime.date:
+			return calendar.timegm(data.timetuple())
+		return self.convertDataType(data)
 
-	notChangingTypes=[int, float, str,long]
+	def convertBoolean(self,data):
+		"""Converter for boolean columns, falls back to *convertDataType* for NULL and unexpected types"""
+		if type(data) is bool:
+			return data
+		return self.convertDataType(data)
+
+	def convertDecimal(self,data):
+		"""Converter for exact numeric (decimal) columns returning integral values as int and all others as float, falls back to *convertDataType* for NULL and unexpected types"""
+		if type(data) is decimal.Decimal:
+			if data==data.to_integral_value():
+				return int(data)
+			return float(data)
+		return self.convertDataType(data)
+
+	def convertTime(self,data):
+		"""Converter for time columns, falls back to *convertDataType* for NULL and unexpected types"""
+		if type(data) is datetime.timedelta:
+			return str(data)
+		return self.convertDataType(data)
+
+	notChangingTypes=[int, float, str,long,bool]
 	"""Python types that will be kept when importing into Neo4j"""
-	convertedTypes=[datetime.time, datetime.datetime, datetime.date,datetime.timedelta,type(None)]
+	convertedTypes=[datetime.time, datetime.datetime, datetime.date,datetime.timedelta,decimal.Decimal,type(None)]
 	"""Types that will be converted in *convertedTypes*"""
 	def convertDataType(self,data):
 		"""Converts a datatype recieved from SQL to a Neo4j compatible type. Especially DateTime Types have to be converted to Unix timestamps. Not implemented/unknown types will throw an *TypeNotImplemented* or *TypeNotCompatible* exception. Returns the data converted to the new type"""
@@ -238,9 +2143,11 @@ class sql2NeoImporter(object):
 			if t==datetime.timedelta:
 				return str(data)		# str
 			if t==datetime.datetime:
-				return calendar.timegm(data.timetuple()) # UTC unix timestamp (int)
+				return calendar.timegm(data.utctimetuple()) # UTC unix timestamp (int), aware time stamps are converted to UTC first
 			if t==datetime.date:
 				return calendar.timegm(data.timetuple()) # UTC unix timestamp (int)
+			if t==decimal.Decimal:
+				return self.convertDecimal(data)	# int or float
 			if t==type(None):
 				return ''				# str
 
@@ -258,6 +2165,80 @@ class sql2NeoImporter(object):
 		def __str__(self):
 			return repr(self.value)		
 
+	def executeQuery(self,sqlConnection,query,parameters=None,count=True,streaming=None):
+		"""Executes *query* and returns the cursor and the number of results. Uses an unbuffered cursor if *streaming* (by default the importer's *streaming*) is enabled, the result count is then None unless *countRows* and *count* are enabled. The same applies to sources that can not count a result before it is fetched"""
+		if streaming==None:
+			streaming=self.streaming
+		results=None
+		if streaming and self.countRows and count:
+			results=self.countQuery(sqlConnection,query,parameters)
+		cursor=self.source.cursor(sqlConnection,streaming)
+		try:
+			executed=self.source.execute(cursor,query,parameters)
+		except self.sqlErrors:
+			cursor.close()
+			raise
+		if not streaming:
+			results=executed
+			if results==None and self.countRows and count:
+				results=self.countQuery(sqlConnection,query,parameters)
+		return cursor,results
+
+	def countQuery(self,sqlConnection,query,parameters=None):
+		"""Returns the number of rows *query* returns without fetching them"""
+		cursor=self.source.cursor(sqlConnection)
+		try:
+			self.source.execute(cursor,"SELECT COUNT(*) FROM ({0}) AS sql2neo_count".format(query.strip().rstrip(';')),parameters)
+			return cursor.fetchone()[0]
+		finally:
+			cursor.close()
+
+	def parameterizedSubquery(self,query):
+		"""Prepares *query* to be used as derived table of a parameterized query by removing a trailing ';' and escaping '%'"""
+		return query.strip().rstrip(';').replace('%','%%')
+
+	def fetchRows(self,job):
+		"""Generator over the remaining rows of *job*'s cursor (entity or relationship), fetching *fetchSize* rows per round trip. Closes the cursor when done"""
+		label=self.metricsLabel(job)
+		try:
+			while job.cursor!=None:
+				start=time.time()
+				rows=job.cursor.fetchmany(self.fetchSize)
+				self.metrics.observe(label,'sql_fetch',time.time()-start)
+				if not rows:
+					break
+				self.metrics.count(label,'rows',len(rows))
+				for row in rows:
+					yield row
+		finally:
+			job.close()
+
+	def mapRows(self,job,rows,mapRow):
+		"""Generator applying *mapRow* to *rows*, the mapping time of every chunk of *fetchSize* rows is recorded for *job*"""
+		label=self.metricsLabel(job)
+		chunk=[]
+		for row in rows:
+			chunk.append(row)
+			if len(chunk)>=self.fetchSize:
+				start=time.time()
+				mapped=[mapRow(r) for r in chunk]
+				self.metrics.observe(label,'mapping',time.time()-start)
+				chunk=[]
+				for m in mapped:
+					yield m
+		if len(chunk)>0:
+			start=time.time()
+			mapped=[mapRow(r) for r in chunk]
+			self.metrics.observe(label,'mapping',time.time()-start)
+			for m in mapped:
+				yield m
+
+	def metricsLabel(self,job):
+		"""Returns the label the metrics of an entity or relationship are recorded for"""
+		if isinstance(job,sql2NeoRelationship):
+			return "{0}-{1}-{2}".format(job.leftEntity.name,job.name,job.rightEntitiy.name)
+		return job.name
+
 	def escapeCypher(self, s):
 		"""Escapes a cypher string, currently only escapes ' -> \' """
 		return s.replace("'","\\'")
@@ -268,6 +2249,8 @@ class sql2NeoImporter(object):
 		for el in mappedEntity:
 			if type(mappedEntity[el])==str:
 				data+="{0}:'{1}',".format(el,self.escapeCypher( mappedEntity[el]))
+			elif type(mappedEntity[el])==bool:
+				data+="{0}:{1},".format(el,'true' if mappedEntity[el] else 'false')
 			else:
 				data+="{0}:{1},".format(el,mappedEntity[el])
 		data=data[:-1]
@@ -280,11 +2263,44 @@ class sql2NeoImporter(object):
 		e.importer=self
 
 	def addRelationship(self,r):
-		"""Add a sql2NeoRelationship to the importer job
+		"""Add a sql2NeoRelationship to the importer job. The *lookupMapping* of a relationship declaring *foreignKeys* is built from them
 		"""
+		if r.foreignKeys!=None:
+			r.lookupMapping=[{self.surrogateProperty:(k[0] if type(k)==list and len(k)==1 else k)} for k in r.foreignKeys]
 		self.relationships.append(r)
 		r.importer=self
 
+	def entityIndexes(self,e):
+		"""Returns the properties of entity *e* that are indexed, its *indexes* and the surrogate key property if it declares a *sqlKey*"""
+		if e.sqlKey!=None and self.surrogateProperty not in e.indexes:
+			return e.indexes+[self.surrogateProperty]
+		return e.indexes
+
+	def compositeKey(self,row,indexes):
+		"""Returns the surrogate key combining the columns *indexes* of *row*, their converted values joined by '|'"""
+		return "|".join(str(self.convertDataType(row[i])) for i in indexes)
+
+	def removeSurrogateKeys(self,batchSize=10000):
+		"""Removes the surrogate key property (see *surrogateProperty*) from the nodes of all entities declaring a *sqlKey* in transactions of *batchSize* nodes and drops its index. Returns True on success and False on error"""
+		labels=[]
+		for e in self.entities:
+			if e.sqlKey!=None and e.name not in labels:
+				labels.append(e.name)
+		try:
+			for label in labels:
+				removed=0
+				while True:
+					count=self.neo4jConnection.execute("MATCH (a:{0}) WHERE exists(a.{1}) WITH a LIMIT {{limit}} REMOVE a.{1} RETURN count(a)".format(label,self.surrogateProperty),{'limit':batchSize})[0][0]
+					removed+=count
+					if count<batchSize:
+						break
+				print "Removed {0} from {1} nodes of {2}".format(self.surrogateProperty,removed,label)
+				self.neo4jConnection.execute("DROP INDEX ON :{0}({1})".format(label,self.surrogateProperty))
+			return True
+		except self.neo4jErrors as e:
+			print "Can not remove surrogate keys: {0}".format(str(e))
+			return False
+
 	def testEntities(self):
 		"""Tests all entity queries and prints out the first result of the query as well as the corresponding generated Cypher query. """
 		for e in self.entities:
@@ -294,6 +2310,7 @@ class sql2NeoImporter(object):
 			print "Sql Row: %s" % str(row)
 			print "Mapped row: %s" % str(e.getMappedEntity(row))
 			print "Cypher insert: %s" % str(e.buildCreateQuery(e.getMappedEntity(row)))
+			e.close()
 			print 
 
 	def testRelationships(self):
@@ -304,20 +2321,23 @@ class sql2NeoImporter(object):
 			row=r.cursor.fetchone()
 			print "Sql Row: %s" % str(row)
 			print r.buildCreateQuery(r.getMappedLookup(row))
+			r.close()
 			print ""
 
 
 	def createIndexes(self,textOnly=True,useTx=None):
-		"""Creates and executes the cypher queries for all entities' indexes. Returns True on sucesss and False on error"""
-		if useTx== None:
-			tx=self.neo4jConnection.create_transaction()
-		else:
+		"""Creates and executes the cypher queries for all entities' indexes, prints them if *textOnly* is true and no *useTx* is given. Returns True on sucesss and False on error"""
+		if useTx!=None:
 			tx=useTx
+		elif textOnly:
+			tx=None
+		else:
+			tx=self.neo4jConnection.create_transaction()
 		for e in self.entities:
 			print "Creating Indexes for {0}...".format(e.name)
-			for i in e.indexes:
+			for i in self.entityIndexes(e):
 				q="CREATE INDEX ON :{0}({1})".format(e.name,i)
-				if textOnly:
+				if tx==None:
 					print q
 				else:
 					tx.append(q)
@@ -326,21 +2346,23 @@ class sql2NeoImporter(object):
 		try:
 			tx.commit()
 			return True
-		except (neo4j.ClientError, neo4j.ServerError,neo4j.CypherError,cypher.TransactionError) as e:
+		except self.neo4jErrors as e:
 			print "Can not create indexes: {0}".format(str(e))
 			return False
 			
 	def createUniques(self,textOnly=True,useTx=None):
-		"""Creates and executes the cypher queries for all entities' unique constraints. Returns True on sucesss and False on error"""
-		if useTx== None:
-			tx=self.neo4jConnection.create_transaction()
-		else:
+		"""Creates and executes the cypher queries for all entities' unique constraints, prints them if *textOnly* is true and no *useTx* is given. Returns True on sucesss and False on error"""
+		if useTx!=None:
 			tx=useTx
+		elif textOnly:
+			tx=None
+		else:
+			tx=self.neo4jConnection.create_transaction()
 		for e in self.entities:
 			print "Creating Uniques for {0}...".format(e.name)
 			for u in e.uniques:
 				q="CREATE CONSTRAINT ON (p:{0}) ASSERT p.{1} IS UNIQUE".format(e.name,u)
-				if textOnly:
+				if tx==None:
 					print q
 				else:
 					tx.append(q)
@@ -349,152 +2371,1110 @@ class sql2NeoImporter(object):
 		try:
 			tx.commit()
 			return True
-		except (neo4j.ClientError, neo4j.ServerError,neo4j.CypherError,cypher.TransactionError) as e:
+		except self.neo4jErrors as e:
 			print "Can not create indexes: {0}".format(str(e))
 			return False
 
-	def importEntites(self,textOnly=True,useTx=None):
-		"""Imports all entities. Returns True on success and False on error"""
-		if(not textOnly):
-			if useTx== None:
-				tx=self.neo4jConnection.create_transaction()
-			else:
-				tx=useTx
-		for e in self.entities:
-			print "Inserting {0} instances of entity {1}".format(e.execute(self.sqlConnection),e.name)
-			for row in e.cursor:
-				if(textOnly):
-					print str(e.buildCreateQuery(e.getMappedEntity(row)))
-				else:
-					tx.append(str(e.buildCreateQuery(e.getMappedEntity(row))))
-		if textOnly==False and useTx == None:
+	def createSchema(self,textOnly=True,useTx=None,phase='nodes'):
+		"""Creates the indexes, unique constraints and lookup indexes planned for *phase* by *deferSchema*, prints them if *textOnly* is true and no *useTx* is given. Phase 'nodes' is before the nodes are imported, phase 'relationships' after the nodes and before the relationships. Returns True on success and False on error"""
+		withIndexes=(phase=='nodes')==(self.deferSchema!='all')
+		withUniques=(phase=='nodes')==(self.deferSchema==None)
+		if withIndexes and not self.createIndexes(textOnly,useTx=useTx):
+			return False
+		if withUniques and not self.createUniques(textOnly,useTx=useTx):
+			return False
+		if withIndexes and self.lookupIndexes=='create' and not self.createLookupIndexes(textOnly,useTx=useTx):
+			return False
+		return True
+
+	def waitForIndexes(self,since=None,timeout=None):
+		"""Polls the state of all indexes every *indexPollInterval* seconds until they are online and reports how long every index took to come online since *since* (default now), the durations are recorded as 'index_population' in *metrics*. After *timeout* seconds (default *indexTimeout*) the indexes still populating are reported and waiting stops. Returns False if an index failed"""
+		if since==None:
+			since=time.time()
+		if timeout==None:
+			timeout=self.indexTimeout
+		online=set()
+		while True:
 			try:
-				tx.commit()
+				records=self.neo4jConnection.execute("CALL db.indexes() YIELD description, state RETURN description, state")
+			except self.neo4jErrors as e:
+				print "Can not read the index states: {0}".format(str(e))
 				return True
-			except (neo4j.ClientError, neo4j.ServerError,neo4j.CypherError,cypher.TransactionError) as e:
-				print "Can not import entities: {0}".format(str(e))
-				return False
+			populating=[]
+			for description,state in records:
+				if state=='ONLINE':
+					if description not in online:
+						online.add(description)
+						seconds=time.time()-since
+						print "{0} online after {1:.1f}s".format(description,seconds)
+						self.metrics.observe(description,'index_population',seconds)
+				elif state=='FAILED':
+					print "{0} failed to populate".format(description)
+					return False
+				else:
+					populating.append(description)
+			if len(populating)==0:
+				return True
+			if time.time()-since>=timeout:
+				print "Indexes not online after {0}s, continuing while they populate: {1}".format(timeout,", ".join(populating))
+				return True
+			time.sleep(self.indexPollInterval)
+
+	def missingLookupIndexes(self):
+		"""Returns the lookups of all relationships that can not use an index, as list of (label, lookup properties). A lookup can use an index if one of its properties is declared in *idx* or *unq* of an entity with the same label, all other lookups scan every node of the label"""
+		declared=collections.defaultdict(set)
+		for e in self.entities:
+			declared[e.name].update(self.entityIndexes(e))
+			declared[e.name].update(e.uniques)
+		missing=[]
+		for r in self.relationships:
+			for entity,lookup in ((r.leftEntity,r.lookupMapping[0]),(r.rightEntitiy,r.lookupMapping[1])):
+				properties=tuple(sorted(lookup))
+				if len(properties)>0 and declared[entity.name].isdisjoint(properties) and (entity.name,properties) not in missing:
+					missing.append((entity.name,properties))
+		return missing
+
+	def checkLookupIndexes(self,withSchema=True):
+		"""Reports the relationship lookups without an index according to *lookupIndexes*. Returns False if there are any in 'strict' mode. They are only created with the schema changes, a warning is printed if *withSchema* is false"""
+		missing=self.missingLookupIndexes()
+		if len(missing)==0:
+			return True
+		lookups=", ".join("{0}({1})".format(label,",".join(properties)) for label,properties in missing)
+		if self.lookupIndexes=='strict':
+			print "Relationship lookups without an index: {0}. Declare them in idx or unq of the entities".format(lookups)
+			return False
+		if self.lookupIndexes!='create' or not withSchema:
+			print "Warning: relationship lookups without an index scan all nodes of their label: {0}".format(lookups)
+		return True
+
+	def createLookupIndexes(self,textOnly=True,useTx=None):
+		"""Creates one index for every relationship lookup that can not use an index (see `missingLookupIndexes`) on the lookup's first property, which is enough for the lookup to use it. Lookups sharing a property with an index created before use that one. Prints the queries if *textOnly* is true and no *useTx* is given. Returns True on success and False on error"""
+		if useTx!=None:
+			tx=useTx
+		elif textOnly:
+			tx=None
 		else:
+			tx=self.neo4jConnection.create_transaction()
+		created=set()
+		for label,properties in self.missingLookupIndexes():
+			if any((label,p) in created for p in properties):
+				continue
+			print "Relationship lookups on {0}({1}) have no index, creating it...".format(label,",".join(properties))
+			created.add((label,properties[0]))
+			q="CREATE INDEX ON :{0}({1})".format(label,properties[0])
+			if tx==None:
+				print q
+			else:
+				tx.append(q)
+		if textOnly or useTx!=None:
 			return True
-			
-	def importRelationships(self,textOnly=True,useTx=None):
-		"""Imports all relationships. Returns True on success and False on error"""
-		if(not textOnly):
-			if useTx== None:
-				tx=self.neo4jConnection.create_transaction()
+		try:
+			tx.commit()
+			return True
+		except self.neo4jErrors as e:
+			print "Can not create lookup indexes: {0}".format(str(e))
+			return False
+
+	def importEntites(self,textOnly=True,useTx=None,engine='literal',batchSize=1000,commitEvery=None,commitBytes=None):
+		"""Imports all entities. Returns True on success and False on error
+
+		:param engine: 'literal' appends one Cypher statement per row, 'unwind' sends one parameterized statement per *batchSize* rows. *textOnly* always prints literal statements unless *useTx* is given
+		:type engine: str
+		:param batchSize: number of rows per statement when using the 'unwind' engine
+		:type batchSize: int
+		:param commitEvery: commit after this many rows and continue in a new transaction. Ignored if *useTx* is given, pass a `sql2NeoTransaction` instead
+		:type commitEvery: int
+		:param commitBytes: commit after this many payload bytes and continue in a new transaction. Ignored if *useTx* is given
+		:type commitBytes: int"""
+		if engine not in self.engines:
+			print "Unknown import engine: {0}".format(engine)
+			return False
+		try:
+			if useTx!=None:
+				tx=useTx
+			elif textOnly:
+				tx=None
 			else:
+				tx=self.createTransaction(commitEvery,commitBytes)
+			for e in self.entities:
+				self.importEntity(e,tx,engine,batchSize)
+			if textOnly==False and useTx == None:
+				tx.commit()
+			return True
+		except self.neo4jErrors as e:
+			print "Can not import entities: {0}".format(str(e))
+			self.metrics.count(getattr(tx,'label',"transaction"),'errors')
+			return False
+			
+	def importRelationships(self,textOnly=True,useTx=None,engine='literal',batchSize=1000,commitEvery=None,commitBytes=None,useNodeCache=False):
+		"""Imports all relationships. Returns True on success and False on error
+
+		:param engine: 'literal' appends one Cypher statement per row, 'unwind' sends one parameterized statement per *batchSize* rows. *textOnly* always prints literal statements unless *useTx* is given
+		:type engine: str
+		:param batchSize: number of relationships per statement when using the 'unwind' engine
+		:type batchSize: int
+		:param commitEvery: commit after this many rows and continue in a new transaction. Ignored if *useTx* is given, pass a `sql2NeoTransaction` instead
+		:type commitEvery: int
+		:param commitBytes: commit after this many payload bytes and continue in a new transaction. Ignored if *useTx* is given
+		:type commitBytes: int
+		:param useNodeCache: resolve the connected nodes by their node id using a `sql2NeoNodeCache` filled from the already committed entities. Lookups missing in the cache fall back to property matches
+		:type useNodeCache: bool"""
+		if engine not in self.engines:
+			print "Unknown import engine: {0}".format(engine)
+			return False
+		try:
+			if useTx!=None:
 				tx=useTx
-		for r in self.relationships:
-			print "Inserting {0} relationships of type {1}".format(r.execute(self.sqlConnection),r.name)
-			for row in r.cursor:
-				if(textOnly):
-					print str(r.buildCreateQuery(r.getMappedLookup(row)))
+			elif textOnly:
+				tx=None
+			else:
+				tx=self.createTransaction(commitEvery,commitBytes)
+			for r in self.relationships:
+				if self.relationshipPartitions>1 and useTx==None and not textOnly:
+					tx.commit()
+					if not self.importRelationshipPartitioned(r,self.relationshipPartitions,engine,batchSize,commitEvery,commitBytes,useNodeCache,session=self.neo4jConnection):
+						return False
 				else:
-					tx.append(str(r.buildCreateQuery(r.getMappedLookup(row))))
-		if textOnly==False and useTx == None:
-			try:
+					self.importRelationship(r,tx,engine,batchSize,useNodeCache)
+			if textOnly==False and useTx == None:
 				tx.commit()
-				return True
-			except (neo4j.ClientError, neo4j.ServerError,neo4j.CypherError,cypher.TransactionError) as e:
-				print "Can not import relationships: {0}".format(str(e))
-				return False
+			return True
+		except self.neo4jErrors as e:
+			print "Can not import relationships: {0}".format(str(e))
+			self.metrics.count(getattr(tx,'label',"transaction"),'errors')
+			return False
+
+	def importEntity(self,e,tx,engine='literal',batchSize=1000,sqlConnection=None):
+		"""Appends the create queries of all instances of entity *e* to *tx*, prints them if *tx* is None. Uses the importer's connection unless *sqlConnection* is given. Neo4j errors are raised"""
+		if sqlConnection==None:
+			sqlConnection=self.sqlConnection
+		print "Inserting {0} instances of entity {1}".format(e.execute(sqlConnection),e.name)
+		self.appendEntityRows(e,tx,e.rows(),engine,batchSize)
+
+	def appendEntityRows(self,e,tx,rows,engine='literal',batchSize=1000):
+		"""Appends the create queries of the SQL *rows* of entity *e* to *tx*, prints them if *tx* is None"""
+		if isinstance(tx,(sql2NeoTransaction,sql2NeoScriptWriter)):
+			tx.label=self.metricsLabel(e)
+		if tx==None or engine=='literal':
+			for query in self.mapRows(e,rows,lambda row: str(e.buildCreateQuery(e.getMappedEntity(row)))):
+				if tx==None:
+					print query
+				else:
+					tx.append(query)
+		elif engine=='pipeline':
+			pipeline=sql2NeoPipeline(self.pipelineQueueSize,self.fetchSize)
+			mapped=pipeline.run(rows,e.getMappedEntity)
+			try:
+				self.appendBatches(tx,e.buildBatchCreateQuery(),'rows',mapped,batchSize)
+			finally:
+				# stops the background stages right away if loading failed
+				mapped.close()
+			self.metrics.observe(self.metricsLabel(e),'mapping',pipeline.busy['map'])
+			print "Pipeline {0}: {1}".format(e.name,pipeline)
 		else:
+			self.appendBatches(tx,e.buildBatchCreateQuery(),'rows',self.mapRows(e,rows,e.getMappedEntity),batchSize)
+
+	def importRelationship(self,r,tx,engine='literal',batchSize=1000,useNodeCache=False,sqlConnection=None,session=None):
+		"""Appends the create queries of all instances of relationship *r* to *tx*, prints them if *tx* is None. Uses the importer's connections unless *sqlConnection* and *session* are given. Neo4j errors are raised"""
+		if sqlConnection==None:
+			sqlConnection=self.sqlConnection
+		print "Inserting {0} relationships of type {1}".format(r.execute(sqlConnection),r.name)
+		self.appendRelationshipRows(r,tx,r.rows(),engine,batchSize,useNodeCache,session)
+
+	def importRelationshipPartitioned(self,r,partitions,engine='unwind',batchSize=1000,commitEvery=None,commitBytes=None,useNodeCache=False,sqlConnection=None,session=None):
+		"""Imports relationship *r* in up to *partitions* parallel partitions using a `sql2NeoPartitioner`. Rows are assigned to a partition by a hash of the left node's lookup key, so no two partitions create relationships of the same left node. Every partition loads on its own Neo4j session, commits every *commitEvery* rows (10 * *batchSize* if not set) and retries commits failing with a deadlock *deadlockRetries* times. Returns True on success and False on error
+
+		:param session: *optional* session already held by the caller, used by the first partition. The other partitions use the sessions of the importer's `sql2NeoSessionPool` that are available without waiting, so there may be less than *partitions*
+		:type session: sql2NeoTransport"""
+		if sqlConnection==None:
+			sqlConnection=self.sqlConnection
+		pool=self.getSessionPool()
+		# a partition waiting for a session would block the reader and jobs holding sessions may wait for this one, so only sessions available right now are used
+		sessions=[session] if session!=None else []
+		while len(sessions)<partitions:
+			pooled=pool.acquire(False)
+			if pooled==None:
+				break
+			sessions.append(pooled)
+		if len(sessions)==0:
+			sessions.append(pool.acquire())
+		partitions=len(sessions)
+		failed=[False]*partitions
+		results=r.execute(sqlConnection)
+		if results==-1:
+			self.releasePartitionSessions(pool,sessions,failed,session)
+			return False
+		print "Inserting {0} relationships of type {1} in {2} partitions".format(results,r.name,partitions)
+		columns=r.lookupColumns(0)
+		def load(partition,rows):
+			try:
+				tx=self.createTransaction(commitEvery or 10*batchSize,commitBytes,sessions[partition],self.deadlockRetries)
+				self.appendRelationshipRows(r,tx,rows,engine,batchSize,useNodeCache,sessions[partition])
+				tx.commit()
+			except:
+				failed[partition]=True
+				raise
+		partitioner=sql2NeoPartitioner(partitions,self.pipelineQueueSize,self.fetchSize)
+		try:
+			partitioner.run(r.rows(),lambda row: tuple(row[i] for i in columns),load)
+			print "Partitions of {0}: {1} rows".format(self.metricsLabel(r),partitioner.counts)
 			return True
+		except self.neo4jErrors as e:
+			print "Can not import {0}: {1}".format(r.name,str(e))
+			self.metrics.count(self.metricsLabel(r),'errors')
+			return False
+		finally:
+			r.close()
+			self.releasePartitionSessions(pool,sessions,failed,session)
 
-	def importAll(self,textOnly=False,withIndexesAndUniques=True,useSingleTx=False):
-		"""Import all entities, relationships and (optional) indexes and uniques
-		textOnly - if true prints out Cypher queries instead of executing them
-		withIndexesAndUniques - if true imports schema updates as well
-		useSingleTx - if true uses a single transaction for entites an relationships. Schema changes can not be performed within the same transaction then data changes so if withIndexesAndUniques is true actually two transactions will be used"""
-		if useSingleTx:
-			tx=self.neo4jConnection.create_transaction()
+	def releasePartitionSessions(self,pool,sessions,failed,session):
+		"""Returns the pooled *sessions* of a partitioned import to *pool*, the caller's *session* is kept"""
+		for pooled,pooledFailed in zip(sessions,failed):
+			if pooled is not session:
+				pool.release(pooled,pooledFailed)
+
+	def appendRelationshipRows(self,r,tx,rows,engine='literal',batchSize=1000,useNodeCache=False,session=None):
+		"""Appends the create queries of the SQL *rows* of relationship *r* to *tx*, prints them if *tx* is None"""
+		if isinstance(tx,(sql2NeoTransaction,sql2NeoScriptWriter)):
+			tx.label=self.metricsLabel(r)
+		side=None
+		if self.groupRelationships!=None:
+			side=['left','right'].index(self.groupRelationships)
+			rows=self.sortRelationshipRows(r,rows,side)
+		if useNodeCache and tx!=None:
+			self.appendCachedRelationships(tx,r,rows,engine,batchSize,session)
+		elif tx==None or engine=='literal':
+			for query in self.mapRows(r,rows,lambda row: str(r.buildCreateQuery(r.getMappedLookup(row)))):
+				if tx==None:
+					print query
+				else:
+					tx.append(query)
+		elif side!=None:
+			self.appendGroupedRelationships(tx,r,rows,side,batchSize)
+		elif engine=='pipeline':
+			pipeline=sql2NeoPipeline(self.pipelineQueueSize,self.fetchSize)
+			mapped=pipeline.run(rows,r.getMappedPair)
+			try:
+				self.appendBatches(tx,r.buildBatchCreateQuery(),'pairs',mapped,batchSize)
+			finally:
+				# stops the background stages right away if loading failed
+				mapped.close()
+			self.metrics.observe(self.metricsLabel(r),'mapping',pipeline.busy['map'])
+			print "Pipeline {0}: {1}".format(r.name,pipeline)
 		else:
-			tx=None
-		if withIndexesAndUniques:
-			if not self.createIndexes(textOnly, useTx=tx):
+			self.appendBatches(tx,r.buildBatchCreateQuery(),'pairs',self.mapRows(r,rows,r.getMappedPair),batchSize)
+
+	def importParallel(self,workers=4,engine='literal',batchSize=1000,commitEvery=None,commitBytes=None,useNodeCache=False,checkpoint=None,pageSize=10000,jobs=None):
+		"""Imports all entities and relationships (or the given *jobs*) with a `sql2NeoScheduler` running up to *workers* jobs at the same time. Every job commits in its own transaction(s), see `importJob` for the other parameters. Returns True on success and False on error"""
+		if engine not in self.engines:
+			print "Unknown import engine: {0}".format(engine)
+			return False
+		return sql2NeoScheduler(self,workers,jobs=jobs).run(lambda job,sqlConnection,session: self.importJob(job,sqlConnection,session,engine,batchSize,commitEvery,commitBytes,useNodeCache,checkpoint,pageSize))
+
+	def importJob(self,job,sqlConnection,session,engine='literal',batchSize=1000,commitEvery=None,commitBytes=None,useNodeCache=False,checkpoint=None,pageSize=10000):
+		"""Imports a single entity or relationship in its own transaction(s). Returns True on success and False on error
+
+		:param checkpoint: *optional* `sql2NeoCheckpoint`. Jobs it marks as finished are skipped. Jobs declaring a *key* are read in pages of *pageSize* rows ordered by their key and every page is committed and recorded, so a restarted import continues after the last committed key. Jobs without a key are committed in one transaction and restarted from the beginning
+		:type checkpoint: sql2NeoCheckpoint
+		:param pageSize: rows per page and commit when using a *checkpoint*, a page is extended to all rows sharing its last key
+		:type pageSize: int"""
+		try:
+			if checkpoint!=None:
+				return self.importJobPaged(job,sqlConnection,session,engine,batchSize,useNodeCache,checkpoint,pageSize)
+			if isinstance(job,sql2NeoRelationship) and self.relationshipPartitions>1:
+				return self.importRelationshipPartitioned(job,self.relationshipPartitions,engine,batchSize,commitEvery,commitBytes,useNodeCache,sqlConnection,session)
+			tx=self.createTransaction(commitEvery,commitBytes,session)
+			if isinstance(job,sql2NeoRelationship):
+				self.importRelationship(job,tx,engine,batchSize,useNodeCache,sqlConnection,session)
+			else:
+				self.importEntity(job,tx,engine,batchSize,sqlConnection)
+			tx.commit()
+			return True
+		except self.neo4jErrors as e:
+			print "Can not import {0}: {1}".format(job.name,str(e))
+			self.metrics.count(self.metricsLabel(job),'errors')
+			return False
+
+	def importJobPaged(self,job,sqlConnection,session,engine,batchSize,useNodeCache,checkpoint,pageSize):
+		"""Imports a job page by page recording every committed page in *checkpoint*, see `importJob`"""
+		jobId=self.jobId(job)
+		state=checkpoint.get(jobId)
+		if state.get('done'):
+			print "Skipping {0}, it was finished by a previous run".format(job.name)
+			return True
+		isRelationship=isinstance(job,sql2NeoRelationship)
+		if job.key==None:
+			print "{0} declares no key and is imported in a single transaction".format(job.name)
+			tx=self.createTransaction(session=session,adaptive=False)
+			if isRelationship:
+				self.importRelationship(job,tx,engine,batchSize,useNodeCache,sqlConnection,session)
+			else:
+				self.importEntity(job,tx,engine,batchSize,sqlConnection)
+			tx.commit()
+			checkpoint.finish(jobId)
+			return True
+		query=self.parameterizedSubquery(job.query)
+		last=state.get('last')
+		rows=state.get('rows',0)
+		if last!=None:
+			print "Resuming {0} after {1}={2} ({3} rows already imported)".format(job.name,job.key,last,rows)
+		while True:
+			if last==None:
+				results=job.execute(sqlConnection,"SELECT * FROM ({0}) AS sql2neo_page ORDER BY {1} LIMIT %s".format(query,job.key),(pageSize,))
+			else:
+				results=job.execute(sqlConnection,"SELECT * FROM ({0}) AS sql2neo_page WHERE {1}>%s ORDER BY {1} LIMIT %s".format(query,job.key),(last,pageSize))
+			if results==-1:
 				return False
-			if not self.createUniques(textOnly, useTx=tx):
-				return False	
-			if useSingleTx and not textOnly:
-				print "Committing Schema Changes ... Please wait."
-				try:
-					tx.commit()
-					tx=self.neo4jConnection.create_transaction()
-				except (neo4j.ClientError, neo4j.ServerError,neo4j.CypherError,cypher.TransactionError) as e:
-					print "Can not commit schema Changes: {0}".format(str(e))
+			keyIndex=[d[0] for d in job.description].index(job.key)
+			page=list(job.rows())
+			if len(page)==0:
+				break
+			full=len(page)>=pageSize
+			if full:
+				# the next page starts after the last key, rows sharing it are read completely so none is skipped
+				lastKey=page[-1][keyIndex]
+				page=[row for row in page if row[keyIndex]!=lastKey]
+				if job.execute(sqlConnection,"SELECT * FROM ({0}) AS sql2neo_page WHERE {1}=%s".format(query,job.key),(lastKey,))==-1:
 					return False
-		if not self.importEntites(textOnly, useTx=tx):
+				page.extend(job.rows())
+			tx=self.createTransaction(session=session,adaptive=False)
+			if isRelationship:
+				self.appendRelationshipRows(job,tx,page,engine,batchSize,useNodeCache,session)
+			else:
+				self.appendEntityRows(job,tx,page,engine,batchSize)
+			tx.commit()
+			last=page[-1][keyIndex]
+			rows+=len(page)
+			checkpoint.update(jobId,last,rows)
+			if not full:
+				break
+		checkpoint.finish(jobId)
+		print "Finished {0} - {1} rows".format(job.name,rows)
+		return True
+
+	def jobId(self,job):
+		"""Returns a stable identifier of an entity or relationship for checkpoints"""
+		digest=hashlib.md5(job.query).hexdigest()[:8]
+		if isinstance(job,sql2NeoRelationship):
+			return "relationship:{0}-{1}-{2}:{3}".format(job.leftEntity.name,job.name,job.rightEntitiy.name,digest)
+		return "entity:{0}:{1}".format(job.name,digest)
+
+	def createTransaction(self,commitEvery=None,commitBytes=None,session=None,retries=0,adaptive=True):
+		"""Returns a new `sql2NeoTransaction` on *session* or the importer's Neo4j connection that commits every *commitEvery* rows or *commitBytes* bytes, retries transient commit errors *retries* times and records its latencies in *metrics*. If *adaptive* and *adaptiveBatches* are set the rows per commit are tuned by `batchSizer` instead"""
+		if session==None:
+			session=self.neo4jConnection
+		return sql2NeoTransaction(session,commitEvery,commitBytes,self.metrics,retries,self.retryDelay,self.batchSizer if adaptive and self.adaptiveBatches else None)
+
+	def batchSizer(self,label):
+		"""Returns the `sql2NeoBatchSizer` of the job *label*, it is created on first use starting at *initialBatchSize* rows per commit and kept for later transactions of the job"""
+		with self.batchSizerLock:
+			sizer=self.batchSizers.get(label)
+			if sizer==None:
+				sizer=sql2NeoBatchSizer(self.initialBatchSize,self.targetCommitLatency,self.targetCommitBytes,self.clientMemoryLimit,self.minBatchSize,self.maxBatchSize)
+				self.batchSizers[label]=sizer
+			return sizer
+
+	def batchRows(self,tx,batchSize):
+		"""Returns the number of rows of the next batch statement appended to *tx*, see `sql2NeoTransaction.batchRows`"""
+		if isinstance(tx,sql2NeoTransaction):
+			return tx.batchRows(batchSize)
+		return batchSize
+
+	def reportBatchSizes(self):
+		"""Prints the rows per commit every job settled on with *adaptiveBatches*"""
+		for label,sizer in sorted(self.batchSizers.iteritems()):
+			print "Batch size of {0}: {1}".format(label,sizer)
+
+	def appendCachedRelationships(self,tx,r,rows,engine,batchSize,session=None):
+		"""Appends the create queries for the SQL *rows* of relationship *r* resolving both nodes through the node caches. Rows with a node missing in the cache are matched by their properties"""
+		left=self.getNodeCache(r.leftEntity,r.lookupMapping[0].keys(),session)
+		right=self.getNodeCache(r.rightEntitiy,r.lookupMapping[1].keys(),session)
+		idQuery=r.buildBatchIdCreateQuery()
+		lookupQuery=r.buildBatchCreateQuery()
+		idBatch=[]
+		lookupBatch=[]
+		for row in rows:
+			mappedLookup=r.getMappedLookup(row)
+			leftId=left.get(left.key(mappedLookup[0]))
+			rightId=right.get(right.key(mappedLookup[1]))
+			if leftId!=None and rightId!=None:
+				if engine=='literal':
+					tx.append(r.buildIdCreateQuery(leftId,rightId))
+				else:
+					idBatch.append({'l':leftId,'r':rightId})
+					if len(idBatch)>=self.batchRows(tx,batchSize):
+						tx.append(idQuery,{'pairs':idBatch})
+						idBatch=[]
+			else:
+				if engine=='literal':
+					tx.append(str(r.buildCreateQuery(mappedLookup)))
+				else:
+					lookupBatch.append({'l':mappedLookup[0],'r':mappedLookup[1]})
+					if len(lookupBatch)>=self.batchRows(tx,batchSize):
+						tx.append(lookupQuery,{'pairs':lookupBatch})
+						lookupBatch=[]
+		if len(idBatch)>0:
+			tx.append(idQuery,{'pairs':idBatch})
+		if len(lookupBatch)>0:
+			tx.append(lookupQuery,{'pairs':lookupBatch})
+		print "Node cache {0}".format(left)
+		if right!=left:
+			print "Node cache {0}".format(right)
+
+	def getNodeCache(self,entity,properties,session=None):
+		"""Returns the `sql2NeoNodeCache` of *entity* for the lookup *properties*. A new cache is filled with one bulk read of the entity's nodes using *session* (or the importer's connection), reading stops as soon as the cache is full"""
+		if session==None:
+			session=self.neo4jConnection
+		key=(entity.name,tuple(sorted(properties)))
+		with self.nodeCacheLock:
+			if key not in self.nodeCaches:
+				self.nodeCaches[key]=self.fillNodeCache(entity,properties,session)
+			return self.nodeCaches[key]
+
+	def fillNodeCache(self,entity,properties,session):
+		"""Creates a `sql2NeoNodeCache` and fills it with the node ids of *entity* read by a single label scan, streamed if the transport supports it (see `sql2NeoTransport.stream`). The scan is limited to the number of entries that can fit into *nodeCacheBytes*, so transports receiving all records at once hold no more than that"""
+		cache=sql2NeoNodeCache(entity,properties,self.nodeCacheBytes)
+		query="MATCH (a:{0}) RETURN id(a),{1} LIMIT {2}".format(entity.name,",".join("a.{0}".format(p) for p in cache.properties),cache.maxEntries())
+		print "Filling node cache for {0}({1})...".format(entity.name,",".join(cache.properties))
+		for record in session.stream(query):
+			if not cache.put(tuple(cache.normalize(v) for v in record[1:]),record[0]):
+				print "Node cache for {0} is full, remaining lookups will match by properties".format(entity.name)
+				break
+		return cache
+
+	def sortRelationshipRows(self,r,rows,side):
+		"""Generator over the SQL *rows* of relationship *r* sorted by the lookup columns of the left (*side* 0) or right (*side* 1) node. Prints the histogram of the node degrees once all rows are read"""
+		columns=r.lookupColumns(side)
+		sorter=sql2NeoExternalSort(self.sortMemoryRows,self.sortDirectory)
+		degrees=sql2NeoHistogram(self.degreeBounds)
+		highest=0
+		last=None
+		degree=0
+		for key,row in sorter.sort(rows,lambda row: tuple(row[i] for i in columns)):
+			if degree>0 and key!=last:
+				degrees.observe(degree)
+				highest=max(highest,degree)
+				degree=0
+			last=key
+			degree+=1
+			yield row
+		if degree>0:
+			degrees.observe(degree)
+			highest=max(highest,degree)
+		buckets=[]
+		low=1
+		for bound,count in zip(degrees.bounds,degrees.counts):
+			if count>0:
+				buckets.append("{0}: {1}".format(bound if low==bound else "{0}-{1}".format(low,bound),count))
+			low=bound+1
+		if degrees.count>sum(degrees.counts):
+			buckets.append(">{0}: {1}".format(degrees.bounds[-1],degrees.count-sum(degrees.counts)))
+		print "Degrees of the {0} nodes of {1}: {2} nodes, max {3} - {4} ({5} runs sorted on disk)".format(['left','right'][side],self.metricsLabel(r),degrees.count,highest,", ".join(buckets),sorter.runs)
+
+	def appendGroupedRelationships(self,tx,r,rows,side,batchSize):
+		"""Appends the create queries for the SQL *rows* of relationship *r*, which have to be sorted by the lookup key of the left (*side* 0) or right (*side* 1) node. Rows sharing that node form a group, groups are packed into batches of at most *batchSize* relationships (see `groupBatches`) and the shared node is matched once per group. Transaction limits count the relationships of the groups"""
+		query=r.buildBatchGroupedCreateQuery(side)
+		for batch in self.groupBatches(self.relationshipGroups(r,rows,side),batchSize,tx):
+			tx.append(query,{'groups':batch},sum(len(group['others']) for group in batch))
+
+	def relationshipGroups(self,r,rows,side):
+		"""Generator over the groups of consecutive *rows* sharing the node of *side*, every group is in the form {'k':<lookup of the shared node>,'others':[<lookups of the other nodes>]}"""
+		group=None
+		for mappedLookup in self.mapRows(r,rows,r.getMappedLookup):
+			if group==None or group['k']!=mappedLookup[side]:
+				if group!=None:
+					yield group
+				group={'k':mappedLookup[side],'others':[]}
+			group['others'].append(mappedLookup[1-side])
+		if group!=None:
+			yield group
+
+	def groupBatches(self,groups,batchSize,tx=None):
+		"""Generator packing *groups* (see `relationshipGroups`) into lists of at most *batchSize* relationships. Groups are only split if they have more than *batchSize* relationships, every part of such a group (e.g. of a supernode) is a batch of its own. If *tx* is given *batchSize* is limited by its adaptive batch size, see `batchRows`"""
+		batch=[]
+		size=0
+		rows=self.batchRows(tx,batchSize)
+		for group in groups:
+			if size>0 and size+len(group['others'])>rows:
+				yield batch
+				batch=[]
+				size=0
+				rows=self.batchRows(tx,batchSize)
+			while len(group['others'])>rows:
+				yield [{'k':group['k'],'others':group['others'][:rows]}]
+				group={'k':group['k'],'others':group['others'][rows:]}
+				rows=self.batchRows(tx,batchSize)
+			batch.append(group)
+			size+=len(group['others'])
+		if len(batch)>0:
+			yield batch
+
+	def appendBatches(self,tx,query,parameter,items,batchSize):
+		"""Appends *query* to *tx* once per *batchSize* items, passing each batch as the list parameter *parameter*. Returns the number of items appended"""
+		count=0
+		for batch in self.batches(items,batchSize,tx):
+			tx.append(query,{parameter:batch})
+			count+=len(batch)
+		return count
+
+	def batches(self,items,batchSize,tx=None):
+		"""Generator grouping *items* into lists of *batchSize*. If *tx* is given *batchSize* is limited by its adaptive batch size, see `batchRows`"""
+		batch=[]
+		rows=self.batchRows(tx,batchSize)
+		for item in items:
+			batch.append(item)
+			if len(batch)>=rows:
+				yield batch
+				batch=[]
+				rows=self.batchRows(tx,batchSize)
+		if len(batch)>0:
+			yield batch
+
+	def syncAll(self,stateFile,engine='unwind',batchSize=1000,commitEvery=None,commitBytes=None):
+		"""Synchronizes changes since the last sync. Entities and relationships declaring a *changeColumn* only read rows changed since the high water mark recorded in *stateFile*, all others are read completely. Rows whose change column is NULL are synced on every run. Nodes are merged on their entity's *uniques* and updated, relationships are merged. A changed row of an *exclusive* relationship replaces the relationship of its left node, other relationships whose rows changed their nodes keep the previous relationship as well. Deleted rows are not removed from Neo4j. Returns True on success and False on error
+
+		:param stateFile: path of the JSON file the high water marks are kept in, see `sql2NeoCheckpoint`
+		:type stateFile: str
+		:param engine: 'literal' or 'unwind', see `importEntites`
+		:type engine: str"""
+		if engine not in self.engines:
+			print "Unknown import engine: {0}".format(engine)
 			return False
-		if not self.importRelationships(textOnly, useTx=tx):
+		for e in self.entities:
+			if len(e.uniques)==0:
+				print "Can not sync entity {0}: nodes are merged on uniques but none are declared".format(e.name)
+				return False
+		state=sql2NeoCheckpoint(stateFile)
+		for job in self.entities+self.relationships:
+			if not self.syncJob(job,state,engine,batchSize,commitEvery,commitBytes):
+				return False
+		return True
+
+	def syncJob(self,job,state,engine,batchSize,commitEvery,commitBytes):
+		"""Merges the rows of *job* changed since its high water mark in *state* and records the new high water mark after the commit"""
+		jobId=self.jobId(job)
+		watermark=state.get(jobId).get('watermark')
+		isRelationship=isinstance(job,sql2NeoRelationship)
+		if job.changeColumn==None:
+			print "{0} declares no change column, syncing all rows".format(job.name)
+			results=job.execute(self.sqlConnection)
+		elif watermark==None:
+			print "No high water mark recorded for {0}, syncing all rows".format(job.name)
+			results=job.execute(self.sqlConnection)
+		else:
+			results=job.execute(self.sqlConnection,"SELECT * FROM ({0}) AS sql2neo_sync WHERE {1}>=%s OR {1} IS NULL".format(self.parameterizedSubquery(job.query),job.changeColumn),(watermark,))
+		if results==-1:
 			return False
-		if useSingleTx and not textOnly:
-			print "Committing data changes... Please wait."
+		changed=[None]
+		def tracked(rows,index):
+			for row in rows:
+				if row[index]!=None and (changed[0]==None or row[index]>changed[0]):
+					changed[0]=row[index]
+				yield row
+		rows=job.rows()
+		if job.changeColumn!=None:
+			rows=tracked(rows,[d[0] for d in job.description].index(job.changeColumn))
+		print "Syncing {0} rows of {1}".format(results if results!=None else "changed",job.name)
+		try:
+			tx=self.createTransaction(commitEvery,commitBytes)
+			if isRelationship:
+				if engine=='literal':
+					for row in rows:
+						tx.append(job.buildMergeQuery(job.getMappedLookup(row)))
+				else:
+					self.appendBatches(tx,job.buildBatchMergeQuery(),'pairs',(job.getMappedPair(row) for row in rows),batchSize)
+			else:
+				if engine=='literal':
+					for row in rows:
+						tx.append(job.buildMergeQuery(job.getMappedEntity(row)))
+				else:
+					self.appendBatches(tx,job.buildBatchMergeQuery(),'rows',(job.getMappedEntity(row) for row in rows),batchSize)
+			tx.commit()
+		except self.neo4jErrors as e:
+			print "Can not sync {0}: {1}".format(job.name,str(e))
+			self.metrics.count(self.metricsLabel(job),'errors')
+			return False
+		if changed[0]!=None:
+			state.setWatermark(jobId,changed[0])
+			print "New high water mark of {0}: {1}".format(job.name,changed[0])
+		return True
+
+	def csvKeyProperties(self,e):
+		"""Returns the sorted lookup properties relationships use to find nodes of entity *e*, an empty list if no relationship uses *e* or None if relationships use different lookups"""
+		keys=set()
+		for r in self.relationships:
+			if r.leftEntity is e:
+				keys.add(tuple(sorted(r.lookupMapping[0])))
+			if r.rightEntitiy is e:
+				keys.add(tuple(sorted(r.lookupMapping[1])))
+		if len(keys)>1:
+			return None
+		if len(keys)==0:
+			return []
+		return list(keys.pop())
+
+	def csvId(self,mapped,properties):
+		"""Returns the node id used in CSV files for a mapped entity or lookup"""
+		return "|".join(str(self.csvValue(mapped[p])) for p in properties)
+
+	def csvValue(self,value):
+		"""Converts a mapped value to a value the csv module can write"""
+		if type(value)==unicode:
+			return value.encode('utf-8')
+		if type(value)==bool:
+			return 'true' if value else 'false'
+		return value
+
+	def csvColumnTypes(self,e,mappedRows):
+		"""Returns the neo4j-admin import type suffixes of the properties of entity *e* chosen from the type codes of its description (see `sql2NeoSource.csvTypes`), and an iterator over *mappedRows*. Sources without type codes (e.g. SQLite) are typed by the first value of every column that is not NULL within the first *fetchSize* rows, these rows are read ahead"""
+		types={}
+		untyped=[]
+		for i,name,convert in e.plan:
+			code=e.description[i][1]
+			if code==None:
+				untyped.append(name)
+				types[name]=""
+			else:
+				csvType=self.source.csvTypes.get(code)
+				types[name]=":"+csvType if csvType!=None else ""
+		for indexes,name in e.compositePlan:
+			types[name]=""
+		ahead=[]
+		if len(untyped)>0:
+			for mapped in mappedRows:
+				ahead.append(mapped)
+				for name in list(untyped):
+					if mapped[name]!='':
+						types[name]=self.csvType(mapped[name])
+						untyped.remove(name)
+				if len(untyped)==0 or len(ahead)>=self.fetchSize:
+					break
+		return types,itertools.chain(ahead,mappedRows)
+
+	def csvType(self,value):
+		"""Returns the neo4j-admin import type suffix of a mapped value"""
+		if type(value)==bool:
+			return ":boolean"
+		if type(value) in (int,long):
+			return ":long"
+		if type(value)==float:
+			return ":double"
+		return ""
+
+	def openCsv(self,directory,name,compress):
+		"""Opens a CSV file for writing in *directory*, gzip compressed if *compress* is true. Returns the file and its path"""
+		path=os.path.join(directory,name+(".csv.gz" if compress else ".csv"))
+		if compress:
+			return gzip.open(path,'wb'),path
+		return open(path,'wb',1024*1024),path
+
+	def exportCsv(self,directory,compress=False):
+		"""Streams all entities and relationships into CSV files for the offline importer (neo4j-admin import) and writes the matching command line to import.sh in *directory*. Node ids are built from the lookup properties of the relationships using an entity. Returns True on success and False on error
+
+		:param directory: existing directory the files are written to
+		:type directory: str
+		:param compress: gzip compress the CSV files
+		:type compress: bool"""
+		nodeFiles=[]
+		relationshipFiles=[]
+		keys={}
+		for e in self.entities:
+			keys[id(e)]=self.csvKeyProperties(e)
+			if keys[id(e)]==None:
+				print "Can not export {0}: relationships use different lookup properties for its nodes".format(e.name)
+				return False
+		for i,e in enumerate(self.entities):
+			results=e.execute(self.sqlConnection,streaming=True)
+			if results==-1:
+				return False
+			print "Exporting {0} instances of entity {1}".format(results,e.name)
+			f,path=self.openCsv(directory,"nodes-{0:03d}-{1}".format(i,e.name),compress)
 			try:
-				tx.commit()
-				return True
-			except (neo4j.ClientError, neo4j.ServerError,neo4j.CypherError,cypher.TransactionError) as e:
-				print "Can not import data: {0}".format(str(e))
+				writer=csv.writer(f)
+				e.compileMappingPlan()
+				types,mappedRows=self.csvColumnTypes(e,(e.getMappedEntity(row) for row in e.rows()))
+				columns=sorted(types)
+				writer.writerow([":ID({0})".format(e.name)]+[c+types[c] for c in columns]+[":LABEL"])
+				for n,mapped in enumerate(mappedRows):
+					if len(keys[id(e)])>0:
+						nodeId=self.csvId(mapped,keys[id(e)])
+					else:
+						nodeId=n
+					writer.writerow([nodeId]+[self.csvValue(mapped[c]) for c in columns]+[e.name])
+			finally:
+				f.close()
+			nodeFiles.append(path)
+		for i,r in enumerate(self.relationships):
+			results=r.execute(self.sqlConnection,streaming=True)
+			if results==-1:
 				return False
+			print "Exporting {0} relationships of type {1}".format(results,r.name)
+			f,path=self.openCsv(directory,"relationships-{0:03d}-{1}-{2}-{3}".format(i,r.leftEntity.name,r.name,r.rightEntitiy.name),compress)
+			left=sorted(r.lookupMapping[0])
+			right=sorted(r.lookupMapping[1])
+			try:
+				writer=csv.writer(f)
+				writer.writerow([":START_ID({0})".format(r.leftEntity.name),":END_ID({0})".format(r.rightEntitiy.name),":TYPE"])
+				for row in r.rows():
+					mappedLookup=r.getMappedLookup(row)
+					writer.writerow([self.csvId(mappedLookup[0],left),self.csvId(mappedLookup[1],right),r.name])
+			finally:
+				f.close()
+			relationshipFiles.append(path)
+		command="neo4j-admin import "+" ".join(["--nodes={0}".format(p) for p in nodeFiles]+["--relationships={0}".format(p) for p in relationshipFiles])
+		with open(os.path.join(directory,"import.sh"),'w') as f:
+			f.write(command+"\n")
+		print command
 		return True
 
-	def verifyEntityImport(self):
-		"""Verifies the import if entities. Returns True on success and False on error"""
-		for e in self.entities:
-			rowCount=e.execute(self.sqlConnection)
-			neoCount=len(self.neo4jConnection.execute(str(e.buildCardinalityQuery())))
-			if rowCount!=neoCount:
-				print "{} - SQL and Neo4j cardinality missmatch: SQL: {} / Neo4j: {}".format(e.name,rowCount,neoCount)
+	def exportSql(self,directory,compress=False):
+		"""Writes the unmapped results of all entity and relationship queries as CSV files with a header row to *directory*, using the fastest export path of the SQL source (e.g. COPY ... TO STDOUT for PostgreSQL). The files can be loaded with LOAD CSV. Returns True on success and False on error
+
+		:param directory: existing directory the files are written to
+		:type directory: str
+		:param compress: gzip compress the CSV files
+		:type compress: bool"""
+		jobs=[("entity-{0:03d}-{1}".format(i,e.name),e) for i,e in enumerate(self.entities)]
+		jobs+=[("relationship-{0:03d}-{1}-{2}-{3}".format(i,r.leftEntity.name,r.name,r.rightEntitiy.name),r) for i,r in enumerate(self.relationships)]
+		for name,job in jobs:
+			f,path=self.openCsv(directory,name,compress)
+			try:
+				start=time.time()
+				self.source.copy(self.sqlConnection,job.query,f)
+				self.metrics.observe(self.metricsLabel(job),'sql_export',time.time()-start)
+			except self.sqlErrors as e:
+				print "Can not export {0}: {1}".format(job.name,str(e))
+				self.metrics.count(self.metricsLabel(job),'errors')
 				return False
-			CURSOR_UP_ONE = '\x1b[1A'
-			ERASE_LINE = '\x1b[2K'
-			i=0
-			print
-			for row in e.cursor:
-				i=i+1
-				print(CURSOR_UP_ONE + ERASE_LINE+CURSOR_UP_ONE)
-				print "Verifiyng entity {} - {}/{}".format(e.name,i,rowCount)
-				try:
-					r=self.neo4jConnection.execute(str(e.buildVerifyQuery(e.getMappedEntity(row))))
-				except (neo4j.ClientError, neo4j.ServerError,neo4j.CypherError,cypher.TransactionError) as e:
-					print "Can not verify: {0}".format(str(row))
-					return False
-				
-				if(len(r)==0):
-					print "Could not find: ", row
-					return False
+			finally:
+				f.close()
+			print "Exported {0} to {1}".format(job.name,path)
 		return True
 
-	def verifyRelationshipImport(self):
-		"""Verifies the import if entities. Returns True on success and False on error"""
-		for r in self.relationships:
-			rowCount=r.execute(self.sqlConnection)
-			neoCount=len(self.neo4jConnection.execute(str(r.buildCardinalityQuery())))
-			if rowCount!=neoCount:
-				print "{} {} {} SQL and Neo4j cardinality missmatch: SQL: {} / Neo4j: {}".format(r.leftEntity.name, r.name, r.rightEntitiy.name,rowCount,neoCount)
+	def exportScript(self,directory,compress=False,withIndexesAndUniques=True,commitEvery=1000,shardBytes=1024*1024*1024):
+		"""Writes the Cypher statements of the import as cypher-shell scripts to *directory* using a `sql2NeoScriptWriter`, the schema changes (planned by *deferSchema*) and every entity and relationship get their own files. The order the scripts have to be run in is written to import.sh in *directory*. Needs no Neo4j connection. Returns True on success and False on error
+
+		:param directory: existing directory the scripts are written to
+		:type directory: str
+		:param compress: gzip compress the scripts
+		:type compress: bool
+		:param withIndexesAndUniques: write the schema changes as well
+		:type withIndexesAndUniques: bool
+		:param commitEvery: statements per transaction
+		:type commitEvery: int
+		:param shardBytes: size in bytes after which a file is split at the next commit
+		:type shardBytes: int"""
+		if not self.checkLookupIndexes(withIndexesAndUniques):
+			return False
+		writer=sql2NeoScriptWriter(directory,compress,commitEvery,shardBytes)
+		try:
+			if withIndexesAndUniques and not self.writeSchemaScript(writer,'nodes'):
+				return False
+			if not self.importEntites(True,useTx=writer):
+				return False
+			if withIndexesAndUniques and self.deferSchema!=None and not self.writeSchemaScript(writer,'relationships'):
+				return False
+			if not self.importRelationships(True,useTx=writer):
+				return False
+		finally:
+			writer.close()
+		with open(os.path.join(directory,"import.sh"),'w') as f:
+			for path in writer.files:
+				if compress:
+					f.write("gunzip -c {0} | cypher-shell\n".format(path))
+				else:
+					f.write("cypher-shell < {0}\n".format(path))
+		print "Wrote {0} scripts to {1}".format(len(writer.files),directory)
+		return True
+
+	def writeSchemaScript(self,writer,phase):
+		"""Writes the schema changes of *phase* (see `createSchema`) to a schema script of *writer*, followed by a call waiting for the indexes if *awaitIndexes* is set and the phase has changes. Returns True on success and False on error"""
+		writer.label="schema"
+		if not self.createSchema(True,useTx=writer,phase=phase):
+			return False
+		if self.awaitIndexes and writer.file!=None:
+			# indexes are only populated once their transaction is committed
+			writer.commit()
+			writer.append("CALL db.awaitIndexes({0})".format(self.indexTimeout))
+		writer.close()
+		return True
+
+	def importAll(self,textOnly=False,withIndexesAndUniques=True,useSingleTx=False,engine='literal',batchSize=1000,commitEvery=None,commitBytes=None,useNodeCache=False,workers=1,csvDirectory=None,compressCsv=False,checkpoint=None,pageSize=10000,scriptDirectory=None,compressScript=False):
+		"""Import all entities, relationships and (optional) indexes and uniques
+		textOnly - if true prints out Cypher queries instead of executing them
+		withIndexesAndUniques - if true imports schema updates as well, planned by *deferSchema*. Before the relationships are imported the indexes are awaited if *awaitIndexes* is set
+		useSingleTx - if true uses a single transaction for entites an relationships. Schema changes can not be performed within the same transaction then data changes so if withIndexesAndUniques is true actually two transactions will be used
+		engine - 'literal' for one statement per row or 'unwind' for parameterized batches of *batchSize* rows
+		batchSize - rows per statement for the 'unwind' engine
+		commitEvery - commit data changes every *commitEvery* rows and continue in a new transaction, also when *useSingleTx* is true
+		commitBytes - commit data changes every *commitBytes* bytes of payload and continue in a new transaction
+		useNodeCache - resolve relationship nodes by node id through `sql2NeoNodeCache`. Requires committed entities and is therefore not available with *useSingleTx*
+		workers - if greater than 1 entities and relationships are imported in parallel by a `sql2NeoScheduler` after the schema changes are committed. Not available with *useSingleTx*
+		csvDirectory - if given nothing is imported, instead all entities and relationships are written as CSV files for neo4j-admin import to this directory, see `exportCsv`
+		compressCsv - gzip compress the CSV files written to *csvDirectory*
+		scriptDirectory - if given nothing is imported, instead all Cypher statements are written as cypher-shell scripts to this directory, see `exportScript`. Transactions contain *commitEvery* statements (1000 if not set)
+		compressScript - gzip compress the scripts written to *scriptDirectory*
+		checkpoint - path of a checkpoint file. Entities and relationships declaring a *key* are imported in pages of *pageSize* rows and their progress is recorded after every commit, rerunning the import with the same file skips finished jobs and resumes unfinished ones. Not available with *useSingleTx*
+		pageSize - rows per page and commit when using a *checkpoint*, a page is extended to all rows sharing its last key
+		If *adaptiveBatches* is set the rows per commit of every job are tuned instead of using *commitEvery* and *commitBytes*, *batchSize* only limits the rows per statement
+		Timings and counters are recorded in *metrics* and written to *metricsFile* if it is set"""
+		if csvDirectory!=None:
+			return self.exportCsv(csvDirectory,compressCsv)
+		if scriptDirectory!=None:
+			return self.exportScript(scriptDirectory,compressScript,withIndexesAndUniques,commitEvery or 1000)
+		if self.metricsFile!=None and self.metricsInterval!=None:
+			self.metrics.startDumping(self.metricsFile,self.metricsInterval,self.metricsFormat)
+		try:
+			if checkpoint!=None and useSingleTx:
+				print "Checkpoints require a commit per page and can not be used with a single transaction"
+				return False
+			if useNodeCache and useSingleTx:
+				print "The node cache requires committed entities and can not be used with a single transaction"
 				return False
-			CURSOR_UP_ONE = '\x1b[1A'
-			ERASE_LINE = '\x1b[2K'
-			i=0
-			print
-			for row in r.cursor:
-				i=i+1
-				print(CURSOR_UP_ONE + ERASE_LINE+CURSOR_UP_ONE)
-				print "Verifying relationship {} {} {} - {}/{}".format(r.leftEntity.name, r.name, r.rightEntitiy.name,i,rowCount)
+			if workers>1 and useSingleTx:
+				print "Parallel imports use one transaction per job and can not be used with a single transaction"
+				return False
+			if self.deferSchema not in (None,'constraints','all'):
+				print "Unknown schema plan: {0}".format(self.deferSchema)
+				return False
+			deferred=withIndexesAndUniques and self.deferSchema!=None
+			if deferred and useSingleTx:
+				print "Deferred schema changes need committed nodes and can not be used with a single transaction"
+				return False
+			if not self.checkLookupIndexes(withIndexesAndUniques):
+				return False
+			if useSingleTx and not textOnly:
+				tx=self.createTransaction(commitEvery,commitBytes,adaptive=False)
+			else:
+				tx=None
+			if withIndexesAndUniques:
+				schemaStart=time.time()
+				if not self.createSchema(textOnly, useTx=tx, phase='nodes'):
+					return False
+				if useSingleTx and not textOnly:
+					print "Committing Schema Changes ... Please wait."
+					try:
+						tx.commit()
+					except self.neo4jErrors as e:
+						print "Can not commit schema Changes: {0}".format(str(e))
+						return False
+				if not deferred and self.awaitIndexes and not textOnly and not self.waitForIndexes(schemaStart):
+					return False
+			if checkpoint!=None and not textOnly:
+				checkpoint=sql2NeoCheckpoint(checkpoint)
+			if deferred:
+				if not self.importPhase(True,False,textOnly,tx,engine,batchSize,commitEvery,commitBytes,useNodeCache,workers,checkpoint,pageSize):
+					return False
+				print "Creating deferred schema changes..."
+				schemaStart=time.time()
+				if not self.createSchema(textOnly, phase='relationships'):
+					return False
+				if self.awaitIndexes and not textOnly and not self.waitForIndexes(schemaStart):
+					return False
+				if not self.importPhase(False,True,textOnly,tx,engine,batchSize,commitEvery,commitBytes,useNodeCache,workers,checkpoint,pageSize):
+					return False
+			elif not self.importPhase(True,True,textOnly,tx,engine,batchSize,commitEvery,commitBytes,useNodeCache,workers,checkpoint,pageSize):
+				return False
+			if useSingleTx and not textOnly:
+				print "Committing data changes... Please wait."
 				try:
-					ret=self.neo4jConnection.execute(str(r.buildVerifyQuery(r.getMappedLookup(row))))
-				except (neo4j.ClientError, neo4j.ServerError,neo4j.CypherError,cypher.TransactionError) as e:
-					print "Can not verify: {0}".format(str(row))
+					tx.commit()
+					return True
+				except self.neo4jErrors as e:
+					print "Can not import data: {0}".format(str(e))
 					return False
-				
-				if(len(ret)==0):
-					print "Could not find: ", row
+			return True
+		finally:
+			if self.adaptiveBatches:
+				self.reportBatchSizes()
+			if self.metricsFile!=None:
+				self.metrics.stopDumping()
+				self.metrics.dump(self.metricsFile,self.metricsFormat)
+
+	def importPhase(self,entities,relationships,textOnly,tx,engine,batchSize,commitEvery,commitBytes,useNodeCache,workers,checkpoint,pageSize):
+		"""Imports the entities and/or the relationships for `importAll`, see there for the parameters. *checkpoint* is expected to be a `sql2NeoCheckpoint` or None. Returns True on success and False on error"""
+		jobs=(self.entities if entities else [])+(self.relationships if relationships else [])
+		if checkpoint!=None and not textOnly:
+			if workers>1:
+				return self.importParallel(workers, engine=engine, batchSize=batchSize, useNodeCache=useNodeCache, checkpoint=checkpoint, pageSize=pageSize, jobs=jobs)
+			for job in jobs:
+				if not self.importJob(job,self.sqlConnection,self.neo4jConnection,engine,batchSize,useNodeCache=useNodeCache,checkpoint=checkpoint,pageSize=pageSize):
 					return False
+			return True
+		if workers>1 and not textOnly:
+			return self.importParallel(workers, engine=engine, batchSize=batchSize, commitEvery=commitEvery, commitBytes=commitBytes, useNodeCache=useNodeCache, jobs=jobs)
+		if entities and not self.importEntites(textOnly, useTx=tx, engine=engine, batchSize=batchSize, commitEvery=commitEvery, commitBytes=commitBytes):
+			return False
+		if relationships and not self.importRelationships(textOnly, useTx=tx, engine=engine, batchSize=batchSize, commitEvery=commitEvery, commitBytes=commitBytes, useNodeCache=useNodeCache):
+			return False
 		return True
 
-	def verifyImport(self):
-		"""Verifies that the import of all entites and relationships was completed.
-		This is not reliable if there are duplicated, indistinguishable rows in MySQL """
-		print "Verifying Import "
-		if not self.verifyEntityImport():
+	def verifyEntityImport(self,batchSize=1000,workers=1):
+		"""Verifies the import of entities. Returns True on success and False on error
+
+		:param batchSize: number of rows checked per request
+		:type batchSize: int
+		:param workers: number of entities verified in parallel
+		:type workers: int"""
+		return self.verifyJobs(self.entities,batchSize,workers)
+
+	def verifyRelationshipImport(self,batchSize=1000,workers=1):
+		"""Verifies the import of relationships. Returns True on success and False on error
+
+		:param batchSize: number of rows checked per request
+		:type batchSize: int
+		:param workers: number of relationships verified in parallel
+		:type workers: int"""
+		return self.verifyJobs(self.relationships,batchSize,workers)
+
+	def verifyJobs(self,jobs,batchSize,workers,sampleSize=None,confidence=0.95):
+		"""Verifies the entities and relationships in *jobs*, using a `sql2NeoScheduler` if *workers* is greater than 1"""
+		if workers<=1:
+			success=True
+			for job in jobs:
+				if not self.verifyJob(job,self.sqlConnection,self.neo4jConnection,batchSize,sampleSize,confidence):
+					success=False
+			return success
+		scheduler=sql2NeoScheduler(self,workers,jobs=jobs,ordered=False,action="verify")
+		return scheduler.run(lambda job,sqlConnection,session: self.verifyJob(job,sqlConnection,session,batchSize,sampleSize,confidence))
+
+	def verifyJob(self,job,sqlConnection,session,batchSize,sampleSize=None,confidence=0.95):
+		"""Compares the cardinality of an entity or relationship with count() and checks the existence of its rows in batches of *batchSize*. If *sampleSize* is given only a sample of the rows is checked and the missing rate is estimated. Reports every missing row, returns True if nothing is missing"""
+		isRelationship=isinstance(job,sql2NeoRelationship)
+		if isRelationship:
+			name="{0} {1} {2}".format(job.leftEntity.name,job.name,job.rightEntitiy.name)
+		else:
+			name=job.name
+		success=True
+		try:
+			if sampleSize==None:
+				rowCount=None
+				if self.streaming and not self.countRows:
+					# an unread streaming cursor blocks the connection, count before executing
+					rowCount=self.countQuery(sqlConnection,job.query)
+				results=job.execute(sqlConnection)
+				if results==-1:
+					return False
+				if rowCount==None:
+					rowCount=results
+				if rowCount==None:
+					rowCount=self.countQuery(sqlConnection,job.query)
+				rows=job.rows()
+			else:
+				rowCount=self.countQuery(sqlConnection,job.query)
+				rows=self.sampleRows(job,sqlConnection,sampleSize,rowCount)
+			neoCount=session.execute(str(job.buildCardinalityQuery()))[0][0]
+			if rowCount!=neoCount:
+				print "{} - SQL and Neo4j cardinality missmatch: SQL: {} / Neo4j: {}".format(name,rowCount,neoCount)
+				success=False
+			missing=0
+			checked=0
+			if isRelationship:
+				query=job.buildBatchVerifyQuery()
+				batches=self.batches((job.getMappedPair(row) for row in rows),batchSize)
+			else:
+				query=None
+				batches=self.batches((job.getMappedEntity(row) for row in rows),batchSize)
+			for batch in batches:
+				if isRelationship:
+					records=session.execute(query,{'pairs':batch})
+				else:
+					if query==None:
+						query=job.buildBatchVerifyQuery(batch[0].keys())
+					records=session.execute(query,{'rows':batch})
+				checked+=len(batch)
+				for record in records:
+					print "{0} - Could not find: {1}".format(name,record[0])
+					missing+=1
+			if sampleSize==None:
+				print "Verified {0} - {1}/{2} rows, {3} missing".format(name,checked,rowCount,missing)
+			else:
+				rate,upper=self.missingRate(missing,checked,confidence)
+				print "Verified {0} - sample of {1}/{2} rows, {3} missing, estimated missing rate {4:.4%} (at most {5:.4%} with {6:.0%} confidence)".format(name,checked,rowCount,missing,rate,upper,confidence)
+			return success and missing==0
+		except self.neo4jErrors as e:
+			print "Can not verify {0}: {1}".format(name,str(e))
+			self.metrics.count(self.metricsLabel(job),'errors')
+			job.close()
 			return False
-		return self.verifyRelationshipImport()
+		except self.sqlErrors as e:
+			print "Can not read {0} from SQL: {1}".format(name,str(e))
+			self.metrics.count(self.metricsLabel(job),'errors')
+			job.close()
+			return False
+
+	def sampleRows(self,job,sqlConnection,sampleSize,rowCount):
+		"""Returns a random sample of about *sampleSize* distinct rows of *job*'s query. If the job declares a unique *key* the key range is split into *sampleSize* ranges and one row is read from a random position within every range, so only the sampled rows are read and they are drawn independently of each other (batches lost by a failed import are not sampled as a whole). Otherwise every row is selected with a probability of *sampleSize*/*rowCount*, which needs the database to scan the whole result"""
+		query=self.parameterizedSubquery(job.query)
+		cursor=self.source.cursor(sqlConnection)
+		try:
+			rows=[]
+			stratified=False
+			if job.key!=None:
+				self.source.execute(cursor,"SELECT MIN({1}),MAX({1}),COUNT(DISTINCT {1}),COUNT(*) FROM ({0}) AS sql2neo_sample".format(query,job.key),())
+				low,high,keys,total=cursor.fetchone()
+				# a range of a non-unique key always yields the first row of a key value, the other rows could never be sampled
+				stratified=low!=None and keys==total
+			if not stratified:
+				rate=min(1.0,float(sampleSize)/max(rowCount,1))
+				self.source.execute(cursor,"SELECT * FROM ({0}) AS sql2neo_sample WHERE {1}<%s LIMIT %s".format(query,self.source.randomFunction),(rate,sampleSize))
+				rows=list(cursor.fetchall())
+			else:
+				strata=max(1,min(sampleSize,rowCount))
+				width=float(high-low+1)/strata
+				rangeQuery="SELECT * FROM ({0}) AS sql2neo_sample WHERE {1}>=%s AND {1}<%s ORDER BY {1} LIMIT 1".format(query,job.key)
+				for i in xrange(strata):
+					start=low+width*i
+					end=low+width*(i+1)
+					position=start+random.random()*(end-start)
+					self.source.execute(cursor,rangeQuery,(position,end))
+					stratum=list(cursor.fetchall())
+					if len(stratum)==0:
+						# wrap around to the beginning of the range
+						self.source.execute(cursor,rangeQuery,(start,position))
+						stratum=list(cursor.fetchall())
+					rows.extend(stratum)
+				# the missing rate counts every checked row as an independent draw, so no row may be checked twice
+				seen=set()
+				rows=[row for row in rows if not (tuple(row) in seen or seen.add(tuple(row)))]
+			job.description=cursor.description
+			return rows
+		finally:
+			cursor.close()
+
+	def missingRate(self,missing,checked,confidence):
+		"""Returns the estimated missing rate and the upper bound of its Wilson score interval at *confidence*"""
+		if checked==0:
+			return 0.0,1.0
+		z=self.normalQuantile(1-(1-confidence)/2)
+		rate=float(missing)/checked
+		center=rate+z*z/(2*checked)
+		spread=z*math.sqrt(rate*(1-rate)/checked+z*z/(4*checked*checked))
+		return rate,min(1.0,(center+spread)/(1+z*z/checked))
+
+	def normalQuantile(self,p):
+		"""Returns the quantile *p* of the standard normal distribution"""
+		low,high=-10.0,10.0
+		for i in xrange(100):
+			mid=(low+high)/2
+			if 0.5*(1+math.erf(mid/math.sqrt(2)))<p:
+				low=mid
+			else:
+				high=mid
+		return (low+high)/2
+
+	def verifyImport(self,batchSize=1000,workers=1,mode='full',sampleSize=1000,confidence=0.95):
+		"""Verifies that the import of all entites and relationships was completed. Rows are checked in batches of *batchSize* and up to *workers* entities or relationships are verified in parallel.
+		This is not reliable if there are duplicated, indistinguishable rows in MySQL
+
+		:param mode: 'full' checks every row, 'sample' checks a random sample of *sampleSize* rows per entity and relationship (stratified over its *key* if declared) and reports the estimated missing rate. Cardinalities are always compared on the full data
+		:type mode: str
+		:param sampleSize: rows per entity and relationship checked in 'sample' mode
+		:type sampleSize: int
+		:param confidence: confidence level of the reported upper bound of the missing rate
+		:type confidence: float"""
+		if mode not in ('full','sample'):
+			print "Unknown verification mode: {0}".format(mode)
+			return False
+		print "Verifying Import "
+		return self.verifyJobs(self.entities+self.relationships,batchSize,workers,sampleSize if mode=='sample' else None,confidence)
@@ -0,0 +1,444 @@
+"""Throughput benchmark for sql2neo. Runs `sql2neo.sql2NeoImporter` on a synthetic schema against in-process stand-ins for a SQL database and Neo4j, which need neither MySQLdb nor a Neo4j driver, and reports rows/s, statements/s, payload bytes and peak RSS per phase.
+Results are appended to a JSON file so runs can be compared over time::
+
+	python sql2neo_benchmark.py --rows 100000 --width 8 --fanout 3 --engine unwind --output benchmark.json
+"""
+import sql2neo
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import resource
+import sys
+import threading
+import time
+
+class FIELD_TYPE(object):
+	"""Type codes of the columns of the benchmark tables, the values of the MySQLdb constants of the same name"""
+	LONG=3
+	LONGLONG=8
+	VAR_STRING=253
+
+
+class sql2NeoBenchmarkError(Exception):
+	"""Raised by `sql2NeoBenchmarkCursor` for queries it does not understand"""
+	pass
+
+
+class sql2NeoBenchmarkSchema(object):
+	"""sql2NeoBenchmarkSchema describes a synthetic schema of *tables* entity tables and one relationship table between every pair of consecutive entity tables. Rows are generated on the fly from *seed* so every run reads the same data.
+
+	:param tables: number of entity tables
+	:type tables: int
+	:param rows: number of rows of every entity table
+	:type rows: int
+	:param width: number of columns of every entity table, including the id
+	:type width: int
+	:param fanout: number of relationships per row of the left entity table
+	:type fanout: int
+	:param seed: seed of the generated values
+	:type seed: int"""
+	tables=2
+	"""Number of entity tables"""
+	rows=10000
+	"""Number of rows of every entity table"""
+	width=8
+	"""Number of columns of every entity table, including the id"""
+	fanout=2
+	"""Number of relationships per row of the left entity table"""
+	seed=1
+	"""Seed of the generated values"""
+	def __init__(self,tables=2,rows=10000,width=8,fanout=2,seed=1):
+		self.tables=tables
+		self.rows=rows
+		self.width=max(1,width)
+		self.fanout=fanout
+		self.seed=seed
+
+	def entityTables(self):
+		"""Returns the names of the entity tables"""
+		return ["Node{0}".format(i) for i in xrange(self.tables)]
+
+	def relationshipTables(self):
+		"""Returns (name, left table, right table) of the relationship tables"""
+		names=self.entityTables()
+		return [("Link{0}".format(i),names[i],names[i+1]) for i in xrange(len(names)-1)]
+
+	def description(self,table):
+		"""Returns the DB-API cursor description of *table*"""
+		if table.startswith("Link"):
+			return (("left_id",FIELD_TYPE.LONG)+(None,)*5,("right_id",FIELD_TYPE.LONG)+(None,)*5)
+		columns=[("id",FIELD_TYPE.LONG)+(None,)*5]
+		for i in xrange(1,self.width):
+			if i%2:
+				columns.append(("s{0}".format(i),FIELD_TYPE.VAR_STRING)+(None,)*5)
+			else:
+				columns.append(("n{0}".format(i),FIELD_TYPE.LONG)+(None,)*5)
+		return tuple(columns)
+
+	def count(self,table):
+		"""Returns the number of rows of *table*"""
+		if table.startswith("Link"):
+			return self.rows*self.fanout
+		return self.rows
+
+	def generate(self,table):
+		"""Generator over the rows of *table*"""
+		generator=random.Random("{0}:{1}".format(self.seed,table))
+		if table.startswith("Link"):
+			for i in xrange(self.rows):
+				for j in xrange(self.fanout):
+					yield (i,generator.randrange(self.rows))
+			return
+		for i in xrange(self.rows):
+			row=[i]
+			for c in xrange(1,self.width):
+				if c%2:
+					row.append("value {0} of {1}".format(generator.randrange(1000000),table))
+				else:
+					row.append(generator.randrange(1000000))
+			yield tuple(row)
+
+	def parameters(self):
+		"""Returns the schema parameters as dictionary"""
+		return {'tables':self.tables,'rows':self.rows,'width':self.width,'fanout':self.fanout,'seed':self.seed}
+
+
+class sql2NeoBenchmarkConnection(object):
+	"""DB-API stand-in for a database connection serving the tables of a `sql2NeoBenchmarkSchema`. It understands the queries of the benchmark, 'SELECT * FROM <table>', and the COUNT(*) wrapper of `sql2neo.sql2NeoImporter.countQuery`
+
+	:param schema: schema providing the tables
+	:type schema: sql2NeoBenchmarkSchema
+	:param stats: statistics counting the fetched rows
+	:type stats: sql2NeoBenchmarkStats"""
+	def __init__(self,schema,stats):
+		self.schema=schema
+		self.stats=stats
+
+	def cursor(self,cursorClass=None):
+		return sql2NeoBenchmarkCursor(self)
+
+	def close(self):
+		pass
+
+	def commit(self):
+		pass
+
+
+class sql2NeoBenchmarkCursor(object):
+	"""Cursor of a `sql2NeoBenchmarkConnection`"""
+	selectPattern=re.compile(r"^\s*SELECT \* FROM (\w+)\s*;?\s*$",re.I)
+	countPattern=re.compile(r"^\s*SELECT COUNT\(\*\) FROM \((.*)\) AS \w+\s*$",re.I|re.S)
+	def __init__(self,connection):
+		self.connection=connection
+		self.description=None
+		self.rowcount=-1
+		self.results=iter(())
+
+	def execute(self,query,parameters=None):
+		schema=self.connection.schema
+		match=self.countPattern.match(query)
+		if match!=None:
+			table=self.table(match.group(1))
+			self.description=(("COUNT(*)",FIELD_TYPE.LONGLONG)+(None,)*5,)
+			self.results=iter([(schema.count(table),)])
+			self.rowcount=1
+			return 1
+		table=self.table(query)
+		self.description=schema.description(table)
+		self.results=schema.generate(table)
+		self.rowcount=schema.count(table)
+		return self.rowcount
+
+	def table(self,query):
+		match=self.selectPattern.match(query)
+		if match==None or match.group(1) not in self.connection.schema.entityTables()+[t[0] for t in self.connection.schema.relationshipTables()]:
+			raise sql2NeoBenchmarkError("Query not supported by the benchmark database: {0}".format(query))
+		return match.group(1)
+
+	def fetchone(self):
+		rows=self.fetchmany(1)
+		return rows[0] if rows else None
+
+	def fetchmany(self,size=1):
+		rows=[]
+		for row in self.results:
+			rows.append(row)
+			if len(rows)>=size:
+				break
+		self.connection.stats.add(rows=len(rows))
+		return rows
+
+	def fetchall(self):
+		rows=list(self.results)
+		self.connection.stats.add(rows=len(rows))
+		return rows
+
+	def close(self):
+		self.results=iter(())
+
+
+class sql2NeoBenchmarkTransport(sql2neo.sql2NeoRecordingTransport):
+	"""Recording transport that only counts statements and payload bytes instead of keeping them, so the recorded data does not distort the memory usage. Payload bytes are estimated the way `sql2neo.sql2NeoTransaction.payloadSize` does without a byte limit, so batches are not serialized only to be measured. Cardinality queries are answered with the row counts of the schema, existence checks find every row.
+	Uses config['SCHEMA'] and config['STATS']"""
+	countPattern=re.compile(r"^MATCH \(a:(\w+)\)(?:-\[r:\w+\]->\(b:(\w+)\))? return count")
+	def __init__(self,config):
+		sql2neo.sql2NeoRecordingTransport.__init__(self,config)
+		self.schema=config['SCHEMA']
+		self.stats=config['STATS']
+		self.respond=self.answer
+		# only used to estimate payload sizes, it never opens a transaction
+		self.payload=sql2neo.sql2NeoTransaction(self)
+
+	def execute(self,statement,parameters=None):
+		self.stats.add(statements=1,bytes=self.payload.payloadSize(statement,parameters,False))
+		return self.respond(statement,parameters)
+
+	def answer(self,statement,parameters):
+		if statement=="RETURN 1":
+			return [[1]]
+		match=self.countPattern.match(statement)
+		if match!=None:
+			if match.group(2)!=None:
+				return [[self.schema.rows*self.schema.fanout]]
+			return [[self.schema.rows]]
+		return []
+
+
+class sql2NeoBenchmarkSource(sql2neo.sql2NeoSource):
+	"""Source connecting to a `sql2NeoBenchmarkConnection` instead of a database server, its cursors always stream. Uses config['SCHEMA'] and config['STATS']"""
+	errors=(sql2NeoBenchmarkError,)
+	typeConverters={FIELD_TYPE.LONG:'convertNumber',FIELD_TYPE.LONGLONG:'convertNumber',FIELD_TYPE.VAR_STRING:'convertString'}
+	csvTypes={FIELD_TYPE.LONG:'long',FIELD_TYPE.LONGLONG:'long'}
+	def connect(self):
+		return sql2NeoBenchmarkConnection(self.config['SCHEMA'],self.config['STATS'])
+
+
+class sql2NeoBenchmarkImporter(sql2neo.sql2NeoImporter):
+	"""Importer reading from a `sql2NeoBenchmarkSource` instead of a database server"""
+	sources=dict(sql2neo.sql2NeoImporter.sources,benchmark=sql2NeoBenchmarkSource)
+	transports=dict(sql2neo.sql2NeoImporter.transports,benchmark=sql2NeoBenchmarkTransport)
+
+
+class sql2NeoBenchmarkMemory(object):
+	"""Samples the resident memory of the process every *interval* seconds on a background thread between `start` and `stop` and keeps the peak of the samples, so every phase gets its own peak. The resident memory is read from /proc/self/statm, where it is not available the peak of the whole process (ru_maxrss) is reported instead
+
+	:param interval: seconds between two samples
+	:type interval: float"""
+	interval=0.01
+	"""Seconds between two samples"""
+	peakKb=0
+	"""Peak resident memory in KB sampled since the last start"""
+	def __init__(self,interval=0.01):
+		self.interval=interval
+		self.peakKb=0
+		self.stopped=threading.Event()
+		self.thread=None
+
+	def residentKb(self):
+		"""Returns the current resident memory of the process in KB, None if it can not be read"""
+		try:
+			with open('/proc/self/statm') as f:
+				return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')/1024
+		except (IOError,OSError,ValueError,IndexError):
+			return None
+
+	def sample(self):
+		"""Updates *peakKb* with the current resident memory"""
+		kb=self.residentKb()
+		if kb==None:
+			kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		self.peakKb=max(self.peakKb,kb)
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			self.sample()
+
+	def start(self):
+		"""Starts sampling with a new peak"""
+		self.peakKb=0
+		self.sample()
+		self.stopped.clear()
+		self.thread=threading.Thread(target=self.run)
+		self.thread.daemon=True
+		self.thread.start()
+
+	def stop(self):
+		"""Stops sampling and returns the peak in KB"""
+		self.stopped.set()
+		self.thread.join()
+		self.sample()
+		return self.peakKb
+
+
+class sql2NeoBenchmarkStats(object):
+	"""Thread safe counters of the fetched rows, the sent statements and their payload bytes"""
+	def __init__(self):
+		self.lock=threading.Lock()
+		self.reset()
+
+	def reset(self):
+		with self.lock:
+			self.rows=0
+			self.statements=0
+			self.bytes=0
+
+	def add(self,rows=0,statements=0,bytes=0):
+		with self.lock:
+			self.rows+=rows
+			self.statements+=statements
+			self.bytes+=bytes
+
+
+class sql2NeoBenchmark(object):
+	"""sql2NeoBenchmark builds an importer for a `sql2NeoBenchmarkSchema` and measures the import and verification phases
+
+	:param schema: synthetic schema to import
+	:type schema: sql2NeoBenchmarkSchema
+	:param engine: write engine of the importer, see `sql2neo.sql2NeoImporter.engines`
+	:type engine: str
+	:param batchSize: rows per statement of the batching engines
+	:type batchSize: int
+	:param workers: number of parallel jobs
+	:type workers: int
+	:param verbose: if false the output of the importer is suppressed
+	:type verbose: bool"""
+	phases=['entities','relationships','verify']
+	"""Measured phases in the order they are run"""
+	def __init__(self,schema,engine='unwind',batchSize=1000,workers=1,verbose=False):
+		self.schema=schema
+		self.engine=engine
+		self.batchSize=batchSize
+		self.workers=workers
+		self.verbose=verbose
+		self.stats=sql2NeoBenchmarkStats()
+		config={'SCHEMA':schema,'STATS':self.stats}
+		self.importer=sql2NeoBenchmarkImporter(dict(config,SOURCE='benchmark'),dict(config,TRANSPORT='benchmark'))
+		# entities and relationships are class attributes shared by all importers
+		self.importer.entities=[]
+		self.importer.relationships=[]
+		entities={}
+		for table in schema.entityTables():
+			entities[table]=sql2neo.sql2NeoEntity(table,"SELECT * FROM {0}".format(table),{0:'id'},idx=['id'])
+			entities[table].autoMap=True
+			self.importer.addEntity(entities[table])
+		for name,left,right in schema.relationshipTables():
+			self.importer.addRelationship(sql2neo.sql2NeoRelationship(name.upper(),entities[left],entities[right],"SELECT * FROM {0}".format(name),[{'id':0},{'id':1}]))
+
+	def runPhase(self,name):
+		"""Runs the phase *name* and returns True on success"""
+		importer=self.importer
+		if name=='verify':
+			return importer.verifyImport(batchSize=self.batchSize,workers=self.workers)
+		if self.workers>1:
+			jobs=importer.entities if name=='entities' else importer.relationships
+			return sql2neo.sql2NeoScheduler(importer,self.workers,jobs=jobs,ordered=False).run(lambda job,sqlConnection,session: importer.importJob(job,sqlConnection,session,engine=self.engine,batchSize=self.batchSize))
+		if name=='entities':
+			return importer.importEntites(False,engine=self.engine,batchSize=self.batchSize)
+		return importer.importRelationships(False,engine=self.engine,batchSize=self.batchSize)
+
+	def measure(self,name):
+		"""Runs the phase *name* and returns its measurements"""
+		self.stats.reset()
+		memory=sql2NeoBenchmarkMemory()
+		stdout=sys.stdout
+		if not self.verbose:
+			sys.stdout=open(os.devnull,'w')
+		try:
+			memory.start()
+			start=time.time()
+			success=self.runPhase(name)
+			seconds=time.time()-start
+		finally:
+			peakRssKb=memory.stop()
+			if not self.verbose:
+				sys.stdout.close()
+				sys.stdout=stdout
+		return {
+			'phase':name,
+			'success':bool(success),
+			'seconds':seconds,
+			'rows':self.stats.rows,
+			'statements':self.stats.statements,
+			'bytes':self.stats.bytes,
+			'rowsPerSecond':self.stats.rows/seconds if seconds>0 else None,
+			'statementsPerSecond':self.stats.statements/seconds if seconds>0 else None,
+			'peakRssKb':peakRssKb
+			}
+
+	def run(self):
+		"""Runs all phases and returns the result of the run"""
+		return {
+			'time':datetime.datetime.utcnow().isoformat(),
+			'python':platform.python_version(),
+			'schema':self.schema.parameters(),
+			'engine':self.engine,
+			'batchSize':self.batchSize,
+			'workers':self.workers,
+			'phases':[self.measure(name) for name in self.phases]
+			}
+
+
+def loadResults(path):
+	"""Returns the runs stored in *path*, an empty list if it does not exist"""
+	if not os.path.exists(path):
+		return []
+	with open(path) as f:
+		return json.load(f)
+
+def saveResult(path,result):
+	"""Appends *result* to the runs stored in *path*"""
+	results=loadResults(path)
+	results.append(result)
+	tmp=path+".tmp"
+	with open(tmp,'w') as f:
+		json.dump(results,f,indent=1,sort_keys=True)
+	os.rename(tmp,path)
+	return results
+
+def previousResult(results,result):
+	"""Returns the latest run in *results* before *result* with the same schema and settings, None if there is none"""
+	for previous in reversed(results[:-1]):
+		if all(previous.get(k)==result.get(k) for k in ('schema','engine','batchSize','workers')):
+			return previous
+	return None
+
+def report(result,previous=None):
+	"""Prints the phases of *result*, compared to *previous* if given"""
+	print "{0} engine, batch size {1}, {2} worker(s), schema {3}".format(result['engine'],result['batchSize'],result['workers'],json.dumps(result['schema'],sort_keys=True))
+	before=dict((p['phase'],p) for p in previous['phases']) if previous!=None else {}
+	for phase in result['phases']:
+		line="{phase:<14} {seconds:9.3f}s {rows:>10} rows {rowsPerSecond:>12.0f} rows/s {statements:>8} statements {statementsPerSecond:>10.0f} statements/s {bytes:>12} bytes {peakRssKb:>9} KB peak RSS".format(**dict(phase,rowsPerSecond=phase['rowsPerSecond'] or 0,statementsPerSecond=phase['statementsPerSecond'] or 0))
+		if not phase['success']:
+			line+=" FAILED"
+		old=before.get(phase['phase'])
+		if old!=None and old['rowsPerSecond'] and phase['rowsPerSecond']:
+			line+=" ({0:+.1%} rows/s)".format(phase['rowsPerSecond']/old['rowsPerSecond']-1)
+		print line
+
+def main(argv=None):
+	parser=argparse.ArgumentParser(description="Measures the throughput of sql2neo against in-process stand-ins for a SQL database and Neo4j")
+	parser.add_argument('--tables',type=int,default=2,help="number of entity tables")
+	parser.add_argument('--rows',type=int,default=10000,help="rows per entity table")
+	parser.add_argument('--width',type=int,default=8,help="columns per entity table")
+	parser.add_argument('--fanout',type=int,default=2,help="relationships per row")
+	parser.add_argument('--seed',type=int,default=1,help="seed of the generated data")
+	parser.add_argument('--engine',default='unwind',choices=sql2neo.sql2NeoImporter.engines,help="write engine")
+	parser.add_argument('--batch-size',type=int,default=1000,help="rows per batched statement")
+	parser.add_argument('--workers',type=int,default=1,help="parallel jobs")
+	parser.add_argument('--output',default=None,help="JSON file the result is appended to")
+	parser.add_argument('--verbose',action='store_true',help="show the output of the importer")
+	args=parser.parse_args(argv)
+	schema=sql2NeoBenchmarkSchema(args.tables,args.rows,args.width,args.fanout,args.seed)
+	result=sql2NeoBenchmark(schema,args.engine,args.batch_size,args.workers,args.verbose).run()
+	previous=None
+	if args.output!=None:
+		previous=previousResult(saveResult(args.output,result),result)
+	report(result,previous)
+	return 0 if all(p['success'] for p in result['phases']) else 1
+
+if __name__=='__main__':
+	sys.exit(main())
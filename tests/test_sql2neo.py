@@ -0,0 +1,981 @@
+"""Behavior tests of sql2neo against a SQLite database and the recording Neo4j transport (`sql2neo.sql2NeoRecordingTransport`). Run with::
+
+	python -m unittest discover -s tests
+"""
+import calendar
+import datetime
+import decimal
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import StringIO
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','src'))
+import sql2neo
+import sql2neo_benchmark
+
+
+class sql2NeoTestGraph(object):
+	"""Answers the statements of the recording transport like a small graph database would. Nodes created by 'unwind' statements and relationships created from lookup pairs are kept, so cardinality and verification queries see them.
+	Statements matching *failOn* raise a `sql2NeoRecordingTransport.StatementFailed` with *message* while *failures* is greater than 0"""
+	createNodes=re.compile(r"^UNWIND \{rows\} AS row CREATE \(a:(\w+)\) SET a = row$")
+	createRelationships=re.compile(r"^UNWIND \{pairs\} AS p MATCH \(a:\w+ \{.*\}\) MATCH \(b:\w+ \{.*\}\) CREATE \(a\)-\[:(\w+)\]->\(b\)$")
+	countNodes=re.compile(r"^MATCH \(a:(\w+)\) return count\(a\);$")
+	countRelationships=re.compile(r"^MATCH \(a:\w+\)-\[r:(\w+)\]->\(b:\w+\) return count\(r\)$")
+	verifyNodes=re.compile(r"^UNWIND \{rows\} AS row OPTIONAL MATCH \(a:(\w+) ")
+	verifyRelationships=re.compile(r"^UNWIND \{pairs\} AS p OPTIONAL MATCH \(a:\w+ \{.*\}\)-\[r:(\w+)\]")
+	def __init__(self):
+		self.nodes={}
+		self.relationships={}
+		self.failOn=None
+		self.failures=0
+		self.message="Simulated failure"
+
+	def respond(self,statement,parameters):
+		if self.failOn!=None and self.failures>0 and self.failOn(statement,parameters):
+			self.failures-=1
+			raise sql2neo.sql2NeoRecordingTransport.StatementFailed(self.message)
+		if statement=="RETURN 1":
+			return [[1]]
+		match=self.createNodes.match(statement)
+		if match!=None:
+			self.nodes.setdefault(match.group(1),[]).extend(parameters['rows'])
+			return []
+		match=self.createRelationships.match(statement)
+		if match!=None:
+			self.relationships.setdefault(match.group(1),[]).extend(parameters['pairs'])
+			return []
+		match=self.countNodes.match(statement)
+		if match!=None:
+			return [[len(self.nodes.get(match.group(1),[]))]]
+		match=self.countRelationships.match(statement)
+		if match!=None:
+			return [[len(self.relationships.get(match.group(1),[]))]]
+		match=self.verifyNodes.match(statement)
+		if match!=None:
+			return [[row] for row in parameters['rows'] if row not in self.nodes.get(match.group(1),[])]
+		match=self.verifyRelationships.match(statement)
+		if match!=None:
+			return [[pair] for pair in parameters['pairs'] if pair not in self.relationships.get(match.group(1),[])]
+		return []
+
+
+class sql2NeoTestCase(unittest.TestCase):
+	"""Creates a SQLite database in a temporary directory for every test and captures the output of the importer in *output*"""
+	def setUp(self):
+		self.directory=tempfile.mkdtemp()
+		self.database=os.path.join(self.directory,'test.db')
+		self.stdout=sys.stdout
+		self.output=StringIO.StringIO()
+		sys.stdout=self.output
+
+	def tearDown(self):
+		sys.stdout=self.stdout
+		shutil.rmtree(self.directory)
+
+	def createTable(self,name,columns,rows):
+		"""Creates the table *name* with the column definitions *columns* and inserts *rows*"""
+		connection=sqlite3.connect(self.database)
+		connection.execute("CREATE TABLE {0} ({1})".format(name,",".join(columns)))
+		connection.executemany("INSERT INTO {0} VALUES ({1})".format(name,",".join('?'*len(columns))),rows)
+		connection.commit()
+		connection.close()
+
+	def createImporter(self,graph=None):
+		"""Returns an importer reading from the test database and writing to a recording transport answered by *graph*"""
+		importer=sql2neo.sql2NeoImporter({'SOURCE':'sqlite','DB':self.database},{'TRANSPORT':'recording'})
+		# entities and relationships are class attributes shared by all importers
+		importer.entities=[]
+		importer.relationships=[]
+		if graph!=None:
+			importer.neo4jConnection.respond=graph.respond
+			# sessions opened for workers answer from the same graph
+			self.sessions=[]
+			createNeo4jSession=importer.createNeo4jSession
+			def createGraphSession(config=None):
+				session=createNeo4jSession(config)
+				session.respond=graph.respond
+				self.sessions.append(session)
+				return session
+			importer.createNeo4jSession=createGraphSession
+		return importer
+
+	def createPeople(self,importer,people=10,livesIn=50,key=None):
+		"""Adds the entity Person(id,name) with *people* rows and the relationship LIVES_IN between people with *livesIn* rows to *importer*. The relationship's left person ids repeat, so they are not unique"""
+		self.createTable('person',['id INTEGER','name TEXT'],[(i,"person {0}".format(i)) for i in xrange(people)])
+		self.createTable('lives_in',['pid INTEGER','hid INTEGER'],[(i%people,(i*7)%people) for i in xrange(livesIn)])
+		person=sql2neo.sql2NeoEntity('Person',"SELECT * FROM person",{0:'id',1:'name'},idx=['id'],key='id' if key else None)
+		importer.addEntity(person)
+		importer.addRelationship(sql2neo.sql2NeoRelationship('LIVES_IN',person,person,"SELECT * FROM lives_in",[{'id':0},{'id':1}],key='pid' if key else None))
+		return person
+
+	def statements(self,importer,prefix):
+		"""Returns the recorded (statement, parameters) pairs whose statement starts with *prefix*"""
+		return [(s,p) for s,p in importer.neo4jConnection.statements if s.startswith(prefix)]
+
+
+class sql2NeoTransportTest(sql2NeoTestCase):
+	def testTransportIsSelectedByName(self):
+		importer=self.createImporter()
+		self.assertIsInstance(importer.neo4jConnection,sql2neo.sql2NeoRecordingTransport)
+		self.assertIsInstance(importer.createNeo4jSession(),sql2neo.sql2NeoRecordingTransport)
+		self.assertEqual(importer.neo4jErrors,(sql2neo.sql2NeoRecordingTransport.StatementFailed,))
+
+	def testStatementsAreRecordedWhenCommitted(self):
+		transport=sql2neo.sql2NeoRecordingTransport()
+		tx=transport.create_transaction()
+		tx.append("CREATE (a:A)")
+		tx.append("RETURN 1")
+		self.assertEqual(transport.statements,[])
+		self.assertEqual(tx.commit(),[[],[[1]]])
+		self.assertEqual(transport.statements,[("CREATE (a:A)",None),("RETURN 1",None)])
+		self.assertEqual(transport.commits,1)
+		tx.append("CREATE (b:B)")
+		tx.rollback()
+		self.assertEqual(tx.commit(),[])
+		self.assertEqual(len(transport.statements),2)
+
+	def testStreamDefaultsToExecute(self):
+		transport=sql2neo.sql2NeoRecordingTransport()
+		transport.respond=lambda statement,parameters: [[parameters['x']]]
+		self.assertEqual(list(transport.stream("RETURN {x}",{'x':5})),[[5]])
+
+
+
+class sql2NeoEntityEngineTest(sql2NeoTestCase):
+	def testUnwindStatements(self):
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		self.createPeople(importer,people=3,livesIn=0)
+		self.assertTrue(importer.importEntites(False,engine='unwind',batchSize=2))
+		nodes=self.statements(importer,"UNWIND {rows}")
+		self.assertEqual([s for s,p in nodes],["UNWIND {rows} AS row CREATE (a:Person) SET a = row"]*2)
+		self.assertEqual([p['rows'] for s,p in nodes],[[{'id':0,'name':'person 0'},{'id':1,'name':'person 1'}],[{'id':2,'name':'person 2'}]])
+		self.assertEqual(len(graph.nodes['Person']),3)
+
+	def testLiteralStatements(self):
+		importer=self.createImporter()
+		self.createTable('city',['id INTEGER','name TEXT'],[(1,"O'Hare")])
+		importer.addEntity(sql2neo.sql2NeoEntity('City',"SELECT * FROM city",{0:'id',1:'name'}))
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='literal'))
+		statements=self.statements(importer,"CREATE (a:City")
+		self.assertEqual(len(statements),1)
+		self.assertIn("id:1",statements[0][0])
+		self.assertIn("name:'O\\'Hare'",statements[0][0])
+		self.assertEqual(statements[0][1],None)
+
+
+
+class sql2NeoRelationshipEngineTest(sql2NeoTestCase):
+	def testUnwindStatements(self):
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		self.createPeople(importer,people=3,livesIn=4)
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='unwind',batchSize=2))
+		relationships=self.statements(importer,"UNWIND {pairs}")
+		self.assertEqual(set(s for s,p in relationships),set(["UNWIND {pairs} AS p MATCH (a:Person {id:p.l.id}) MATCH (b:Person {id:p.r.id}) CREATE (a)-[:LIVES_IN]->(b)"]))
+		self.assertEqual([len(p['pairs']) for s,p in relationships],[2,2])
+		self.assertEqual(graph.relationships['LIVES_IN'],[{'l':{'id':0},'r':{'id':0}},{'l':{'id':1},'r':{'id':1}},{'l':{'id':2},'r':{'id':2}},{'l':{'id':0},'r':{'id':0}}])
+
+	def testLiteralStatements(self):
+		importer=self.createImporter()
+		self.createPeople(importer,people=3,livesIn=2)
+		self.assertTrue(importer.importRelationships(False,engine='literal'))
+		self.assertEqual([s for s,p in self.statements(importer,"MATCH")],["MATCH (a:Person {id:0}),(b:Person {id:0}) CREATE (a)-[:LIVES_IN]->(b)","MATCH (a:Person {id:1}),(b:Person {id:1}) CREATE (a)-[:LIVES_IN]->(b)"])
+
+
+
+class sql2NeoPeriodicCommitTest(sql2NeoTestCase):
+	def testPeriodicCommits(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		self.createPeople(importer,people=25,livesIn=0)
+		self.assertTrue(importer.importEntites(False,engine='unwind',batchSize=5,commitEvery=10))
+		# 25 rows in batches of 5 are committed after 10, 20 and the remaining 5 rows
+		self.assertEqual(importer.neo4jConnection.commits,3)
+
+	def testCommitBytes(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		self.createPeople(importer,people=20,livesIn=0)
+		self.assertTrue(importer.importEntites(False,engine='unwind',batchSize=2,commitBytes=100))
+		# every batch of two rows exceeds 100 bytes on its own
+		self.assertEqual(importer.neo4jConnection.commits,10)
+
+	def testFailedCommitIsReported(self):
+		graph=sql2NeoTestGraph()
+		graph.failOn=lambda statement,parameters: statement.startswith("UNWIND {rows}")
+		graph.failures=1
+		importer=self.createImporter(graph)
+		self.createPeople(importer,people=3,livesIn=0)
+		self.assertFalse(importer.importEntites(False,engine='unwind'))
+		self.assertIn("Can not import entities: Simulated failure",self.output.getvalue())
+		self.assertEqual(importer.metrics.jobs['Person']['counters']['errors'],1)
+
+
+
+class sql2NeoNodeCacheTest(sql2NeoTestCase):
+	def testCacheIsFilledByOneQuery(self):
+		importer=self.createImporter()
+		importer.neo4jConnection.respond=lambda statement,parameters: [[100+i,i] for i in xrange(10)] if statement.startswith("MATCH (a:Person) RETURN id(a)") else []
+		self.createPeople(importer,people=10,livesIn=5)
+		self.assertTrue(importer.importRelationships(False,engine='unwind',useNodeCache=True))
+		self.assertEqual([s for s,p in self.statements(importer,"MATCH (a:Person) RETURN id(a)")],["MATCH (a:Person) RETURN id(a),a.id LIMIT {0}".format(importer.nodeCacheBytes//100)])
+		pairs=self.statements(importer,"UNWIND {pairs} AS p MATCH (a) WHERE id(a)=p.l")
+		self.assertEqual(pairs[0][1]['pairs'][:2],[{'l':100,'r':100},{'l':101,'r':107}])
+
+	def testFullCacheFallsBackToProperties(self):
+		importer=self.createImporter()
+		importer.nodeCacheBytes=2000
+		importer.neo4jConnection.respond=lambda statement,parameters: [[100+i,i] for i in xrange(100)] if statement.startswith("MATCH (a:Person) RETURN id(a)") else []
+		self.createPeople(importer,people=100,livesIn=100)
+		self.assertTrue(importer.importRelationships(False,engine='unwind',useNodeCache=True))
+		self.assertEqual(self.statements(importer,"MATCH (a:Person) RETURN id(a)")[0][0],"MATCH (a:Person) RETURN id(a),a.id LIMIT 20")
+		cache=importer.nodeCaches[('Person',('id',))]
+		self.assertTrue(cache.full)
+		self.assertTrue(0<len(cache)<20)
+		self.assertTrue(cache.size<=2000)
+		self.assertIn("Node cache for Person is full",self.output.getvalue())
+		byId=sum(len(p['pairs']) for s,p in self.statements(importer,"UNWIND {pairs} AS p MATCH (a) WHERE id(a)=p.l"))
+		byProperties=sum(len(p['pairs']) for s,p in self.statements(importer,"UNWIND {pairs} AS p MATCH (a:Person"))
+		self.assertEqual(byId+byProperties,100)
+		self.assertTrue(byProperties>0)
+
+	def testCacheIsNotChangedByLookups(self):
+		cache=sql2neo.sql2NeoNodeCache(None,['id'],10000)
+		self.assertTrue(cache.put((1,),101))
+		self.assertEqual(cache.get((1,)),101)
+		self.assertEqual(cache.get((2,)),None)
+		self.assertEqual((cache.hits,cache.misses,len(cache)),(1,1,1))
+
+
+
+class sql2NeoExportTest(sql2NeoTestCase):
+	def testCsvTypesIgnoreNulls(self):
+		importer=sql2neo.sql2NeoImporter({'SOURCE':'sqlite','DB':self.database},None)
+		importer.entities=[]
+		importer.relationships=[]
+		self.createTable('item',['id INTEGER','weight REAL','name TEXT'],[(1,None,None),(2,1.5,'b')])
+		importer.addEntity(sql2neo.sql2NeoEntity('Item',"SELECT * FROM item",{0:'id',1:'weight',2:'name'}))
+		self.assertTrue(importer.exportCsv(self.directory))
+		lines=open(os.path.join(self.directory,'nodes-000-Item.csv')).read().splitlines()
+		self.assertEqual(lines,[":ID(Item),id:long,name,weight:double,:LABEL","0,1,,,Item","1,2,b,1.5,Item"])
+
+	def testRelationshipsReferenceNodeIds(self):
+		importer=sql2neo.sql2NeoImporter({'SOURCE':'sqlite','DB':self.database},None)
+		importer.entities=[]
+		importer.relationships=[]
+		self.createPeople(importer,people=3,livesIn=2)
+		self.assertTrue(importer.exportCsv(self.directory))
+		lines=open(os.path.join(self.directory,'relationships-000-Person-LIVES_IN-Person.csv')).read().splitlines()
+		self.assertEqual(lines,[":START_ID(Person),:END_ID(Person),:TYPE","0,0,LIVES_IN","1,1,LIVES_IN"])
+		self.assertIn("--relationships=",open(os.path.join(self.directory,'import.sh')).read())
+
+
+
+class sql2NeoVerifyTest(sql2NeoTestCase):
+	def importPeople(self,graph):
+		importer=self.createImporter(graph)
+		self.createPeople(importer,people=20,livesIn=40,key=True)
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='unwind'))
+		return importer
+
+	def testFullVerification(self):
+		graph=sql2NeoTestGraph()
+		importer=self.importPeople(graph)
+		self.assertTrue(importer.verifyImport(batchSize=7))
+		self.assertIn("Verified Person - 20/20 rows, 0 missing",self.output.getvalue())
+		self.assertIn("Verified Person LIVES_IN Person - 40/40 rows, 0 missing",self.output.getvalue())
+		# 20 rows in batches of 7 and 40 pairs in batches of 7
+		self.assertEqual(len(self.statements(importer,"UNWIND {rows} AS row OPTIONAL MATCH")),3)
+		self.assertEqual(len(self.statements(importer,"UNWIND {pairs} AS p OPTIONAL MATCH")),6)
+
+	def testMissingRowsAreReported(self):
+		graph=sql2NeoTestGraph()
+		importer=self.importPeople(graph)
+		del graph.nodes['Person'][3]
+		# every pair is created twice, both copies go missing
+		missing=graph.relationships['LIVES_IN'][0]
+		graph.relationships['LIVES_IN']=[pair for pair in graph.relationships['LIVES_IN'] if pair!=missing]
+		self.assertFalse(importer.verifyImport(workers=2))
+		output=self.output.getvalue()
+		self.assertIn("Person - SQL and Neo4j cardinality missmatch: SQL: 20 / Neo4j: 19",output)
+		self.assertIn("Person - Could not find: {'id': 3, 'name': 'person 3'}",output)
+		self.assertIn("Verified Person LIVES_IN Person - 40/40 rows, 2 missing",output)
+
+	def testFailedQueryStopsVerification(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		importer.addEntity(sql2neo.sql2NeoEntity('Person',"SELECT * FROM missing_table",{0:'id'}))
+		self.assertFalse(importer.verifyImport(workers=2))
+		output=self.output.getvalue()
+		self.assertIn("no such table: missing_table",output)
+		self.assertNotIn("cardinality",output)
+		self.assertNotIn("Can not import",output)
+
+
+
+class sql2NeoCheckpointTest(sql2NeoTestCase):
+	def testResumeAfterFailedPage(self):
+		graph=sql2NeoTestGraph()
+		checkpoint=os.path.join(self.directory,'checkpoint.json')
+		importer=self.createImporter(graph)
+		self.createPeople(importer,people=10,livesIn=50,key=True)
+		# the first page of relationships is committed, the second one fails
+		pages=[0]
+		def failSecondPage(statement,parameters):
+			if statement.startswith("UNWIND {pairs}"):
+				pages[0]+=1
+				return pages[0]==2
+			return False
+		graph.failOn=failSecondPage
+		graph.failures=1
+		self.assertFalse(importer.importAll(withIndexesAndUniques=False,engine='unwind',checkpoint=checkpoint,pageSize=7))
+		committed=len(graph.relationships['LIVES_IN'])
+		self.assertTrue(0<committed<50)
+		state=json.load(open(checkpoint))
+		self.assertEqual(len([job for job in state.values() if job.get('done')]),1)
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='unwind',checkpoint=checkpoint,pageSize=7))
+		self.assertIn("Skipping Person, it was finished by a previous run",self.output.getvalue())
+		self.assertEqual(len(graph.nodes['Person']),10)
+		pairs=sorted((p['l']['id'],p['r']['id']) for p in graph.relationships['LIVES_IN'])
+		self.assertEqual(pairs,sorted((i%10,(i*7)%10) for i in xrange(50)))
+
+	def testPagesKeepRowsSharingAKey(self):
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		self.createPeople(importer,people=10,livesIn=50,key=True)
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='unwind',checkpoint=os.path.join(self.directory,'checkpoint.json'),pageSize=7))
+		self.assertEqual(len(graph.relationships['LIVES_IN']),50)
+		self.assertIn("Finished LIVES_IN - 50 rows",self.output.getvalue())
+
+
+
+class sql2NeoConversionTest(sql2NeoTestCase):
+	class Offset(datetime.tzinfo):
+		def utcoffset(self,dt):
+			return datetime.timedelta(hours=2)
+		def dst(self,dt):
+			return datetime.timedelta(0)
+
+	def testTimestamps(self):
+		importer=self.createImporter()
+		self.assertEqual(importer.convertTimestamp(datetime.datetime(2020,1,1,2,0,tzinfo=self.Offset())),calendar.timegm((2020,1,1,0,0,0)))
+		self.assertEqual(importer.convertTimestamp(datetime.datetime(2020,1,1,2,0)),calendar.timegm((2020,1,1,2,0,0)))
+		self.assertEqual(importer.convertTimestamp(datetime.date(2020,1,1)),calendar.timegm((2020,1,1,0,0,0)))
+		self.assertEqual(importer.convertTimestamp(None),'')
+
+	def testBooleansAndDecimals(self):
+		importer=self.createImporter()
+		self.assertIs(importer.convertBoolean(True),True)
+		self.assertEqual(importer.convertDecimal(decimal.Decimal('5.00')),5)
+		self.assertEqual(type(importer.convertDecimal(decimal.Decimal('5.00'))),int)
+		self.assertEqual(importer.convertDecimal(decimal.Decimal('5.25')),5.25)
+		self.assertEqual(importer.convertDataType(decimal.Decimal('1.5')),1.5)
+		self.assertEqual(importer.mappedToCypher({'active':False}),"active:false")
+
+	def testSQLiteSource(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		self.createTable('item',['id INTEGER','weight REAL','name TEXT'],[(1,2.5,u'\xe4')])
+		importer.addEntity(sql2neo.sql2NeoEntity('Item',"SELECT * FROM item",{0:'id',1:'weight',2:'name'}))
+		self.assertTrue(importer.importEntites(False,engine='unwind'))
+		# SQLite returns UTF-8 encoded byte strings like MySQLdb does
+		self.assertEqual(self.statements(importer,"UNWIND {rows}")[0][1]['rows'],[{'id':1,'weight':2.5,'name':'\xc3\xa4'}])
+
+
+
+class sql2NeoGroupedRelationshipTest(sql2NeoTestCase):
+	def testGroupedCommitsCountRelationships(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		self.createPeople(importer,people=3,livesIn=120)
+		importer.groupRelationships='left'
+		self.assertTrue(importer.importRelationships(False,engine='unwind',batchSize=10,commitEvery=30))
+		self.assertEqual(importer.neo4jConnection.commits,4)
+		groups=self.statements(importer,"UNWIND {groups}")
+		self.assertTrue(all(sum(len(g['others']) for g in p['groups'])<=10 for s,p in groups))
+		self.assertEqual(sum(len(g['others']) for s,p in groups for g in p['groups']),120)
+
+	def testRowsAreGroupedBySharedNode(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		self.createPeople(importer,people=3,livesIn=6)
+		importer.groupRelationships='left'
+		self.assertTrue(importer.importRelationships(False,engine='unwind',batchSize=100))
+		groups=self.statements(importer,"UNWIND {groups}")[0][1]['groups']
+		self.assertEqual([(g['k'],g['others']) for g in groups],[({'id':0},[{'id':0},{'id':0}]),({'id':1},[{'id':1},{'id':1}]),({'id':2},[{'id':2},{'id':2}])])
+
+
+
+class sql2NeoSampledVerifyTest(sql2NeoTestCase):
+	def importPeople(self,graph,people=20,livesIn=40):
+		importer=self.createImporter(graph)
+		self.createPeople(importer,people=people,livesIn=livesIn,key=True)
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='unwind'))
+		return importer
+
+	def testSampledVerification(self):
+		graph=sql2NeoTestGraph()
+		importer=self.importPeople(graph)
+		self.assertTrue(importer.verifyImport(mode='sample',sampleSize=10))
+		self.assertIn("Verified Person - sample of 10/20 rows, 0 missing",self.output.getvalue())
+
+	def testUniqueKeyIsSampledByRange(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		person=self.createPeople(importer,people=100,livesIn=0,key=True)
+		rows=importer.sampleRows(person,importer.sqlConnection,10,100)
+		self.assertEqual(len(rows),10)
+		# one row of every tenth of the key range
+		self.assertEqual(sorted(row[0]//10 for row in rows),range(10))
+
+	def testNonUniqueKeyReachesEveryRow(self):
+		importer=self.createImporter()
+		self.createTable('visit',['pid INTEGER','seq INTEGER'],[(i%20,i) for i in xrange(400)])
+		visit=sql2neo.sql2NeoEntity('Visit',"SELECT * FROM visit",{0:'pid',1:'seq'},key='pid')
+		sampled=set()
+		for i in xrange(20):
+			rows=importer.sampleRows(visit,importer.sqlConnection,100,400)
+			self.assertEqual(len(rows),len(set(rows)))
+			sampled.update(rows)
+		# the first row of every key value would only reach 20 rows
+		self.assertTrue(len(sampled)>300)
+
+	def testStreamingVerificationWithoutCounting(self):
+		graph=sql2NeoTestGraph()
+		importer=self.importPeople(graph)
+		importer.streaming=True
+		importer.countRows=False
+		self.assertTrue(importer.verifyImport())
+		self.assertIn("Verified Person - 20/20 rows, 0 missing",self.output.getvalue())
+
+	def testMissingRate(self):
+		importer=self.createImporter()
+		rate,upper=importer.missingRate(0,100,0.95)
+		self.assertEqual(rate,0.0)
+		self.assertAlmostEqual(upper,0.037,places=3)
+		rate,upper=importer.missingRate(5,100,0.95)
+		self.assertEqual(rate,0.05)
+		self.assertTrue(0.05<upper<0.12)
+
+
+
+class sql2NeoPipelineTest(sql2NeoTestCase):
+	def testPipelineImportsAllRows(self):
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		importer.fetchSize=7
+		self.createPeople(importer,people=100,livesIn=50)
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='pipeline',batchSize=10))
+		self.assertEqual(sorted(row['id'] for row in graph.nodes['Person']),range(100))
+		self.assertEqual(len(graph.relationships['LIVES_IN']),50)
+		for line in self.output.getvalue().splitlines():
+			if line.startswith("Pipeline "):
+				self.assertTrue(all(int(share)<=100 for share in re.findall(r"(\d+)%",line)),line)
+
+	def testFailingLoadStopsTheStages(self):
+		graph=sql2NeoTestGraph()
+		graph.failOn=lambda statement,parameters: statement.startswith("UNWIND {rows}")
+		graph.failures=1
+		importer=self.createImporter(graph)
+		importer.fetchSize=100
+		# reading rows is slower than mapping them, so the extraction stage is still running when loading fails
+		importer.sqlConnection.create_function('slow',1,lambda value: time.sleep(0.0002) or value)
+		self.createTable('person',['id INTEGER','name TEXT'],[(i,"person {0}".format(i)) for i in xrange(5000)])
+		importer.addEntity(sql2neo.sql2NeoEntity('Person',"SELECT slow(id),name FROM person",{0:'id',1:'name'}))
+		result=[]
+		t=threading.Thread(target=lambda: result.append(importer.importEntites(False,engine='pipeline',batchSize=500,commitEvery=1000)))
+		t.daemon=True
+		t.start()
+		t.join(10)
+		self.assertFalse(t.is_alive())
+		self.assertEqual(result,[False])
+		self.assertIn("Simulated failure",self.output.getvalue())
+
+
+
+class sql2NeoBatchSizerTest(unittest.TestCase):
+	def testSizeFollowsLatency(self):
+		sizer=sql2neo.sql2NeoBatchSizer(1000,targetLatency=1.0)
+		sizer.observe(1000,10000,0.25)
+		# grows by at most a factor of two
+		self.assertEqual(sizer.size,2000)
+		sizer.observe(2000,20000,2.0)
+		self.assertEqual(sizer.size,1000)
+		sizer.observe(1000,10000,10.0)
+		# shrinks by at most a factor of two
+		self.assertEqual(sizer.size,500)
+		self.assertEqual(sizer.sizes,[2000,1000,500])
+
+	def testShortCommitKeepsTheSize(self):
+		sizer=sql2neo.sql2NeoBatchSizer(1000,targetLatency=1.0)
+		for i in xrange(20):
+			sizer.observe(1000,10000,1.0)
+		sizer.observe(3,30,0.01)
+		self.assertEqual(sizer.size,1000)
+		self.assertTrue(str(sizer).startswith("1000 rows per commit after 21 commits"))
+
+	def testSlowShortCommitShrinksTheSize(self):
+		sizer=sql2neo.sql2NeoBatchSizer(1000,targetLatency=1.0)
+		sizer.observe(100,1000,4.0)
+		self.assertEqual(sizer.size,50)
+
+	def testLargeRowsShrinkTheSize(self):
+		sizer=sql2neo.sql2NeoBatchSizer(1000,targetLatency=1.0,targetBytes=10000)
+		sizer.observe(1000,10000,1.0)
+		self.assertEqual(sizer.size,1000)
+		# a short commit of rows twice as large
+		sizer.observe(10,300,0.01)
+		self.assertEqual(sizer.size,500)
+
+	def testSizeStaysWithinLimits(self):
+		sizer=sql2neo.sql2NeoBatchSizer(1000,targetLatency=1.0,minSize=100,maxSize=1500)
+		sizer.observe(1000,10000,0.1)
+		self.assertEqual(sizer.size,1500)
+		sizer.observe(1500,15000,100.0)
+		sizer.observe(750,7500,100.0)
+		self.assertEqual(sizer.size,375)
+		sizer.observe(375,3750,100.0)
+		sizer.observe(187,1870,100.0)
+		self.assertEqual(sizer.size,100)
+
+	def testMemoryLimitHalvesTheSize(self):
+		sizer=sql2neo.sql2NeoBatchSizer(1000,targetLatency=1.0,memoryLimit=1)
+		sizer.residentMemory=lambda: 2
+		sizer.observe(1000,10000,1.0)
+		self.assertEqual(sizer.size,500)
+
+
+class sql2NeoAdaptiveImportTest(sql2NeoTestCase):
+	def testCommitsFollowTheTunedSize(self):
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		importer.adaptiveBatches=True
+		importer.initialBatchSize=10
+		importer.maxBatchSize=40
+		self.createPeople(importer,people=200,livesIn=0)
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='unwind',batchSize=100))
+		self.assertEqual(len(graph.nodes['Person']),200)
+		sizes=[len(p['rows']) for s,p in self.statements(importer,"UNWIND {rows}")]
+		# commits of the recording transport are fast, the size doubles up to the limit
+		self.assertEqual(sizes[:4],[10,20,40,40])
+		self.assertEqual(importer.batchSizers['Person'].size,40)
+
+
+
+class sql2NeoSyncTest(sql2NeoTestCase):
+	def createOrders(self,importer):
+		self.createTable('customer',['id INTEGER','name TEXT','updated INTEGER'],[(1,'a',10),(2,'b',10)])
+		self.createTable('orders',['id INTEGER','cid INTEGER','updated INTEGER'],[(1,1,10),(2,1,10),(3,2,None)])
+		customer=sql2neo.sql2NeoEntity('Customer',"SELECT * FROM customer",{0:'id',1:'name',2:'updated'},unq=['id'],changeColumn='updated')
+		order=sql2neo.sql2NeoEntity('Order',"SELECT * FROM orders",{0:'id'},unq=['id'])
+		importer.addEntity(customer)
+		importer.addEntity(order)
+		importer.addRelationship(sql2neo.sql2NeoRelationship('ORDERED_BY',order,customer,"SELECT * FROM orders",[{'id':0},{'id':1}],changeColumn='updated',exclusive=True))
+
+	def update(self,statement):
+		connection=sqlite3.connect(self.database)
+		connection.execute(statement)
+		connection.commit()
+		connection.close()
+
+	def testChangedRowsAreMerged(self):
+		state=os.path.join(self.directory,'sync.json')
+		importer=self.createImporter()
+		self.createOrders(importer)
+		self.assertTrue(importer.syncAll(state))
+		customers=self.statements(importer,"UNWIND {rows} AS row MERGE (a:Customer")
+		self.assertEqual([len(p['rows']) for s,p in customers],[2])
+		customer=importer.jobId(importer.entities[0])
+		self.assertEqual(json.load(open(state))[customer]['watermark'],10)
+		self.update("UPDATE customer SET name='c',updated=20 WHERE id=2")
+		del importer.neo4jConnection.statements[:]
+		self.assertTrue(importer.syncAll(state))
+		customers=self.statements(importer,"UNWIND {rows} AS row MERGE (a:Customer")
+		# rows changed at the high water mark are synced again
+		self.assertEqual([p['rows'] for s,p in customers],[[{'id':1,'name':'a','updated':10},{'id':2,'name':'c','updated':20}]])
+		# entities without a change column are read completely
+		self.assertEqual(len(self.statements(importer,"UNWIND {rows} AS row MERGE (a:Order")[0][1]['rows']),3)
+		self.assertEqual(json.load(open(state))[customer]['watermark'],20)
+		del importer.neo4jConnection.statements[:]
+		self.assertTrue(importer.syncAll(state))
+		customers=self.statements(importer,"UNWIND {rows} AS row MERGE (a:Customer")
+		self.assertEqual([p['rows'] for s,p in customers],[[{'id':2,'name':'c','updated':20}]])
+
+	def testRowsWithoutChangeTimeAreAlwaysSynced(self):
+		state=os.path.join(self.directory,'sync.json')
+		importer=self.createImporter()
+		self.createOrders(importer)
+		self.assertTrue(importer.syncAll(state))
+		del importer.neo4jConnection.statements[:]
+		self.assertTrue(importer.syncAll(state))
+		pairs=self.statements(importer,"UNWIND {pairs}")
+		self.assertEqual([p['pairs'] for s,p in pairs],[[{'l':{'id':1},'r':{'id':1}},{'l':{'id':2},'r':{'id':1}},{'l':{'id':3},'r':{'id':2}}]])
+		self.update("UPDATE orders SET updated=5")
+		del importer.neo4jConnection.statements[:]
+		self.assertTrue(importer.syncAll(state))
+		self.assertEqual(self.statements(importer,"UNWIND {pairs}"),[])
+
+	def testExclusiveRelationshipsAreReplaced(self):
+		state=os.path.join(self.directory,'sync.json')
+		importer=self.createImporter()
+		self.createOrders(importer)
+		self.assertTrue(importer.syncAll(state))
+		self.update("UPDATE orders SET updated=5 WHERE id=2")
+		self.update("UPDATE orders SET cid=2,updated=20 WHERE id=1")
+		del importer.neo4jConnection.statements[:]
+		self.assertTrue(importer.syncAll(state))
+		pairs=self.statements(importer,"UNWIND {pairs}")
+		self.assertEqual(pairs[0][0],"UNWIND {pairs} AS p MATCH (a:Order {id:p.l.id}) MATCH (b:Customer {id:p.r.id}) OPTIONAL MATCH (a)-[old:ORDERED_BY]->(c:Customer) WHERE c<>b DELETE old WITH DISTINCT a,b MERGE (a)-[:ORDERED_BY]->(b)")
+		self.assertEqual(pairs[0][1]['pairs'],[{'l':{'id':1},'r':{'id':2}},{'l':{'id':3},'r':{'id':2}}])
+
+	def testOtherRelationshipsAreMerged(self):
+		importer=self.createImporter()
+		self.createPeople(importer,people=2,livesIn=1)
+		importer.entities[0].uniques=['id']
+		self.assertTrue(importer.syncAll(os.path.join(self.directory,'sync.json'),engine='literal'))
+		self.assertEqual([s for s,p in self.statements(importer,"MATCH (a:Person")],["MATCH (a:Person {id:0}) MATCH (b:Person {id:0}) MERGE (a)-[:LIVES_IN]->(b)"])
+
+	def testEntitiesNeedUniques(self):
+		importer=self.createImporter()
+		self.createPeople(importer,people=2,livesIn=0)
+		self.assertFalse(importer.syncAll(os.path.join(self.directory,'sync.json')))
+		self.assertIn("Can not sync entity Person",self.output.getvalue())
+
+
+
+class sql2NeoBenchmarkTest(unittest.TestCase):
+	def runBenchmark(self,**settings):
+		schema=sql2neo_benchmark.sql2NeoBenchmarkSchema(tables=2,rows=200,width=4,fanout=2)
+		benchmark=sql2neo_benchmark.sql2NeoBenchmark(schema,**settings)
+		return benchmark,dict((phase['phase'],phase) for phase in benchmark.run()['phases'])
+
+	def testPhasesReadEveryRow(self):
+		benchmark,phases=self.runBenchmark(engine='unwind',batchSize=50)
+		self.assertTrue(all(phase['success'] for phase in phases.values()))
+		self.assertEqual(phases['entities']['rows'],400)
+		self.assertEqual(phases['relationships']['rows'],400)
+		self.assertEqual(phases['entities']['statements'],8)
+		self.assertTrue(phases['entities']['bytes']>0)
+
+	def testBenchmarksDoNotShareJobs(self):
+		first,phases=self.runBenchmark()
+		second,phases=self.runBenchmark()
+		self.assertEqual((len(second.importer.entities),len(second.importer.relationships)),(2,1))
+		self.assertEqual(phases['entities']['rows'],400)
+
+
+
+class sql2NeoLookupIndexTest(sql2NeoTestCase):
+	def createLookups(self,importer,lookups):
+		"""Adds the entity Person without indexes and one relationship per lookup mapping in *lookups*"""
+		self.createTable('person',['id INTEGER','first TEXT','last TEXT'],[(1,'a','b'),(2,'c','d')])
+		person=sql2neo.sql2NeoEntity('Person',"SELECT * FROM person",{0:'id',1:'first',2:'last'})
+		importer.addEntity(person)
+		for i,lookup in enumerate(lookups):
+			importer.addRelationship(sql2neo.sql2NeoRelationship('KNOWS_{0}'.format(i),person,person,"SELECT * FROM person",[lookup,{'id':0}]))
+
+	def indexes(self,importer):
+		return [s for s,p in self.statements(importer,"CREATE INDEX")]
+
+	def testOneIndexPerLookup(self):
+		importer=self.createImporter()
+		self.createLookups(importer,[{'last':2,'first':1}])
+		self.assertEqual(importer.missingLookupIndexes(),[('Person',('first','last')),('Person',('id',))])
+		self.assertTrue(importer.importAll(engine='unwind'))
+		self.assertEqual(self.indexes(importer),["CREATE INDEX ON :Person(first)","CREATE INDEX ON :Person(id)"])
+
+	def testLookupsShareIndexes(self):
+		importer=self.createImporter()
+		self.createLookups(importer,[{'first':1},{'first':1,'last':2}])
+		self.assertTrue(importer.importAll(engine='unwind'))
+		self.assertEqual(self.indexes(importer),["CREATE INDEX ON :Person(first)","CREATE INDEX ON :Person(id)"])
+
+	def testDeclaredIndexesAreUsed(self):
+		importer=self.createImporter()
+		self.createPeople(importer,people=2,livesIn=1)
+		self.assertEqual(importer.missingLookupIndexes(),[])
+
+	def testStrictModeRefusesLookupsWithoutIndex(self):
+		importer=self.createImporter()
+		importer.lookupIndexes='strict'
+		self.createLookups(importer,[{'first':1}])
+		self.assertFalse(importer.importAll(engine='unwind'))
+		self.assertIn("Relationship lookups without an index: Person(first), Person(id)",self.output.getvalue())
+		self.assertEqual(self.statements(importer,"UNWIND"),[])
+
+
+
+class sql2NeoPartitionTest(sql2NeoTestCase):
+	def testPartitionsDoNotShareLeftNodes(self):
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		importer.relationshipPartitions=3
+		self.createPeople(importer,people=30,livesIn=300)
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='unwind',batchSize=10))
+		self.assertEqual(sorted((p['l']['id'],p['r']['id']) for p in graph.relationships['LIVES_IN']),sorted((i%30,(i*7)%30) for i in xrange(300)))
+		self.assertIn("in 3 partitions",self.output.getvalue())
+		left=[set(p['l']['id'] for s,ps in session.statements if s.startswith("UNWIND {pairs}") for p in ps['pairs']) for session in [importer.neo4jConnection]+self.sessions]
+		left=[ids for ids in left if len(ids)>0]
+		self.assertEqual(len(left),3)
+		self.assertEqual(sum(len(ids) for ids in left),30)
+
+	def testDeadlocksAreRetried(self):
+		graph=sql2NeoTestGraph()
+		graph.failOn=lambda statement,parameters: statement.startswith("UNWIND {pairs}")
+		graph.failures=2
+		graph.message="Deadlock detected while trying to acquire locks"
+		importer=self.createImporter(graph)
+		importer.relationshipPartitions=2
+		importer.sessionPoolSize=1
+		importer.retryDelay=0.001
+		self.createPeople(importer,people=10,livesIn=40)
+		self.assertTrue(importer.importAll(withIndexesAndUniques=False,engine='unwind',batchSize=10))
+		self.assertEqual(len(graph.relationships['LIVES_IN']),40)
+		self.assertEqual(self.output.getvalue().count("Retrying commit"),2)
+		self.assertEqual(importer.metrics.jobs['Person-LIVES_IN-Person']['counters']['retries'],2)
+
+	def testFailingPartitionStopsTheOthers(self):
+		graph=sql2NeoTestGraph()
+		graph.failOn=lambda statement,parameters: statement.startswith("UNWIND {pairs}")
+		graph.failures=1
+		importer=self.createImporter(graph)
+		importer.relationshipPartitions=4
+		self.createPeople(importer,people=50,livesIn=2000)
+		result=[]
+		t=threading.Thread(target=lambda: result.append(importer.importAll(withIndexesAndUniques=False,engine='unwind',batchSize=10)))
+		t.daemon=True
+		t.start()
+		t.join(10)
+		self.assertFalse(t.is_alive())
+		self.assertEqual(result,[False])
+		self.assertIn("Can not import LIVES_IN: Simulated failure",self.output.getvalue())
+		self.assertTrue(len(graph.relationships.get('LIVES_IN',[]))<2000)
+
+	def testPartitionerKeepsKeysTogether(self):
+		partitioner=sql2neo.sql2NeoPartitioner(3,chunkSize=4)
+		loaded={}
+		def load(partition,rows):
+			loaded[partition]=list(rows)
+		partitioner.run(((i%7,i) for i in xrange(100)),lambda row: row[0],load)
+		self.assertEqual(sorted(row for rows in loaded.values() for row in rows),sorted((i%7,i) for i in xrange(100)))
+		keys=[set(k for k,i in rows) for rows in loaded.values()]
+		self.assertEqual(sum(len(k) for k in keys),7)
+		self.assertEqual(partitioner.counts,[len(loaded.get(i,[])) for i in xrange(3)])
+
+
+
+class sql2NeoScriptTest(sql2NeoTestCase):
+	def read(self,path):
+		if path.endswith(".gz"):
+			return gzip.open(path).read()
+		return open(path).read()
+
+	def testTransactionsAndShards(self):
+		writer=sql2neo.sql2NeoScriptWriter(self.directory,commitEvery=2,shardBytes=100,bufferSize=10)
+		writer.label='A'
+		for i in xrange(5):
+			writer.append("CREATE (a:A {{id:{0}}})".format(i))
+		writer.label='B'
+		writer.append("CREATE (b:B)")
+		writer.close()
+		self.assertEqual([os.path.basename(path) for path in writer.files],["000-A-000.cypher","001-A-001.cypher","002-B-000.cypher"])
+		# a transaction takes 57 bytes, the first file is split after the transaction exceeding 100 bytes
+		self.assertEqual(self.read(writer.files[0]),":begin\nCREATE (a:A {id:0});\nCREATE (a:A {id:1});\n:commit\n:begin\nCREATE (a:A {id:2});\nCREATE (a:A {id:3});\n:commit\n")
+		self.assertEqual(self.read(writer.files[1]),":begin\nCREATE (a:A {id:4});\n:commit\n")
+		self.assertEqual(self.read(writer.files[2]),":begin\nCREATE (b:B);\n:commit\n")
+
+	def testParametersAreRefused(self):
+		writer=sql2neo.sql2NeoScriptWriter(self.directory)
+		self.assertRaises(ValueError,writer.append,"UNWIND {rows} AS row CREATE (a:A)",{'rows':[]})
+
+	def testExportWithoutNeo4j(self):
+		importer=sql2neo.sql2NeoImporter({'SOURCE':'sqlite','DB':self.database},None)
+		importer.entities=[]
+		importer.relationships=[]
+		self.createPeople(importer,people=3,livesIn=2)
+		self.assertTrue(importer.importAll(scriptDirectory=self.directory,compressScript=True,commitEvery=2))
+		script=open(os.path.join(self.directory,'import.sh')).read().splitlines()
+		paths=[line.split()[2] for line in script]
+		self.assertEqual([os.path.basename(path) for path in paths],["000-schema-000.cypher.gz","001-Person-000.cypher.gz","002-Person-LIVES_IN-Person-000.cypher.gz"])
+		self.assertTrue(all(line.startswith("gunzip -c ") and line.endswith(" | cypher-shell") for line in script))
+		self.assertIn("CREATE INDEX ON :Person(id);",self.read(paths[0]))
+		people=self.read(paths[1])
+		self.assertEqual(people.count(":begin"),2)
+		self.assertEqual(people.count("CREATE (a:Person"),3)
+		self.assertEqual(self.read(paths[2]).count("CREATE (a)-[:LIVES_IN]->(b)"),2)
+
+
+
+class sql2NeoSchemaPlanTest(sql2NeoTestCase):
+	def createImporterWithSchema(self,deferSchema,states=None):
+		"""Returns an importer for Person(id,name) with an index on name and a unique id. The index states polled are taken from *states*, all indexes are online once it is empty"""
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		importer.deferSchema=deferSchema
+		importer.indexPollInterval=0.001
+		states=list(states or [])
+		def respond(statement,parameters):
+			if statement.startswith("CALL db.indexes()"):
+				return states.pop(0) if len(states)>0 else [["INDEX ON :Person(name)","ONLINE"]]
+			return graph.respond(statement,parameters)
+		importer.neo4jConnection.respond=respond
+		self.createTable('person',['id INTEGER','name TEXT'],[(1,'a'),(2,'b')])
+		person=sql2neo.sql2NeoEntity('Person',"SELECT * FROM person",{0:'id',1:'name'},idx=['name'],unq=['id'])
+		importer.addEntity(person)
+		importer.addRelationship(sql2neo.sql2NeoRelationship('KNOWS',person,person,"SELECT * FROM person",[{'id':0},{'id':0}]))
+		return importer
+
+	def phases(self,importer):
+		"""Returns the kinds of the recorded statements in their order, repeated kinds are listed once"""
+		kinds=[]
+		for statement,parameters in importer.neo4jConnection.statements:
+			for prefix,kind in (("CREATE INDEX",'index'),("CREATE CONSTRAINT",'unique'),("UNWIND {rows}",'nodes'),("UNWIND {pairs}",'relationships'),("CALL db.indexes()",'wait')):
+				if statement.startswith(prefix) and (len(kinds)==0 or kinds[-1]!=kind):
+					kinds.append(kind)
+		return kinds
+
+	def testSchemaBeforeNodes(self):
+		importer=self.createImporterWithSchema(None)
+		self.assertTrue(importer.importAll(engine='unwind'))
+		self.assertEqual(self.phases(importer),['index','unique','wait','nodes','relationships'])
+
+	def testDeferredConstraints(self):
+		importer=self.createImporterWithSchema('constraints')
+		self.assertTrue(importer.importAll(engine='unwind'))
+		self.assertEqual(self.phases(importer),['index','nodes','unique','wait','relationships'])
+
+	def testDeferredSchema(self):
+		importer=self.createImporterWithSchema('all')
+		self.assertTrue(importer.importAll(engine='unwind'))
+		self.assertEqual(self.phases(importer),['nodes','index','unique','wait','relationships'])
+
+	def testRelationshipsWaitForIndexes(self):
+		importer=self.createImporterWithSchema('all',[[["INDEX ON :Person(name)","POPULATING"]]]*3)
+		self.assertTrue(importer.importAll(engine='unwind'))
+		self.assertEqual(len(self.statements(importer,"CALL db.indexes()")),4)
+		self.assertIn("INDEX ON :Person(name) online after",self.output.getvalue())
+
+	def testFailedIndexStopsTheImport(self):
+		importer=self.createImporterWithSchema('all',[[["INDEX ON :Person(name)","FAILED"]]])
+		self.assertFalse(importer.importAll(engine='unwind'))
+		self.assertIn("INDEX ON :Person(name) failed to populate",self.output.getvalue())
+		self.assertEqual(self.statements(importer,"UNWIND {pairs}"),[])
+
+	def testWaitingStopsAfterTimeout(self):
+		importer=self.createImporterWithSchema('all',[[["INDEX ON :Person(name)","POPULATING"]]]*1000)
+		importer.indexTimeout=0
+		self.assertTrue(importer.importAll(engine='unwind'))
+		self.assertIn("Indexes not online after 0s, continuing while they populate: INDEX ON :Person(name)",self.output.getvalue())
+
+	def testUnknownPlan(self):
+		importer=self.createImporterWithSchema('later')
+		self.assertFalse(importer.importAll(engine='unwind'))
+		self.assertIn("Unknown schema plan: later",self.output.getvalue())
+
+
+
+class sql2NeoSurrogateKeyTest(sql2NeoTestCase):
+	def createOrders(self,importer):
+		self.createTable('customer',['region INTEGER','number INTEGER','name TEXT'],[(1,1,'a'),(1,2,'b'),(2,1,'c')])
+		self.createTable('orders',['id INTEGER','region INTEGER','number INTEGER'],[(10,1,2),(11,2,1)])
+		customer=sql2neo.sql2NeoEntity('Customer',"SELECT * FROM customer",{2:'name'},sqlKey=['region','number'])
+		order=sql2neo.sql2NeoEntity('Order',"SELECT id FROM orders",{},sqlKey='id')
+		importer.addEntity(customer)
+		importer.addEntity(order)
+		importer.addRelationship(sql2neo.sql2NeoRelationship('ORDERED_BY',order,customer,"SELECT * FROM orders",foreignKeys=[[0],[1,2]]))
+
+	def testNodesAndLookupsUseTheSurrogateKey(self):
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		self.createOrders(importer)
+		self.assertEqual(importer.relationships[0].lookupMapping,[{'_sqlid':0},{'_sqlid':[1,2]}])
+		self.assertTrue(importer.importAll(engine='unwind'))
+		self.assertEqual(graph.nodes['Customer'],[{'name':'a','_sqlid':'1|1'},{'name':'b','_sqlid':'1|2'},{'name':'c','_sqlid':'2|1'}])
+		self.assertEqual(graph.nodes['Order'],[{'id':10,'_sqlid':10},{'id':11,'_sqlid':11}])
+		self.assertEqual(graph.relationships['ORDERED_BY'],[{'l':{'_sqlid':10},'r':{'_sqlid':'1|2'}},{'l':{'_sqlid':11},'r':{'_sqlid':'2|1'}}])
+		self.assertEqual(sorted(s for s,p in self.statements(importer,"CREATE INDEX")),["CREATE INDEX ON :Customer(_sqlid)","CREATE INDEX ON :Order(_sqlid)"])
+		self.assertEqual(importer.missingLookupIndexes(),[])
+
+	def testRemoveSurrogateKeys(self):
+		importer=self.createImporter()
+		self.createOrders(importer)
+		removed={'Customer':[2,2,1],'Order':[0]}
+		importer.neo4jConnection.respond=lambda statement,parameters: [[removed[re.match(r"MATCH \(a:(\w+)\)",statement).group(1)].pop(0)]] if statement.startswith("MATCH") else []
+		self.assertTrue(importer.removeSurrogateKeys(batchSize=2))
+		self.assertEqual([s for s,p in self.statements(importer,"DROP INDEX")],["DROP INDEX ON :Customer(_sqlid)","DROP INDEX ON :Order(_sqlid)"])
+		self.assertIn("Removed _sqlid from 5 nodes of Customer",self.output.getvalue())
+		self.assertIn("Removed _sqlid from 0 nodes of Order",self.output.getvalue())
+
+
+
+class sql2NeoSessionPoolTest(sql2NeoTestCase):
+	def testSessionsAreReused(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		pool=sql2neo.sql2NeoSessionPool(importer,size=2)
+		first=pool.acquire()
+		pool.release(first)
+		self.assertIs(pool.acquire(),first)
+		self.assertEqual(pool.created,1)
+		# a session that was not idle long enough is not checked
+		self.assertEqual(first.statements,[])
+
+	def testSizeLimitsOpenSessions(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		pool=sql2neo.sql2NeoSessionPool(importer,size=2)
+		first=pool.acquire()
+		second=pool.acquire()
+		self.assertIsNot(first,second)
+		self.assertEqual(pool.acquire(False),None)
+		acquired=[]
+		t=threading.Thread(target=lambda: acquired.append(pool.acquire()))
+		t.daemon=True
+		t.start()
+		t.join(0.1)
+		self.assertEqual(acquired,[])
+		pool.release(second)
+		t.join(5)
+		self.assertEqual(acquired,[second])
+		self.assertEqual(pool.created,2)
+
+	def testFailedSessionsAreReplaced(self):
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		pool=sql2neo.sql2NeoSessionPool(importer,size=1)
+		broken=pool.acquire()
+		closed=[]
+		broken.close=lambda: closed.append(broken)
+		graph.failOn=lambda statement,parameters: statement=="RETURN 1"
+		graph.failures=1
+		pool.release(broken,failed=True)
+		session=pool.acquire()
+		self.assertIsNot(session,broken)
+		self.assertEqual(closed,[broken])
+		self.assertEqual((pool.created,pool.reconnects),(1,1))
+		self.assertIn("Neo4j session failed its health check: Simulated failure",self.output.getvalue())
+
+	def testIdleSessionsAreChecked(self):
+		importer=self.createImporter(sql2NeoTestGraph())
+		pool=sql2neo.sql2NeoSessionPool(importer,size=1,checkInterval=0)
+		session=pool.acquire()
+		pool.release(session)
+		self.assertIs(pool.acquire(),session)
+		self.assertEqual(session.statements,[("RETURN 1",None)])
+
+	def testParallelImportUsesThePool(self):
+		graph=sql2NeoTestGraph()
+		importer=self.createImporter(graph)
+		importer.sessionPoolSize=2
+		self.createPeople(importer,people=20,livesIn=40)
+		self.createTable('city',['id INTEGER'],[(i,) for i in xrange(5)])
+		importer.addEntity(sql2neo.sql2NeoEntity('City',"SELECT * FROM city",{0:'id'},idx=['id']))
+		self.assertTrue(importer.importAll(engine='unwind',workers=3))
+		self.assertEqual((len(graph.nodes['Person']),len(graph.nodes['City']),len(graph.relationships['LIVES_IN'])),(20,5,40))
+		self.assertTrue(importer.getSessionPool().created<=2)
+		self.assertEqual(len(self.sessions),importer.getSessionPool().created)
+
+
+if __name__=='__main__':
+	unittest.main()